@@ -72,17 +72,17 @@ case $ACTION in
     "test")
         echo "Running tests..."
         ssh -i ~/.ssh/id_ed25519 -o StrictHostKeyChecking=no ubuntu@${INSTANCE_IP} \
-            "cd ~/attenfuse && python src/test_carla_env_random.py"
+            "cd ~/attenfuse && ./attenfuse check && python src/test_carla_env_random.py"
         ;;
     "train")
         echo "Starting training..."
         ssh -i ~/.ssh/id_ed25519 -o StrictHostKeyChecking=no ubuntu@${INSTANCE_IP} \
-            "cd ~/attenfuse && python src/train_ppo_attention.py"
+            "cd ~/attenfuse && ./attenfuse train"
         ;;
     "setup")
         echo "Environment setup complete. You can now:"
         echo "1. SSH into the instance: ssh -i ~/.ssh/id_ed25519 ubuntu@${INSTANCE_IP}"
-        echo "2. Run tests: python src/test_carla_env_random.py"
-        echo "3. Start training: python src/train_ppo_attention.py"
+        echo "2. Check the simulator: ./attenfuse check"
+        echo "3. Start training: ./attenfuse train"
         ;;
 esac
@@ -0,0 +1,96 @@
+# File: actor_lifecycle.py
+# Spawning and destroying groups of actors through CARLA command batches, one round-trip per batch.
+
+import carla
+
+
+class ActorBatchError(RuntimeError):
+    """Some commands of a batch failed; `errors` maps each failed command's index to the simulator's message."""
+
+    def __init__(self, what, errors):
+        self.errors = errors
+        details = "; ".join(f"#{index}: {message}" for index, message in sorted(errors.items()))
+        super().__init__(f"{len(errors)} {what} failed: {details}")
+
+
+def _actor_id(actor):
+    return actor if isinstance(actor, int) else actor.id
+
+
+def spawn_actor_ids(client, specs):
+    """Spawn every (blueprint, transform, parent) in `specs` with one batch.
+
+    `parent` is an actor, an actor id or None. Returns (ids, errors): ids is aligned
+    with specs and holds None where the spawn failed, and errors maps those indices to
+    the simulator's message.
+    """
+    if not specs:
+        return [], {}
+    commands = [carla.command.SpawnActor(bp, transform, _actor_id(parent)) if parent is not None
+                else carla.command.SpawnActor(bp, transform)
+                for bp, transform, parent in specs]
+    responses = client.apply_batch_sync(commands)
+    return ([None if r.error else r.actor_id for r in responses],
+            {i: r.error for i, r in enumerate(responses) if r.error})
+
+
+def lookup_actors(world, ids):
+    """Actor objects for `ids` (None entries pass through) with one world.get_actors() call."""
+    wanted = [i for i in ids if i is not None]
+    by_id = {actor.id: actor for actor in world.get_actors(wanted)} if wanted else {}
+    missing = [i for i in wanted if i not in by_id]
+    if missing:
+        raise RuntimeError(f"Spawned actors {missing} not found in the world")
+    return [None if i is None else by_id[i] for i in ids]
+
+
+def destroy_actors(client, actors):
+    """Destroy actors (or actor ids) with one batch; returns {actor_id: error} for the ones that failed.
+
+    Sensors among them should have been stopped first.
+    """
+    ids = [_actor_id(a) for a in actors if a is not None]
+    if not ids:
+        return {}
+    responses = client.apply_batch_sync([carla.command.DestroyActor(i) for i in ids])
+    return {i: r.error for i, r in zip(ids, responses) if r.error}
+
+
+def spawn_children(client, parent_ids, child_specs):
+    """Attach the same children to every parent with one batch; returns the tuple of child ids per parent.
+
+    `child_specs` is [(blueprint, transform relative to the parent)]. If any child fails,
+    the children that did spawn are destroyed and ActorBatchError is raised.
+    """
+    specs = [(bp, transform, parent) for parent in parent_ids for bp, transform in child_specs]
+    ids, errors = spawn_actor_ids(client, specs)
+    if errors:
+        destroy_actors(client, ids)
+        raise ActorBatchError("attached spawns", errors)
+    n = len(child_specs)
+    return [tuple(ids[k * n:(k + 1) * n]) for k in range(len(parent_ids))]
+
+
+def spawn_attached(client, world, parent_specs, child_specs):
+    """Spawn parents, then the same children attached to each; three round-trips in all.
+
+    CARLA's SpawnActor(...).then() only substitutes the new id into chained commands with
+    an actor field, never into a chained SpawnActor's parent, so the children go in a
+    second batch once the parents' ids are known; a single get_actors() then fetches
+    everything. Returns (parents, children, errors): parents is aligned with
+    `parent_specs` [(blueprint, transform)] with None where that spawn failed, children
+    holds each spawned parent's tuple of children (None for failed parents), and errors
+    maps failed parent indices to messages. If a child fails, the parents are destroyed
+    too and ActorBatchError is raised.
+    """
+    parent_ids, errors = spawn_actor_ids(client, [(bp, transform, None) for bp, transform in parent_specs])
+    spawned = [i for i in parent_ids if i is not None]
+    try:
+        rigs = spawn_children(client, spawned, child_specs)
+    except ActorBatchError:
+        destroy_actors(client, spawned)
+        raise
+    actors = iter(lookup_actors(world, spawned + [i for rig in rigs for i in rig]))
+    parents = [None if i is None else next(actors) for i in parent_ids]
+    rigs = iter([tuple(next(actors) for _ in child_specs) for _ in spawned])
+    return parents, [None if parent is None else next(rigs) for parent in parents], errors
@@ -0,0 +1,272 @@
+# File: async_training.py
+# Checkpointing on a background thread, evaluation in a separate process against its own
+# simulator, and exact resume of PPO training from the latest checkpoint.
+
+import glob
+import json
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import torch
+from stable_baselines3.common.callbacks import BaseCallback
+
+CHECKPOINT_PATTERN = 'ckpt_{:09d}.pt'
+LATEST_FILE = 'latest.json'
+EVAL_LOG = 'eval.jsonl'
+
+
+def _cpu_copy(state):
+    """Deep copy of a (nested) state dict with every tensor cloned to CPU."""
+    if isinstance(state, torch.Tensor):
+        return state.detach().to('cpu', copy=True)
+    if isinstance(state, dict):
+        return {k: _cpu_copy(v) for k, v in state.items()}
+    if isinstance(state, (list, tuple)):
+        return type(state)(_cpu_copy(v) for v in state)
+    return state
+
+
+def snapshot_state(model):
+    """Everything needed to continue training `model` where it is, detached from live tensors."""
+    return {
+        'policy': _cpu_copy(model.policy.state_dict()),
+        'optimizer': _cpu_copy(model.policy.optimizer.state_dict()),
+        'num_timesteps': int(model.num_timesteps),
+        'n_updates': int(model._n_updates),
+        'episode_num': int(model._episode_num),
+        'torch_rng': torch.get_rng_state(),
+        'saved_at': time.time(),
+    }
+
+
+def save_checkpoint(state, save_dir, keep=3):
+    """Write `state` atomically, point latest.json at it and prune older checkpoints."""
+    os.makedirs(save_dir, exist_ok=True)
+    path = os.path.join(save_dir, CHECKPOINT_PATTERN.format(state['num_timesteps']))
+    tmp = path + '.tmp'
+    torch.save(state, tmp)
+    os.replace(tmp, path)
+
+    latest = os.path.join(save_dir, LATEST_FILE)
+    with open(latest + '.tmp', 'w') as f:
+        json.dump({'path': os.path.basename(path), 'num_timesteps': state['num_timesteps']}, f)
+    os.replace(latest + '.tmp', latest)
+
+    if keep:
+        for old in sorted(glob.glob(os.path.join(save_dir, 'ckpt_*.pt')))[:-keep]:
+            os.remove(old)
+    return path
+
+
+def latest_checkpoint(save_dir):
+    """Path of the newest complete checkpoint in `save_dir`, or None."""
+    try:
+        with open(os.path.join(save_dir, LATEST_FILE)) as f:
+            path = os.path.join(save_dir, json.load(f)['path'])
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return None
+    return path if os.path.exists(path) else None
+
+
+def load_checkpoint(model, path):
+    """Restore weights, optimizer state and step counters into `model`; returns the state dict.
+
+    Continue with model.learn(total - model.num_timesteps, reset_num_timesteps=False) so
+    learning-rate and clip-range schedules pick up at the same progress.
+    """
+    state = torch.load(path, map_location='cpu', weights_only=True)
+    model.policy.load_state_dict(state['policy'])
+    model.policy.optimizer.load_state_dict(state['optimizer'])
+    model.num_timesteps = state['num_timesteps']
+    model._n_updates = state['n_updates']
+    model._episode_num = state['episode_num']
+    torch.set_rng_state(state['torch_rng'])
+    return state
+
+
+class CheckpointWriter:
+    """Serializes snapshots on a background thread; only the latest pending snapshot is kept."""
+
+    def __init__(self, save_dir, keep=3, on_saved=None):
+        self.save_dir = save_dir
+        self.keep = keep
+        self.on_saved = on_saved
+        self._queue = queue.Queue(maxsize=1)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, state):
+        if self._error is not None:
+            raise RuntimeError("Checkpoint writer thread failed") from self._error
+        # A slow disk drops intermediate snapshots instead of stalling training
+        try:
+            self._queue.get_nowait()
+        except queue.Empty:
+            pass
+        self._queue.put(state)
+
+    def _run(self):
+        while True:
+            state = self._queue.get()
+            if state is None:
+                return
+            try:
+                path = save_checkpoint(state, self.save_dir, self.keep)
+                if self.on_saved is not None:
+                    self.on_saved(path, state['num_timesteps'])
+            except Exception as e:  # surfaced on the next submit()/close()
+                self._error = e
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise RuntimeError("Checkpoint writer thread failed") from self._error
+
+
+def _eval_loop(requests, results, endpoint, fake, env_kwargs, policy_kwargs, n_episodes):
+    """Evaluation process: loads each announced checkpoint and runs deterministic episodes."""
+    if fake:
+        import fake_carla
+        fake_carla.install()
+    from stable_baselines3 import PPO
+    from carla_fusion_env import CarlaFusionEnv
+    from carla_vec_env import parse_endpoint
+
+    torch.set_num_threads(1)
+    host, port, tm_port = parse_endpoint(endpoint)
+    env = CarlaFusionEnv(host=host, port=port, tm_port=tm_port, **env_kwargs)
+    model = PPO('MultiInputPolicy', env, policy_kwargs=policy_kwargs, device='cpu')
+    try:
+        stop = False
+        while not stop:
+            # Only the newest checkpoint matters; skip any that queued up during an evaluation
+            request, latest = requests.get(), None
+            while True:
+                if request is None:
+                    stop = True
+                else:
+                    latest = request
+                try:
+                    request = requests.get_nowait()
+                except queue.Empty:
+                    break
+            if latest is None:
+                continue
+            path, num_timesteps = latest
+            try:
+                state = torch.load(path, map_location='cpu', weights_only=True)
+            except FileNotFoundError:
+                continue  # pruned before we got to it
+            model.policy.load_state_dict(state['policy'])
+
+            returns, lengths = [], []
+            start = time.perf_counter()
+            for _ in range(n_episodes):
+                obs, _ = env.reset()
+                total, steps, done = 0.0, 0, False
+                while not done:
+                    action, _ = model.predict(obs, deterministic=True)
+                    obs, reward, terminated, truncated, _ = env.step(int(action))
+                    total += reward
+                    steps += 1
+                    done = terminated or truncated
+                returns.append(total)
+                lengths.append(steps)
+            results.put({
+                'num_timesteps': num_timesteps,
+                'mean_reward': float(np.mean(returns)),
+                'std_reward': float(np.std(returns)),
+                'mean_ep_length': float(np.mean(lengths)),
+                'eval_seconds': time.perf_counter() - start,
+            })
+    finally:
+        env.close()
+
+
+class EvalProcess:
+    """Runs _eval_loop in a spawned process fed with checkpoint paths."""
+
+    def __init__(self, endpoint, policy_kwargs, env_kwargs=None, fake=False, n_episodes=5):
+        ctx = mp.get_context('spawn')
+        self.requests = ctx.Queue()
+        self.results = ctx.Queue()
+        self.process = ctx.Process(
+            target=_eval_loop,
+            args=(self.requests, self.results, endpoint, fake, dict(env_kwargs or {}), policy_kwargs, n_episodes),
+            daemon=True,
+        )
+        self.process.start()
+
+    def submit(self, path, num_timesteps):
+        self.requests.put((path, num_timesteps))
+
+    def poll(self):
+        """All results reported since the last poll."""
+        out = []
+        while True:
+            try:
+                out.append(self.results.get_nowait())
+            except queue.Empty:
+                return out
+
+    def close(self, timeout=600.0):
+        self.requests.put(None)
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        return self.poll()
+
+
+class AsyncCheckpointCallback(BaseCallback):
+    """Snapshots the model every `save_freq` timesteps at the start of a rollout, when the
+    weights have just been updated and the rollout buffer is empty, so resuming from it
+    is exact up to the environment state. Writing happens on a background thread; if an
+    EvalProcess is given, each written checkpoint is announced to it and its metrics are
+    logged (eval/*) and appended to eval.jsonl as they come back.
+    """
+
+    def __init__(self, save_dir, save_freq, keep=3, eval_process=None, verbose=0):
+        super().__init__(verbose)
+        self.save_dir = save_dir
+        self.save_freq = save_freq
+        self.eval_process = eval_process
+        on_saved = eval_process.submit if eval_process is not None else None
+        self.writer = CheckpointWriter(save_dir, keep=keep, on_saved=on_saved)
+        self._next_save = None
+
+    def _on_training_start(self):
+        self._next_save = (self.model.num_timesteps // self.save_freq + 1) * self.save_freq
+
+    def _on_rollout_start(self):
+        if self.model.num_timesteps >= self._next_save:
+            self.writer.submit(snapshot_state(self.model))
+            self._next_save = (self.model.num_timesteps // self.save_freq + 1) * self.save_freq
+
+    def _on_step(self):
+        return True
+
+    def _on_rollout_end(self):
+        if self.eval_process is not None:
+            self._log_eval(self.eval_process.poll())
+
+    def _log_eval(self, results):
+        for result in results:
+            for key in ('mean_reward', 'std_reward', 'mean_ep_length'):
+                self.logger.record(f"eval/{key}", result[key])
+            self.logger.record('eval/checkpoint_timesteps', result['num_timesteps'])
+            with open(os.path.join(self.save_dir, EVAL_LOG), 'a') as f:
+                f.write(json.dumps(result) + '\n')
+            if self.verbose:
+                print(f"Eval @ {result['num_timesteps']}: mean reward {result['mean_reward']:.2f}")
+
+    def _on_training_end(self):
+        self.writer.submit(snapshot_state(self.model))
+        self.writer.close()
+        if self.eval_process is not None:
+            self._log_eval(self.eval_process.close())
@@ -0,0 +1,116 @@
+# File: attenfuse.py
+# Single entry point for the project's scripts. Only the chosen subcommand's module is
+# imported, so operational commands never pay for torch or stable_baselines3.
+
+import argparse
+import builtins
+import os
+import runpy
+import sys
+import time
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+COMMANDS = {
+    'train': ('train_ppo_attention', "Train the PPO fusion policy"),
+    'eval': ('run_trained_policy', "Run a trained policy and print per-step rewards"),
+    'record': ('run_trained_policy_with_video', "Run a trained policy and record a tiled video"),
+    'export': ('export_policy', "Export a trained policy to TorchScript"),
+    'serve': ('inference_server', "Drive env workers from one batched policy server"),
+    'cleanup': ('cleanup_carla_actors', "Destroy vehicles, sensors and walkers in the world"),
+    'check': ('test_carla_connection', "Check the simulator connection and world state"),
+}
+BENCH_PREFIX = 'bench_'
+
+
+def bench_names():
+    return sorted(name[len(BENCH_PREFIX):-3] for name in os.listdir(SRC_DIR)
+                  if name.startswith(BENCH_PREFIX) and name.endswith('.py'))
+
+
+class ImportProfiler:
+    """Charges the wall time of every first-time import to its top-level package, excluding
+    time spent in other packages it pulls in, by wrapping builtins.__import__.
+    """
+
+    def __init__(self):
+        self.self_time = {}
+        self._stack = []  # [package, start, time in nested packages]
+        self._import = None
+
+    def __enter__(self):
+        self._import = builtins.__import__
+        builtins.__import__ = self._timed_import
+        return self
+
+    def __exit__(self, *exc):
+        builtins.__import__ = self._import
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        package = name.partition('.')[0]
+        if level or not package or name in sys.modules or (self._stack and self._stack[-1][0] == package):
+            return self._import(name, globals, locals, fromlist, level)
+        frame = [package, time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            self._stack.pop()
+            elapsed = time.perf_counter() - frame[1]
+            self.self_time[package] = self.self_time.get(package, 0.0) + elapsed - frame[2]
+            if self._stack:
+                self._stack[-1][2] += elapsed
+
+    def report(self, total, top=15, file=sys.stderr):
+        print(f"\nStartup profile: {total * 1e3:.0f} ms to import and run the command, "
+              f"{sum(self.self_time.values()) * 1e3:.0f} ms of it in imports", file=file)
+        for package, seconds in sorted(self.self_time.items(), key=lambda item: -item[1])[:top]:
+            print(f"  {seconds * 1e3:8.1f} ms  {package}", file=file)
+
+
+def run_module(module, argv):
+    """Run src/<module>.py as if it were invoked as a script with `argv`."""
+    if not os.path.exists(os.path.join(SRC_DIR, module + '.py')):
+        raise ValueError(f"No script {module}.py in {SRC_DIR}")
+    if SRC_DIR not in sys.path:
+        sys.path.insert(0, SRC_DIR)
+    sys.argv = [module + '.py'] + list(argv)
+    runpy.run_module(module, run_name='__main__', alter_sys=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='attenfuse',
+        description="AttenFuse command line. Arguments after the command go to its script; "
+                    "use 'attenfuse <command> --help' for them.",
+        epilog="commands:\n" + "\n".join(f"  {name:<8} {help}" for name, (_, help) in COMMANDS.items())
+               + f"\n  {'bench':<8} Run a benchmark: {', '.join(bench_names())}",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="Report where the command's time went on imports, per top-level package")
+    parser.add_argument('command', choices=sorted(COMMANDS) + ['bench'], metavar='command')
+    parser.add_argument('args', nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+
+    if args.command == 'bench':
+        if not args.args or args.args[0] not in bench_names():
+            parser.error(f"bench needs one of: {', '.join(bench_names())}")
+        module, rest = BENCH_PREFIX + args.args[0], args.args[1:]
+    else:
+        module, rest = COMMANDS[args.command][0], args.args
+
+    if not args.profile_startup:
+        run_module(module, rest)
+        return
+    start = time.perf_counter()
+    profiler = ImportProfiler()
+    try:
+        with profiler:
+            run_module(module, rest)
+    finally:
+        profiler.report(time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    main()
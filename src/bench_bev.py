@@ -0,0 +1,74 @@
+# File: bench_bev.py
+# LiDAR BEV rasterization throughput at increasing sweep sizes, against the
+# original single-channel occupancy code from CarlaFusionEnv._get_obs.
+
+import argparse
+import time
+
+import numpy as np
+
+from bev_rasterizer import BEVRasterizer, CHANNELS
+
+
+def legacy_occupancy(points):
+    lidar_array = points[:, :3]
+    bev = np.zeros((200, 200), dtype=np.float32)
+    x = ((lidar_array[:, 0] + 10.0) / 0.1).astype(int)
+    y = ((lidar_array[:, 1]) / 0.1).astype(int)
+    mask = (x >= 0) & (x < 200) & (y >= 0) & (y < 200)
+    bev[y[mask], x[mask]] = 1.0
+    return (bev[np.newaxis, :, :] * 255).astype(np.uint8)
+
+
+def synthetic_sweep(n_points, max_range=50.0, seed=0):
+    """Points on a ring of obstacles plus ground returns, like a ray-cast LiDAR sweep."""
+    rng = np.random.default_rng(seed)
+    angle = rng.uniform(-np.pi, np.pi, n_points)
+    dist = rng.uniform(2.0, max_range, n_points)
+    points = np.empty((n_points, 4), dtype=np.float32)
+    points[:, 0] = dist * np.cos(angle)
+    points[:, 1] = dist * np.sin(angle)
+    points[:, 2] = rng.uniform(-2.5, 1.5, n_points)
+    points[:, 3] = rng.uniform(0.0, 1.0, n_points)
+    return points
+
+
+def time_per_sweep(fn, points, repeats):
+    fn(points)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn(points)
+    return (time.perf_counter() - start) / repeats
+
+
+def main(sizes=(32_000, 128_000, 1_000_000), repeats=20, rate_hz=20.0):
+    rasterizers = {
+        'occupancy 200x200': BEVRasterizer(),
+        f'{len(CHANNELS)}-channel 200x200': BEVRasterizer(channels=CHANNELS),
+        f'{len(CHANNELS)}-channel 400x400 @0.25m': BEVRasterizer(
+            x_range=(-50, 50), y_range=(-50, 50), resolution=0.25, channels=CHANNELS),
+    }
+    budget_ms = 1000.0 / rate_hz
+
+    print(f"\n{'rasterizer':<36}{'points':>10}{'ms/sweep':>10}{'Mpts/s':>9}{f'<{budget_ms:.0f}ms':>8}")
+    for n in sizes:
+        points = synthetic_sweep(n)
+        candidates = [('legacy occupancy 200x200', legacy_occupancy)]
+        for name, rasterizer in rasterizers.items():
+            out = np.empty(rasterizer.shape, dtype=np.uint8)
+            candidates.append((name, lambda p, r=rasterizer, o=out: r.rasterize(p, out=o)))
+        for name, fn in candidates:
+            seconds = time_per_sweep(fn, points, repeats)
+            ok = 'yes' if seconds * 1000 < budget_ms else 'NO'
+            print(f"{name:<36}{n:>10}{seconds * 1000:>10.2f}{n / seconds / 1e6:>9.1f}{ok:>8}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[32_000, 128_000, 1_000_000],
+                        help="Points per sweep to benchmark")
+    parser.add_argument('--repeats', type=int, default=20)
+    parser.add_argument('--rate_hz', type=float, default=20.0, help="Sweep rate the budget is derived from")
+    args = parser.parse_args()
+
+    main(sizes=args.sizes, repeats=args.repeats, rate_hz=args.rate_hz)
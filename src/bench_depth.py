@@ -0,0 +1,63 @@
+# File: bench_depth.py
+# Depth decoding cost: the previous per-channel float64 logger path against DepthCodec.
+
+import argparse
+import time
+
+import numpy as np
+
+from depth_codec import DepthCodec, encode_depth
+from observation_processor import parse_size
+
+
+def legacy_decode(raw, height, width):
+    """log_sensors.save_depth_image before DepthCodec, with the channels widened to float64
+    so it runs on NumPy 2 (the original uint8 sums overflow) and with B/R in CARLA's order."""
+    array = np.reshape(np.copy(np.frombuffer(raw, dtype=np.uint8)), (height, width, 4)).astype(np.float64)
+    normalized = (array[:, :, 2] + array[:, :, 1] * 256 + array[:, :, 0] * 256 * 256) / (256 ** 3 - 1)
+    return 1000 * normalized
+
+
+def synthetic_depth(width, height, seed=0):
+    """Ground plane receding to the horizon with sky at the far plane."""
+    rows = np.linspace(0.0, 1.0, height)[:, None]
+    depth = np.where(rows > 0.5, 2.4 / np.maximum(rows - 0.5, 1e-3), 1000.0)
+    noise = np.random.default_rng(seed).uniform(0.95, 1.05, (height, width))
+    return np.clip(depth * noise, 0.0, 1000.0)
+
+
+def time_call(fn, repeats):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def main(sizes=('800x600', '128x128'), repeats=50):
+    codec = DepthCodec()
+    print(f"\n{'decoder':<32}{'size':>10}{'µs/frame':>12}{'max err m':>12}")
+    for size in sizes:
+        w, h = parse_size(size)
+        depth = synthetic_depth(w, h)
+        raw = encode_depth(depth).tobytes()
+        metres = np.empty((h, w), dtype=np.float32)
+        quantized = np.empty((h, w), dtype=np.uint8)
+        rows = [
+            ('per-channel float64 (legacy)', lambda: legacy_decode(raw, h, w), None),
+            ('DepthCodec.decode -> float32', lambda: codec.decode(raw, h, w, out=metres), metres),
+            ('DepthCodec.quantize -> log u8', lambda: codec.quantize(raw, h, w, out=quantized), None),
+        ]
+        for name, fn, result in rows:
+            us = time_call(fn, repeats)
+            err = f"{np.abs(result - depth).max():.4f}" if result is not None else '-'
+            print(f"{name:<32}{size:>10}{us:>12.1f}{err:>12}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', nargs='+', default=['800x600', '128x128'], help="Camera sizes as WxH")
+    parser.add_argument('--repeats', type=int, default=50)
+    args = parser.parse_args()
+
+    main(sizes=args.sizes, repeats=args.repeats)
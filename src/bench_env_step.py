@@ -0,0 +1,119 @@
+# File: bench_env_step.py
+# End-to-end CarlaFusionEnv.step() throughput with the env's own per-stage latency breakdown.
+# Runs against a live simulator or, with --fake, the in-process fake backend, so
+# regressions in the Python side of stepping show up without a GPU server.
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+
+def run(env, n_steps, warmup=20, seed=0, quiet=True):
+    """Step `env` (built with timing=True) with random actions; return (steps/s, per-stage stats).
+
+    The stages are the env's own StepTimer laps, so they follow whichever decode path it takes.
+    """
+    env.reset(seed=seed)
+    env.action_space.seed(seed)
+    # The env prints debug lines every step; keep them out of the measurement
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull if quiet else sys.stdout):
+        for _ in range(warmup):
+            _, _, terminated, truncated, _ = env.step(env.action_space.sample())
+            if terminated or truncated:
+                env.reset()
+        env.step_timer.reset()
+        elapsed = 0.0
+        for _ in range(n_steps):
+            action = env.action_space.sample()
+            start = time.perf_counter()
+            _, _, terminated, truncated, _ = env.step(action)
+            elapsed += time.perf_counter() - start
+            if terminated or truncated:
+                env.reset()
+    return n_steps / elapsed, env.get_step_stats()
+
+
+def check_regression(result, baseline, threshold):
+    """Return a list of messages for metrics more than `threshold` (fraction) worse than `baseline`."""
+    failures = []
+    if result['steps_per_sec'] < baseline['steps_per_sec'] * (1 - threshold):
+        failures.append(f"steps/s {result['steps_per_sec']:.1f} < baseline {baseline['steps_per_sec']:.1f}")
+    for stage, stats in baseline['stages'].items():
+        now = result['stages'].get(stage)
+        # Sub-0.1 ms stages are dominated by timer noise
+        if now is None or stats['p50_ms'] < 0.1:
+            continue
+        if now['p50_ms'] > stats['p50_ms'] * (1 + threshold):
+            failures.append(f"{stage} p50 {now['p50_ms']:.3f} ms > baseline {stats['p50_ms']:.3f} ms")
+    return failures
+
+
+def main(host='localhost', port=2000, n_steps=500, warmup=20, fake=False, tick_latency=0.0, rpc_latency=0.0,
+         camera_size=None, headless=False, action_repeat=1, pipeline=False, save=None, baseline=None, threshold=0.2):
+    if fake:
+        import fake_carla
+        fake_carla.install(tick_latency=tick_latency, rpc_latency=rpc_latency)
+    from carla_fusion_env import CarlaFusionEnv
+
+    env = CarlaFusionEnv(host=host, port=port, camera_size=camera_size, headless=headless,
+                         action_repeat=action_repeat, pipeline=pipeline, timing=True, timing_window=n_steps)
+    try:
+        steps_per_sec, stages = run(env, n_steps, warmup)
+    finally:
+        env.close()
+
+    result = {
+        'backend': 'fake' if fake else f"{host}:{port}",
+        'n_steps': n_steps,
+        'camera_size': list(env.processor.camera_size),
+        'headless': headless,
+        'action_repeat': action_repeat,
+        'pipeline': pipeline,
+        'steps_per_sec': steps_per_sec,
+        'stages': stages,
+    }
+    print(f"\n{n_steps} steps on {result['backend']}: {steps_per_sec:.1f} steps/s")
+    print(f"{'stage':<14}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for stage, stats in result['stages'].items():
+        print(f"{stage:<14}{stats['p50_ms']:>10.3f}{stats['p99_ms']:>10.3f}{stats['mean_ms']:>10.3f}")
+
+    if save:
+        with open(save, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Saved results to {save}")
+    if baseline:
+        with open(baseline) as f:
+            failures = check_regression(result, json.load(f), threshold)
+        for msg in failures:
+            print(f"REGRESSION: {msg}")
+        if failures:
+            raise SystemExit(1)
+        print(f"No regression beyond {threshold:.0%} of {baseline}")
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', type=str, default='localhost')
+    parser.add_argument('--port', type=int, default=2000)
+    parser.add_argument('--n_steps', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--fake', action='store_true', help="Run against the in-process fake simulator")
+    parser.add_argument('--tick_latency', type=float, default=0.0, help="Fake only: seconds added per world.tick()")
+    parser.add_argument('--rpc_latency', type=float, default=0.0, help="Fake only: seconds added per RPC call")
+    parser.add_argument('--camera_size', type=str, default=None, help="Camera render size, e.g. 800x600")
+    parser.add_argument('--headless', action='store_true', help="Step the env in headless training mode")
+    parser.add_argument('--action_repeat', type=int, default=1, help="Ticks per env step")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="Decode each frame behind the next tick; observations lag one step")
+    parser.add_argument('--save', type=str, default=None, help="Write results as JSON")
+    parser.add_argument('--baseline', type=str, default=None, help="JSON from --save to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Allowed slowdown vs the baseline (fraction)")
+    args = parser.parse_args()
+
+    main(host=args.host, port=args.port, n_steps=args.n_steps, warmup=args.warmup, fake=args.fake,
+         tick_latency=args.tick_latency, rpc_latency=args.rpc_latency, camera_size=args.camera_size,
+         headless=args.headless, action_repeat=args.action_repeat, pipeline=args.pipeline,
+         save=args.save, baseline=args.baseline, threshold=args.threshold)
@@ -0,0 +1,133 @@
+# File: bench_fusion_attention.py
+# CPU latency and peak memory of AttentionFusion modes and precision policies across
+# batch sizes, for a forward pass (rollout) and a forward+backward pass (PPO update).
+
+import argparse
+import multiprocessing
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import torch
+
+from fusion_attention_module import AttentionFusion, FUSION_MODES
+
+# AttentionFusion kwargs per policy. Without 'fused' the batch is divided by 255 before
+# the model, as SB3's normalize_images does; with it the encoders take raw pixels.
+POLICIES = {
+    'fp32': {},
+    'fp32+cl': dict(channels_last=True),
+    'bf16': dict(precision='bf16'),
+    'bf16+cl': dict(precision='bf16', channels_last=True),
+    'bf16+cl+fused': dict(precision='bf16', channels_last=True, input_scale=1.0 / 255.0),
+}
+
+
+def make_batch(batch_size, lidar_channels=1, image_size=128, bev_size=200):
+    """Raw 0-255 pixel values as float32, the way SB3's rollout buffer hands them over."""
+    return (torch.randint(0, 256, (batch_size, 3, image_size, image_size)).float(),
+            torch.randint(0, 256, (batch_size, 1, image_size, image_size)).float(),
+            torch.randint(0, 256, (batch_size, lidar_channels, bev_size, bev_size)).float())
+
+
+def estimate_attention_bytes(model, batch):
+    """Rough size of the attention score matrices for one forward pass."""
+    with torch.no_grad():
+        n_tokens = sum(enc(x).shape[-2] * enc(x).shape[-1] for enc, x in
+                       zip((model.rgb_encoder, model.depth_encoder, model.lidar_encoder), batch))
+    n_heads = model.attn.num_heads
+    n_queries = model.latents.shape[0] if model.fusion == 'latent' else n_tokens
+    return batch[0].shape[0] * n_heads * n_queries * n_tokens * 4
+
+
+def _max_rss_bytes():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def time_call(fn, repeats):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1e3
+
+
+def bench(fusion, batch_size, repeats=3, backward=False, threads=None, policy='fp32'):
+    """Return (ms per call, peak bytes above the pre-run RSS). Run it in a fresh process,
+    since the process high-water mark only ever grows."""
+    if threads:
+        torch.set_num_threads(threads)
+    torch.manual_seed(0)
+    kwargs = POLICIES[policy]
+    model = AttentionFusion(fusion=fusion, **kwargs)
+    batch = make_batch(batch_size)
+    fused = 'input_scale' in kwargs
+
+    def call():
+        inputs = batch if fused else [x / 255.0 for x in batch]
+        return model(*inputs)
+
+    def forward():
+        with torch.no_grad():
+            call()
+
+    def update():
+        model.zero_grad(set_to_none=True)
+        call().sum().backward()
+
+    fn = update if backward else forward
+    before = _max_rss_bytes()
+    ms = time_call(fn, repeats)
+    return ms, _max_rss_bytes() - before
+
+
+def main(batch_sizes=(1, 4, 16, 64), modes=FUSION_MODES, repeats=3, backward=True, memory_budget_gb=2.0,
+         threads=None, policies=('fp32',)):
+    passes = ('forward', 'fwd+bwd') if backward else ('forward',)
+    rows = []
+    for fusion in modes:
+        for batch_size in batch_sizes:
+            model = AttentionFusion(fusion=fusion)
+            estimate = estimate_attention_bytes(model, make_batch(batch_size))
+            for name in passes:
+                # Backward keeps the score matrices for the gradient, roughly tripling their footprint
+                needed = estimate * (3 if name == 'fwd+bwd' else 1)
+                for policy in policies:
+                    if needed > memory_budget_gb * 2 ** 30:
+                        rows.append((fusion, policy, batch_size, name, None, needed))
+                        continue
+                    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                        ms, peak = pool.submit(bench, fusion, batch_size, repeats, name == 'fwd+bwd', threads,
+                                               policy).result()
+                    rows.append((fusion, policy, batch_size, name, ms, peak))
+
+    # Speed-up and memory are relative to the first policy of the same configuration
+    reference = {}
+    print(f"\n{'fusion':<8}{'policy':<15}{'batch':>6}  {'pass':<9}{'ms':>10}{'peak MB':>10}{'speed-up':>10}{'mem':>7}")
+    for fusion, policy, batch_size, name, ms, nbytes in rows:
+        if ms is None:
+            print(f"{fusion:<8}{policy:<15}{batch_size:>6}  {name:<9}{'skipped':>10}"
+                  f"  (est. {nbytes / 2 ** 30:.1f} GB > budget)")
+            continue
+        base_ms, base_bytes = reference.setdefault((fusion, batch_size, name), (ms, nbytes))
+        print(f"{fusion:<8}{policy:<15}{batch_size:>6}  {name:<9}{ms:>10.1f}{nbytes / 2 ** 20:>10.1f}"
+              f"{base_ms / ms:>9.2f}x{nbytes / max(base_bytes, 1):>6.2f}x")
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[1, 4, 16, 64])
+    parser.add_argument('--modes', nargs='+', choices=FUSION_MODES, default=list(FUSION_MODES))
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--no_backward', action='store_true', help="Only time the forward pass")
+    parser.add_argument('--threads', type=int, default=None, help="torch.set_num_threads")
+    parser.add_argument('--memory_budget_gb', type=float, default=2.0,
+                        help="Skip configurations whose attention matrices alone would exceed this")
+    parser.add_argument('--policies', nargs='+', choices=list(POLICIES), default=['fp32'],
+                        help="Precision policies to compare, the first being the reference")
+    args = parser.parse_args()
+
+    main(batch_sizes=args.batch_sizes, modes=args.modes, repeats=args.repeats,
+         backward=not args.no_backward, memory_budget_gb=args.memory_budget_gb, threads=args.threads,
+         policies=args.policies)
@@ -0,0 +1,186 @@
+# File: bench_fusion_suite.py
+# CPU benchmark of every fusion model in the project across batch sizes and input resolutions:
+# forward and forward+backward latency, throughput, parameters, FLOPs and peak memory. Results
+# can be saved as a JSON baseline that later runs are compared against.
+
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import torch
+from torch.utils.flop_counter import FlopCounterMode
+
+import attention_fusion
+import fusion_attention_module
+from bench_fusion_attention import estimate_attention_bytes, make_batch
+
+# Variant -> (description, builder); every model takes [0, 1] inputs from make_batch() / 255
+VARIANTS = {
+    'cross': ("attention_fusion.AttentionFusion: RGB->depth cross-attention, unpadded convs",
+              lambda: attention_fusion.AttentionFusion()),
+    'self': ("fusion_attention_module.AttentionFusion(fusion='self'): tri-modal self-attention",
+             lambda: fusion_attention_module.AttentionFusion(fusion='self')),
+    'latent': ("fusion_attention_module.AttentionFusion(fusion='latent'): latent cross-attention",
+               lambda: fusion_attention_module.AttentionFusion(fusion='latent')),
+}
+# Metrics compared against a baseline; higher is worse for all of them
+METRICS = ('forward_ms', 'fwd_bwd_ms', 'peak_mb', 'gflops', 'params')
+# Absolute changes below these never count: RSS moves in allocator-sized steps, short timings jitter
+MIN_DELTA = {'peak_mb': 32.0, 'forward_ms': 1.0, 'fwd_bwd_ms': 1.0}
+
+
+def _inputs(variant, batch_size, resolution, bev_size):
+    rgb, depth, lidar = (x / 255.0 for x in make_batch(batch_size, image_size=resolution, bev_size=bev_size))
+    return (rgb, depth) if variant == 'cross' else (rgb, depth, lidar)
+
+
+def attention_bytes(variant, batch_size, resolution, bev_size):
+    """Rough size of one forward pass's attention score matrices, to skip configurations that can't fit."""
+    model = VARIANTS[variant][1]()
+    if variant != 'cross':
+        return estimate_attention_bytes(model, make_batch(batch_size, image_size=resolution, bev_size=bev_size))
+    with torch.no_grad():
+        rgb, _ = _inputs(variant, 1, resolution, bev_size)
+        n_tokens = model.rgb_conv(rgb).shape[-2:].numel()
+    return batch_size * model.attn.num_heads * n_tokens * n_tokens * 4
+
+
+def _max_rss_bytes():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def best_ms(fn, repeats, min_seconds=1.0):
+    """Fastest timed call after a warm-up: the least noisy figure to compare runs by.
+
+    Calls at least `repeats` times and, for cheap configurations, until `min_seconds` have passed.
+    """
+    fn()
+    times = []
+    deadline = time.perf_counter() + min_seconds
+    while len(times) < repeats or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1e3)
+    return min(times)
+
+
+def bench(variant, batch_size, resolution, bev_size=200, repeats=5, threads=None):
+    """One configuration's metrics. Run it in a fresh process: the RSS high-water mark only grows."""
+    if threads:
+        torch.set_num_threads(threads)
+    torch.manual_seed(0)
+    model = VARIANTS[variant][1]()
+    inputs = _inputs(variant, batch_size, resolution, bev_size)
+
+    def forward():
+        with torch.no_grad():
+            model(*inputs)
+
+    def update():
+        model.zero_grad(set_to_none=True)
+        model(*inputs).sum().backward()
+
+    before = _max_rss_bytes()
+    forward_ms = best_ms(forward, repeats)
+    fwd_bwd_ms = best_ms(update, repeats)
+    peak = _max_rss_bytes() - before
+    with FlopCounterMode(display=False) as counter:  # its module hooks need autograd on
+        model(*inputs)
+    return {
+        'forward_ms': forward_ms,
+        'fwd_bwd_ms': fwd_bwd_ms,
+        'samples_per_s': batch_size / forward_ms * 1e3,
+        'params': sum(p.numel() for p in model.parameters()),
+        'gflops': counter.get_total_flops() / 1e9,
+        'peak_mb': peak / 2 ** 20,
+    }
+
+
+def compare(rows, baseline, threshold):
+    """[(row, metric, base value, new value)] for every metric more than `threshold` worse than the baseline."""
+    base = {(r['variant'], r['batch_size'], r['resolution']): r for r in baseline['results']}
+    regressions = []
+    for row in rows:
+        ref = base.get((row['variant'], row['batch_size'], row['resolution']))
+        if ref is None or row.get('skipped') or ref.get('skipped'):
+            continue
+        for metric in METRICS:
+            if row[metric] - ref[metric] <= MIN_DELTA.get(metric, 0.0):
+                continue
+            if row[metric] > ref[metric] * (1 + threshold):
+                regressions.append((row, metric, ref[metric], row[metric]))
+    return regressions
+
+
+def main(variants=tuple(VARIANTS), batch_sizes=(1, 16, 64), resolutions=(64, 128), bev_size=200, repeats=5,
+         threads=None, memory_budget_gb=2.0, save=None, baseline=None, threshold=0.15):
+    rows = []
+    for variant in variants:
+        for resolution in resolutions:
+            for batch_size in batch_sizes:
+                row = dict(variant=variant, batch_size=batch_size, resolution=resolution)
+                # Backward keeps the score matrices for the gradient, roughly tripling their footprint
+                needed = 3 * attention_bytes(variant, batch_size, resolution, bev_size)
+                if needed > memory_budget_gb * 2 ** 30:
+                    row.update(skipped=True, estimated_gb=needed / 2 ** 30)
+                else:
+                    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+                        row.update(pool.submit(bench, variant, batch_size, resolution, bev_size, repeats,
+                                               threads).result())
+                rows.append(row)
+
+    print(f"\n{'variant':<8}{'res':>5}{'batch':>6}{'fwd ms':>10}{'fwd+bwd ms':>12}{'samples/s':>11}"
+          f"{'params':>9}{'GFLOPs':>9}{'peak MB':>9}")
+    for r in rows:
+        head = f"{r['variant']:<8}{r['resolution']:>5}{r['batch_size']:>6}"
+        if r.get('skipped'):
+            print(f"{head}{'skipped':>10}  (est. {r['estimated_gb']:.1f} GB > budget)")
+            continue
+        print(f"{head}{r['forward_ms']:>10.1f}{r['fwd_bwd_ms']:>12.1f}{r['samples_per_s']:>11.1f}"
+              f"{r['params']:>9}{r['gflops']:>9.2f}{r['peak_mb']:>9.1f}")
+
+    if save:
+        meta = dict(torch=torch.__version__, python=platform.python_version(), machine=platform.machine(),
+                    processor=platform.processor(), threads=threads or torch.get_num_threads(),
+                    bev_size=bev_size, repeats=repeats, created=time.strftime('%Y-%m-%dT%H:%M:%S'))
+        with open(save, 'w') as f:
+            json.dump({'meta': meta, 'results': rows}, f, indent=2)
+        print(f"Saved baseline to {save}")
+
+    regressions = []
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare(rows, json.load(f), threshold)
+        for row, metric, old, new in regressions:
+            print(f"REGRESSION {row['variant']} res={row['resolution']} batch={row['batch_size']}: "
+                  f"{metric} {old:.4g} -> {new:.4g}" + (f" ({new / old - 1:+.0%})" if old else ""))
+        print(f"{len(regressions)} regressions beyond {threshold:.0%} against {baseline}")
+    return rows, regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="CPU benchmark suite for the fusion models")
+    parser.add_argument('--variants', nargs='+', choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument('--batch_sizes', type=int, nargs='+', default=[1, 16, 64])
+    parser.add_argument('--resolutions', type=int, nargs='+', default=[64, 128], help="Camera image sizes")
+    parser.add_argument('--bev_size', type=int, default=200, help="LiDAR BEV grid size")
+    parser.add_argument('--repeats', type=int, default=5, help="Timed calls per pass; the fastest is reported")
+    parser.add_argument('--threads', type=int, default=None, help="torch.set_num_threads")
+    parser.add_argument('--memory_budget_gb', type=float, default=2.0,
+                        help="Skip configurations whose attention matrices alone would exceed this")
+    parser.add_argument('--save', type=str, default=None, metavar='JSON', help="Write the results as a baseline")
+    parser.add_argument('--baseline', type=str, default=None, metavar='JSON',
+                        help="Compare against a saved baseline and exit non-zero on regressions")
+    parser.add_argument('--threshold', type=float, default=0.15, help="Relative slack before a metric regresses")
+    args = parser.parse_args()
+
+    _, regressions = main(variants=args.variants, batch_sizes=args.batch_sizes, resolutions=args.resolutions,
+                          bev_size=args.bev_size, repeats=args.repeats, threads=args.threads,
+                          memory_budget_gb=args.memory_budget_gb, save=args.save, baseline=args.baseline,
+                          threshold=args.threshold)
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,146 @@
+# File: bench_obs_processor.py
+# Micro-benchmark of observation decoding on recorded raw sensor buffers:
+# the original per-step _get_obs pipeline against ObservationProcessor.
+
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from observation_processor import ObservationProcessor, parse_size
+
+
+def record_raw_frames(n_frames=50, camera_size=(800, 600), host='localhost', port=2000, fake=False):
+    """Step a CarlaFusionEnv and capture the raw sensor buffers of every frame."""
+    if fake:
+        import fake_carla
+        fake_carla.install()
+    from carla_fusion_env import CarlaFusionEnv
+
+    env = CarlaFusionEnv(host=host, port=port, camera_size=camera_size)
+    frames = []
+    try:
+        env.reset(seed=0)
+        sync_get = env.sensor_sync.get
+
+        def capture(frame, timeout=None):
+            data = sync_get(frame, timeout)
+            frames.append(tuple(bytes(data[k].raw_data) for k in ('rgb', 'depth', 'lidar')))
+            return data
+
+        env.sensor_sync.get = capture
+        while len(frames) < n_frames:
+            env.step(env.action_space.sample())
+    finally:
+        env.close()
+    return parse_size(camera_size), frames
+
+
+def save_raw_frames(path, camera_size, frames):
+    lidar = [np.frombuffer(f[2], dtype=np.uint8) for f in frames]
+    np.savez(path,
+             camera_size=np.array(camera_size),
+             rgb=np.stack([np.frombuffer(f[0], dtype=np.uint8) for f in frames]),
+             depth=np.stack([np.frombuffer(f[1], dtype=np.uint8) for f in frames]),
+             lidar=np.concatenate(lidar),
+             lidar_offsets=np.cumsum([0] + [len(l) for l in lidar]))
+
+
+def load_raw_frames(path):
+    data = np.load(path)
+    offsets = data['lidar_offsets']
+    lidar = data['lidar']
+    frames = [(data['rgb'][i], data['depth'][i], lidar[offsets[i]:offsets[i + 1]])
+              for i in range(len(data['rgb']))]
+    return tuple(int(v) for v in data['camera_size']), frames
+
+
+def legacy_get_obs(rgb_raw, depth_raw, lidar_raw, camera_size):
+    """The decode path CarlaFusionEnv._get_obs used before ObservationProcessor."""
+    w, h = camera_size
+    rgb = np.frombuffer(rgb_raw, dtype=np.uint8).reshape((h, w, 4))[:, :, :3]
+    rgb = cv2.resize(rgb, (128, 128))
+    rgb = rgb.transpose(2, 0, 1).astype(np.uint8)
+
+    raw_depth = np.frombuffer(depth_raw, dtype=np.uint8).reshape((h, w, 4))
+    depth_raw = raw_depth[:, :, 0].astype(np.float32)
+    depth_meters = depth_raw / 255.0 * 100
+    depth = cv2.resize(depth_meters, (128, 128))[np.newaxis, :, :].astype(np.float32)
+    depth = np.clip(depth, 0, 100.0) / 100.0
+    depth = (depth * 255).clip(0, 255).astype(np.uint8)
+
+    lidar_array = np.frombuffer(lidar_raw, dtype=np.float32).reshape(-1, 4)[:, :3]
+    bev = np.zeros((200, 200), dtype=np.float32)
+    x = ((lidar_array[:, 0] + 10.0) / 0.1).astype(int)
+    y = ((lidar_array[:, 1]) / 0.1).astype(int)
+    mask = (x >= 0) & (x < 200) & (y >= 0) & (y < 200)
+    bev[y[mask], x[mask]] = 1.0
+    lidar = bev[np.newaxis, :, :].astype(np.float32)
+    lidar = (lidar * 255).astype(np.uint8)
+    return {'rgb': rgb, 'depth': depth, 'lidar': lidar}
+
+
+def measure(decode, frames, repeats=5):
+    """Return (µs per step, peak bytes allocated per step) for decode(*frame)."""
+    for frame in frames[:3]:
+        decode(*frame)
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for frame in frames:
+            decode(*frame)
+    us_per_step = (time.perf_counter() - start) / (repeats * len(frames)) * 1e6
+
+    tracemalloc.start()
+    peaks = []
+    for frame in frames:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        decode(*frame)
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+    return us_per_step, float(np.mean(peaks))
+
+
+def main(raw_paths=(), n_frames=50, host='localhost', port=2000, fake=False, repeats=5):
+    if raw_paths:
+        recordings = [load_raw_frames(p) for p in raw_paths]
+    else:
+        recordings = [record_raw_frames(n_frames, size, host, port, fake) for size in ((800, 600), (128, 128))]
+
+    rows = []
+    for camera_size, frames in recordings:
+        label = f"{camera_size[0]}x{camera_size[1]}"
+        if camera_size == (800, 600):
+            rows.append((f"legacy _get_obs @ {label}",
+                         *measure(lambda *f: legacy_get_obs(*f, camera_size), frames, repeats)))
+        processor = ObservationProcessor(image_size=128, camera_size=camera_size)
+        rows.append((f"ObservationProcessor @ {label}", *measure(processor.process, frames, repeats)))
+
+    print(f"\n{'pipeline':<36}{'µs/step':>10}{'bytes alloc/step':>18}")
+    for name, us, nbytes in rows:
+        print(f"{name:<36}{us:>10.1f}{nbytes:>18.0f}")
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--raw', nargs='*', default=[], help="Recorded .npz raw frame files to replay")
+    parser.add_argument('--record', type=str, default=None, help="Record raw frames to this .npz and exit")
+    parser.add_argument('--camera_size', type=str, default='800x600', help="Camera size used with --record")
+    parser.add_argument('--n_frames', type=int, default=50)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--host', type=str, default='localhost')
+    parser.add_argument('--port', type=int, default=2000)
+    parser.add_argument('--fake', action='store_true', help="Record from the in-process fake simulator")
+    args = parser.parse_args()
+
+    if args.record:
+        size, recorded = record_raw_frames(args.n_frames, args.camera_size, args.host, args.port, args.fake)
+        save_raw_frames(args.record, size, recorded)
+        print(f"Saved {len(recorded)} raw frames at {size[0]}x{size[1]} to {args.record}")
+    else:
+        main(raw_paths=args.raw, n_frames=args.n_frames, host=args.host, port=args.port,
+             fake=args.fake, repeats=args.repeats)
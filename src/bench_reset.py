@@ -0,0 +1,47 @@
+# File: bench_reset.py
+# Resets per second: full actor teardown/respawn against in-place teleport reset.
+
+import argparse
+import time
+
+
+def bench_resets(env, n_resets, full_reset):
+    env.reset(seed=0)
+    start = time.perf_counter()
+    for i in range(n_resets):
+        env.step(env.action_space.sample())
+        env.reset(options={'full_reset': full_reset})
+    return n_resets / (time.perf_counter() - start)
+
+
+def main(host='localhost', port=2000, n_resets=10, fake=False):
+    if fake:
+        import fake_carla
+        fake_carla.install()
+    from carla_fusion_env import CarlaFusionEnv
+
+    env = CarlaFusionEnv(host=host, port=port)
+    try:
+        results = {
+            'full teardown': bench_resets(env, n_resets, full_reset=True),
+            'in-place': bench_resets(env, n_resets, full_reset=False),
+        }
+    finally:
+        env.close()
+
+    print(f"\n{'reset mode':<16}{'resets/s':>10}")
+    for mode, rate in results.items():
+        print(f"{mode:<16}{rate:>10.2f}")
+    print(f"Speed-up: {results['in-place'] / results['full teardown']:.1f}x")
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', type=str, default='localhost')
+    parser.add_argument('--port', type=int, default=2000)
+    parser.add_argument('--n_resets', type=int, default=10, help="Resets timed per mode")
+    parser.add_argument('--fake', action='store_true', help="Run against the in-process fake simulator")
+    args = parser.parse_args()
+
+    main(host=args.host, port=args.port, n_resets=args.n_resets, fake=args.fake)
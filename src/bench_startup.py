@@ -0,0 +1,39 @@
+# File: bench_startup.py
+# Env fleet startup cost: constructing many CarlaFusionEnvs against one simulator in one process.
+
+import argparse
+import time
+
+
+def main(n_envs=8, host='localhost', port=2000, map_name='Town01', fake=False, map_load_latency=0.0,
+         rpc_latency=0.0):
+    if fake:
+        import fake_carla
+        fake_carla.install(rpc_latency=rpc_latency, map_load_latency=map_load_latency)
+    from carla_fusion_env import CarlaFusionEnv
+
+    seconds = []
+    for _ in range(n_envs):
+        start = time.perf_counter()
+        env = CarlaFusionEnv(host=host, port=port, map_name=map_name, headless=True)
+        seconds.append(time.perf_counter() - start)
+        env.close()
+
+    print(f"\n{n_envs} envs on {map_name}: first {seconds[0]:.3f} s, "
+          f"later {sum(seconds[1:]) / max(len(seconds) - 1, 1):.3f} s each, total {sum(seconds):.3f} s")
+    return seconds
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n_envs', type=int, default=8)
+    parser.add_argument('--host', type=str, default='localhost')
+    parser.add_argument('--port', type=int, default=2000)
+    parser.add_argument('--map', type=str, default='Town01')
+    parser.add_argument('--fake', action='store_true', help="Run against the in-process fake simulator")
+    parser.add_argument('--map_load_latency', type=float, default=0.0, help="Seconds a fake map load takes")
+    parser.add_argument('--rpc_latency', type=float, default=0.0, help="Seconds every fake round-trip takes")
+    args = parser.parse_args()
+
+    main(n_envs=args.n_envs, host=args.host, port=args.port, map_name=args.map, fake=args.fake,
+         map_load_latency=args.map_load_latency, rpc_latency=args.rpc_latency)
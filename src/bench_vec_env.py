@@ -0,0 +1,65 @@
+# File: bench_vec_env.py
+# Vectorized env throughput: SubprocVecEnv (pickled observations) against SharedMemoryVecEnv,
+# and against MultiEgoVecEnv driving every ego in one world.
+
+import argparse
+import time
+
+import numpy as np
+
+from carla_vec_env import make_carla_vec_env
+
+
+def bench(vec_env, n_steps):
+    """Return (env steps/s, learner-side seconds per vec step spent in step_wait)."""
+    vec_env.reset()
+    actions = np.zeros(vec_env.num_envs, dtype=np.int64)
+    wait = 0.0
+    start = time.perf_counter()
+    for _ in range(n_steps):
+        vec_env.step_async(actions)
+        t = time.perf_counter()
+        vec_env.step_wait()
+        wait += time.perf_counter() - t
+    elapsed = time.perf_counter() - start
+    return n_steps * vec_env.num_envs / elapsed, wait / n_steps
+
+
+def main(n_envs=4, n_steps=300, endpoints=None, fake=False, tick_latency=0.0):
+    endpoints = endpoints or [f"localhost:{2000 + 2 * i}" for i in range(n_envs)]
+    env_kwargs = dict(headless=True)
+    configs = (
+        ('SubprocVecEnv', endpoints, dict(shared_memory=False)),
+        ('SharedMemoryVecEnv', endpoints, dict(shared_memory=True)),
+        # Same number of egos, all in the first endpoint's world
+        ('MultiEgoVecEnv', endpoints[:1], dict(egos_per_world=len(endpoints))),
+    )
+    rows = []
+    for name, config_endpoints, kwargs in configs:
+        vec_env = make_carla_vec_env(config_endpoints, env_kwargs=env_kwargs, seed=0, fake=fake,
+                                     fake_tick_latency=tick_latency, **kwargs)
+        try:
+            rows.append((name, *bench(vec_env, n_steps)))
+        finally:
+            vec_env.close()
+
+    print(f"\n{len(endpoints)} envs, {n_steps} vec steps")
+    print(f"{'vec env':<22}{'env steps/s':>12}{'step_wait ms':>14}")
+    for name, rate, wait in rows:
+        print(f"{name:<22}{rate:>12.1f}{wait * 1e3:>14.3f}")
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--n_envs', type=int, default=4, help="Fake envs to start when --endpoints is not given")
+    parser.add_argument('--n_steps', type=int, default=300)
+    parser.add_argument('--endpoints', nargs='+', default=None,
+                        help="Simulator endpoints as host[:port[:tm_port]], one env per endpoint")
+    parser.add_argument('--fake', action='store_true', help="Run against the in-process fake simulator")
+    parser.add_argument('--tick_latency', type=float, default=0.0,
+                        help="Seconds each fake world.tick() sleeps, standing in for simulation and rendering")
+    args = parser.parse_args()
+
+    main(n_envs=args.n_envs, n_steps=args.n_steps, endpoints=args.endpoints, fake=args.fake,
+         tick_latency=args.tick_latency)
@@ -0,0 +1,188 @@
+# File: bev_rasterizer.py
+# Multi-channel bird's-eye-view rasterization of CARLA LiDAR sweeps.
+
+import numpy as np
+
+CHANNELS = ('occupancy', 'density', 'max_height', 'mean_intensity')
+BINARY_CHANNELS = ('occupancy',)  # only ever 0 or 255, see CompactDictRolloutBuffer
+
+
+class BEVRasterizer:
+    """Bins a LiDAR sweep (N x 4 float32: x, y, z, intensity) into a uint8 [C, H, W] grid.
+
+    Columns follow the sensor x axis over `x_range`, rows the y axis over `y_range`,
+    both at `resolution` metres per cell; the default 20 x 20 m extent is centred on
+    the sensor. Every point is mapped to its cell once; all requested channels are
+    then reduced from that single flat index array:
+
+    - occupancy: 255 where at least one point landed
+    - density: log-scaled point count, saturating at `density_saturation` points
+    - max_height: highest z in the cell, scaled over `z_range`
+    - mean_intensity: mean return intensity in [0, 1], scaled to [0, 255]
+
+    Occupancy alone is a scatter of the cell indices. Any other channel sorts the
+    in-range points by cell once; counts, maxima and sums then come from the sorted
+    segments with np.add/np.maximum.reduceat, with no further pass over the sweep.
+    Scratch is preallocated and grown only when a larger sweep arrives; the sorted
+    path still allocates the temporary index lists np.compress builds.
+    """
+
+    def __init__(self, x_range=(-10.0, 10.0), y_range=(-10.0, 10.0), resolution=0.1,
+                 channels=('occupancy',), z_range=(-3.0, 3.0), density_saturation=16):
+        unknown = set(channels) - set(CHANNELS)
+        if unknown:
+            raise ValueError(f"Unknown BEV channels {sorted(unknown)}; choose from {CHANNELS}")
+        self.x_range = tuple(x_range)
+        self.y_range = tuple(y_range)
+        self.z_range = tuple(z_range)
+        self.resolution = resolution
+        self.channels = tuple(channels)
+        self.density_saturation = density_saturation
+
+        self.width = int(round((x_range[1] - x_range[0]) / resolution))
+        self.height = int(round((y_range[1] - y_range[0]) / resolution))
+        self.shape = (len(self.channels), self.height, self.width)
+        self._n_cells = self.height * self.width
+        self._sorted = any(name != 'occupancy' for name in self.channels)
+
+        # Per-point scratch, grown on demand; cell index n_cells collects out-of-range points
+        self._capacity = 0
+        self._grow(32000)
+        self._occupancy = np.empty(self._n_cells + 1, dtype=np.uint8)
+        # Per-cell scratch: a sweep never occupies more than n_cells cells
+        self._starts = np.empty(self._n_cells, dtype=np.int64)
+        self._cells = np.empty(self._n_cells, dtype=np.int64)
+        self._counts = np.empty(self._n_cells, dtype=np.int64)
+        self._cell_max = np.empty(self._n_cells, dtype=np.float32)
+        self._cell_sum = np.empty(self._n_cells, dtype=np.float64)
+        self._cell_count = np.empty(self._n_cells, dtype=np.float64)
+        self._cell_u8 = np.empty(self._n_cells, dtype=np.uint8)
+        self._density_lut = self._make_density_lut()
+
+    def _grow(self, n):
+        self._capacity = max(n, 2 * self._capacity)
+        self._coord = np.empty(self._capacity, dtype=np.float32)
+        self._ix = np.empty(self._capacity, dtype=np.int64)
+        self._iy = np.empty(self._capacity, dtype=np.int64)
+        self._valid_x = np.empty(self._capacity, dtype=bool)
+        self._valid_y = np.empty(self._capacity, dtype=bool)
+        if self._sorted:
+            self._keys = np.empty(self._capacity, dtype=np.int64)
+            self._arange = np.arange(self._capacity, dtype=np.int64)
+            self._column = np.empty(self._capacity, dtype=np.float32)
+            self._sorted_f64 = np.empty(self._capacity, dtype=np.float64)
+
+    def _make_density_lut(self):
+        counts = np.arange(self.density_saturation + 1, dtype=np.float64)
+        return np.round(np.log1p(counts) / np.log1p(self.density_saturation) * 255).astype(np.uint8)
+
+    def _cell_index(self, values, lo, size, index, valid):
+        coord = self._coord[:len(values)]
+        np.subtract(values, lo, out=coord)
+        np.multiply(coord, 1.0 / self.resolution, out=coord)
+        np.floor(coord, out=coord)
+        np.copyto(index, coord, casting='unsafe')
+        # Negative indices wrap to huge unsigned values, so one comparison checks both bounds
+        np.less(index.view(np.uint64), size, out=valid)
+
+    def rasterize(self, points, out=None):
+        """Rasterize an (N, 4) float32 point array; writes into `out` if given."""
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 4)
+        n = len(points)
+        if n > self._capacity:
+            self._grow(n)
+        if out is None:
+            out = np.empty(self.shape, dtype=np.uint8)
+
+        ix, iy = self._ix[:n], self._iy[:n]
+        valid, valid_y = self._valid_x[:n], self._valid_y[:n]
+        self._cell_index(points[:, 0], self.x_range[0], self.width, ix, valid)
+        self._cell_index(points[:, 1], self.y_range[0], self.height, iy, valid_y)
+        np.logical_and(valid, valid_y, out=valid)
+
+        flat = iy
+        np.multiply(iy, self.width, out=flat)
+        np.add(flat, ix, out=flat)
+
+        if not self._sorted:
+            np.logical_not(valid, out=valid)
+            np.putmask(flat, valid, self._n_cells)
+            occupancy = self._occupancy
+            occupancy.fill(0)
+            occupancy[flat] = 255
+            np.copyto(out[0].reshape(-1), occupancy[:self._n_cells])
+            return out
+
+        out.fill(0)  # every channel is 0 in empty cells
+        k, starts, cells, counts, order = self._segments(flat, valid)
+        if not k:
+            return out
+        for c, name in enumerate(self.channels):
+            grid = out[c].reshape(-1)
+            if name == 'occupancy':
+                grid[cells] = 255
+                continue
+            value = self._cell_u8[:k]
+            if name == 'density':
+                # Counts past the saturation clip to the LUT's last entry
+                np.take(self._density_lut, counts, out=value, mode='clip')
+            elif name == 'max_height':
+                z0, z1 = self.z_range
+                cell_max = self._cell_max[:k]
+                np.maximum.reduceat(self._gather(points[:, 2], order), starts, out=cell_max)
+                np.subtract(cell_max, z0, out=cell_max)
+                np.multiply(cell_max, 255.0 / (z1 - z0), out=cell_max)
+                np.clip(cell_max, 0, 255, out=cell_max)
+                np.copyto(value, cell_max, casting='unsafe')
+            elif name == 'mean_intensity':
+                cell_sum, cell_count = self._cell_sum[:k], self._cell_count[:k]
+                sorted_values = self._sorted_f64[:len(order)]
+                np.copyto(sorted_values, self._gather(points[:, 3], order))
+                np.add.reduceat(sorted_values, starts, out=cell_sum)
+                np.copyto(cell_count, counts)
+                np.divide(cell_sum, cell_count, out=cell_sum)
+                np.multiply(cell_sum, 255.0, out=cell_sum)
+                np.clip(cell_sum, 0, 255, out=cell_sum)
+                np.copyto(value, cell_sum, casting='unsafe')
+            grid[cells] = value
+        return out
+
+    def _gather(self, column, order):
+        """column[order] via contiguous scratch; take() would copy a strided column and buffer mode='raise'."""
+        np.copyto(self._coord[:len(column)], column)
+        sorted_values = self._column[:len(order)]
+        return np.take(self._coord[:len(column)], order, out=sorted_values, mode='clip')
+
+    def _segments(self, flat, valid):
+        """Sort the in-range points by cell once.
+
+        Returns (k, starts, cells, counts, order): the k occupied cells, where each one's
+        run begins in the sorted order, its point count, and the point indices in that order.
+        """
+        n = len(flat)
+        m = int(np.count_nonzero(valid))
+        # One int64 key per point: cell in the high half, point index in the low half
+        keys = self._keys[:m]
+        scratch = self._ix[:n]
+        np.left_shift(flat, 32, out=scratch)
+        np.bitwise_or(scratch, self._arange[:n], out=scratch)
+        np.compress(valid, scratch, out=keys)
+        keys.sort()
+
+        cell_of = self._iy[:m]
+        order = self._ix[:m]
+        np.right_shift(keys, 32, out=cell_of)
+        np.bitwise_and(keys, 0xFFFFFFFF, out=order)
+        if not m:
+            return 0, None, None, None, order
+
+        edges = self._valid_y[:m]
+        edges[0] = True
+        np.not_equal(cell_of[1:], cell_of[:-1], out=edges[1:])
+        k = int(np.count_nonzero(edges))
+        starts = np.compress(edges, self._arange[:m], out=self._starts[:k])
+        cells = np.take(cell_of, starts, out=self._cells[:k], mode='clip')
+        counts = self._counts[:k]
+        np.subtract(starts[1:], starts[:-1], out=counts[:-1])
+        counts[-1] = m - starts[-1]
+        return k, starts, cells, counts, order
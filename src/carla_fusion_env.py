@@ -4,143 +4,269 @@ import carla
 import gymnasium as gym
 import numpy as np
 import time
-import cv2
 import random
+from concurrent.futures import Future, ThreadPoolExecutor
+from actor_lifecycle import destroy_actors, spawn_attached
+from observation_processor import ObservationProcessor
+from sensor_sync import SensorSynchronizer, SensorTimeout
+from step_timer import NullStepTimer, StepTimer
+from world_manager import get_world_manager, map_basename
+
+FIXED_DELTA_SECONDS = 0.05  # 20 FPS
+
+
+def set_sensor_tick(bp, action_repeat):
+    # Capture every action_repeat-th tick; half a tick of slack absorbs float drift
+    if action_repeat > 1:
+        bp.set_attribute('sensor_tick', str((action_repeat - 0.5) * FIXED_DELTA_SECONDS))
+
+
+def sensor_rig_specs(blueprint_library, camera_size, headless=False, action_repeat=1):
+    """[(blueprint, transform)] of the RGB camera, depth camera and LiDAR, relative to the ego vehicle."""
+    def camera(bp_name):
+        bp = blueprint_library.find(bp_name)
+        bp.set_attribute('image_size_x', str(camera_size[0]))
+        bp.set_attribute('image_size_y', str(camera_size[1]))
+        bp.set_attribute('fov', '90')
+        # Nobody looks at the frames in headless mode; bloom, lens flares etc. only cost render time.
+        # no_rendering_mode itself is not an option: it blanks camera sensors too.
+        if headless and bp.has_attribute('enable_postprocess_effects'):
+            bp.set_attribute('enable_postprocess_effects', 'False')
+        set_sensor_tick(bp, action_repeat)
+        return bp, carla.Transform(carla.Location(x=1.5, z=2.4))
+
+    lidar_bp = blueprint_library.find('sensor.lidar.ray_cast')
+    lidar_bp.set_attribute('range', '50')
+    lidar_bp.set_attribute('rotation_frequency', '10')
+    lidar_bp.set_attribute('channels', '32')
+    lidar_bp.set_attribute('points_per_second', '32000')
+    set_sensor_tick(lidar_bp, action_repeat)
+    return [camera('sensor.camera.rgb'), camera('sensor.camera.depth'),
+            (lidar_bp, carla.Transform(carla.Location(z=2.5)))]
+
 
 class CarlaFusionEnv(gym.Env):
-    def __init__(self, rear_chase_camera=True, random_spawn=True, map_name="Town01", reward_fn=None):
+    def __init__(self, rear_chase_camera=True, random_spawn=True, map_name="Town01", reward_fn=None,
+                 host='localhost', port=2000, tm_port=8000, sensor_timeout=2.0, fast_reset=True,
+                 image_size=128, camera_size=None, bev_config=None, timing=False, timing_window=1000,
+                 headless=False, action_repeat=1, pipeline=False):
         super().__init__()
 
+        # Pipelined decoding: a worker thread waits for and decodes each decision frame behind
+        # the next step's control and world.tick(), so step() returns the previous frame's
+        # observation. info['frame'] always names the frame returned; see _pipelined_obs().
+        self.pipeline = pipeline
+        self._decode_thread = ThreadPoolExecutor(1, thread_name_prefix='decode') if pipeline else None
+        self._lagged = None  # Future of the observation the next pipelined step returns
+
+        # Each decision is held for action_repeat ticks; sensors only capture the last one
+        if action_repeat < 1:
+            raise ValueError("action_repeat must be >= 1")
+        self.action_repeat = action_repeat
+
+        # Headless training skips debug prints, traffic-light queries and the chase camera,
+        # and reads ego speed from the per-tick world snapshot instead of per-attribute RPCs
+        self.headless = headless
+
+        # Per-stage step timing; see get_step_stats(). Disabled timers are no-ops.
+        self.step_timer = StepTimer(timing_window) if timing else NullStepTimer()
+
         # Store reward function
         self.reward_fn = reward_fn or self._default_reward_fn
 
-        # Connect to CARLA
-        self.client = carla.Client('localhost', 2000)
-        self.client.set_timeout(10.0)
-
-        self.world = self.client.get_world()
-        if map_name != self.world.get_map().name:
-            self.client.load_world(map_name)
-            # Wait for map to fully load
-            max_wait = 10  # seconds
-            for i in range(max_wait * 10):
-                self.world = self.client.get_world()
-                if self.world.get_map().name.endswith(map_name):
-                    break
-                time.sleep(0.1)
-            else:
-                raise RuntimeError(f"Timeout waiting for {map_name} to load")
-
-        settings = self.world.get_settings()
-        settings.synchronous_mode = True
-        settings.fixed_delta_seconds = 0.05  # 20 FPS
-        self.world.apply_settings(settings)
-
-        self.blueprint_library = self.world.get_blueprint_library()
-        self.vehicle_bp = self.blueprint_library.filter('model3')[0]
-        spawn_points = self.world.get_map().get_spawn_points()
+        # Connect to CARLA through the process-wide manager for this endpoint, which
+        # only loads the map if it changes and caches spawn points and blueprints per map
+        self.host, self.port, self.tm_port = host, port, tm_port
+        self.world_manager = get_world_manager(host, port)
+        self.client = self.world_manager.client
+        self.random_spawn = random_spawn
+        self._load_map(map_name)
         if random_spawn:
-            self.spawn_point = random.choice(spawn_points)
+            self.spawn_point = random.choice(self.spawn_points)
         else:
-            self.spawn_point = spawn_points[0]
+            self.spawn_point = self.spawn_points[0]
 
+        # Keep vehicle and sensors alive across episodes; see reset()
+        self.fast_reset = fast_reset
         self.rear_chase_camera = rear_chase_camera
 
         self.rgb, self.depth, self.lidar = None, None, None
-        self.rgb_data, self.depth_data, self.lidar_data = None, None, None
+        self.sensor_timeout = sensor_timeout
+        self.sensor_sync = None
+
+        # Cameras render at camera_size (default: the observation size) and are decoded in place
+        # The pipeline keeps one more buffer set in flight, so returned observations stay
+        # valid for the same one further call either way
+        self.processor = ObservationProcessor(image_size=image_size, camera_size=camera_size, bev_config=bev_config,
+                                              num_buffers=3 if pipeline else 2)
 
         # Observation and action space
         self.observation_space = gym.spaces.Dict({
-            'rgb': gym.spaces.Box(0, 255, shape=(3, 128, 128), dtype=np.uint8),
-            'depth': gym.spaces.Box(0, 255, shape=(1, 128, 128), dtype=np.uint8),
-            'lidar': gym.spaces.Box(0, 255, shape=(1, 200, 200), dtype=np.uint8),
+            key: gym.spaces.Box(0, 255, shape=shape, dtype=np.uint8)
+            for key, shape in self.processor.shapes.items()
         })
         self.action_space = gym.spaces.Discrete(3)  # left, straight, right
 
         self.vehicle = None
         self._setup_vehicle_and_sensors()
 
+    def _load_map(self, map_name):
+        self.world = self.world_manager.load_map(map_name)
+        self._apply_sync_settings()
+
+        # Each simulator needs its own Traffic Manager port when several run on one host
+        self.traffic_manager = self.world_manager.traffic_manager(self.tm_port)
+
+        map_info = self.world_manager.map_info()
+        self.blueprint_library = map_info.blueprint_library
+        self.vehicle_bp = self.blueprint_library.filter('model3')[0]
+        self.spawn_points = map_info.spawn_points
+
+    def _apply_sync_settings(self):
+        self.world_manager.apply_settings(True, FIXED_DELTA_SECONDS)
+
     def _setup_vehicle_and_sensors(self):
-        # Destroy lingering actors
-        for actor in self.world.get_actors():
-            if actor.type_id.startswith("vehicle.") or actor.type_id.startswith("sensor."):
-                actor.destroy()
-
-        self.vehicle = self.world.try_spawn_actor(self.vehicle_bp, self.spawn_point)
-        if self.vehicle is None:
-            raise RuntimeError("Spawn failed even after cleanup. Try restarting CARLA.")
-
-        def spawn_sensor(bp_name, transform):
-            bp = self.blueprint_library.find(bp_name)
-            bp.set_attribute('image_size_x', '800')
-            bp.set_attribute('image_size_y', '600')
-            bp.set_attribute('fov', '90')
-            return self.world.spawn_actor(bp, transform, attach_to=self.vehicle)
-
-        self.rgb = spawn_sensor('sensor.camera.rgb', carla.Transform(carla.Location(x=1.5, z=2.4)))
-        self.depth = spawn_sensor('sensor.camera.depth', carla.Transform(carla.Location(x=1.5, z=2.4)))
-
-        lidar_bp = self.blueprint_library.find('sensor.lidar.ray_cast')
-        lidar_bp.set_attribute('range', '50')
-        lidar_bp.set_attribute('rotation_frequency', '10')
-        lidar_bp.set_attribute('channels', '32')
-        lidar_bp.set_attribute('points_per_second', '32000')
-        self.lidar = self.world.spawn_actor(
-            lidar_bp, carla.Transform(carla.Location(z=2.5)), attach_to=self.vehicle)
-
-        self.rgb.listen(lambda img: setattr(self, 'rgb_data', img))
-        self.depth.listen(lambda img: setattr(self, 'depth_data', img))
-        self.lidar.listen(lambda pc: setattr(self, 'lidar_data', pc))
+        # Destroy lingering actors in one batch
+        destroy_actors(self.client, [actor for actor in self.world.get_actors()
+                                     if actor.type_id.startswith(("vehicle.", "sensor."))])
+
+        # The vehicle, then its three sensors: one batch each
+        rig = sensor_rig_specs(self.blueprint_library, self.processor.camera_size,
+                               headless=self.headless, action_repeat=self.action_repeat)
+        (vehicle,), (sensors,), errors = spawn_attached(self.client, self.world,
+                                                        [(self.vehicle_bp, self.spawn_point)], rig)
+        if vehicle is None:
+            raise RuntimeError(f"Spawn failed even after cleanup ({errors[0]}). Try restarting CARLA.")
+        self.vehicle = vehicle
+        self.rgb, self.depth, self.lidar = sensors
+
+        # Measurements are queued per sensor and matched to the frame returned by world.tick()
+        self.sensor_sync = SensorSynchronizer(('rgb', 'depth', 'lidar'), timeout=self.sensor_timeout)
+        self.rgb.listen(self.sensor_sync.callback('rgb'))
+        self.depth.listen(self.sensor_sync.callback('depth'))
+        self.lidar.listen(self.sensor_sync.callback('lidar'))
+
+        # _cleanup() leaves the world asynchronous; frame-locked delivery needs it synchronous
+        self._apply_sync_settings()
 
     def reset(self, *, seed=None, options=None):
         super().reset(seed=seed)
         if seed is not None:
             self.action_space.seed(seed)
             self.observation_space.seed(seed)
-            
-        self._cleanup()
-        time.sleep(0.5)
-        self._setup_vehicle_and_sensors()
-        time.sleep(0.5)
-        
-        observation = self._get_obs()
-        info = {}  # You can populate this with metadata if needed
+        options = options or {}
+        self._drain_pipeline()
+
+        # options={'map_name': ...} moves the env to another map; see world_manager.group_by_map
+        map_name = options.get('map_name')
+        if map_name is not None and map_basename(map_name) != self.world_manager.map_name:
+            self._cleanup()
+            self._load_map(map_name)
+            if not self.random_spawn:
+                self.spawn_point = self.spawn_points[0]
+
+        if self.random_spawn:
+            self.spawn_point = self.spawn_points[self.np_random.integers(len(self.spawn_points))]
+
+        observation = None
+        if self.fast_reset and self.vehicle is not None and not options.get('full_reset', False):
+            try:
+                observation, frame = self._reset_in_place()
+            except RuntimeError:
+                # Lost actor, RPC error or sensor timeout: fall back to a full teardown
+                observation = None
+
+        if observation is None:
+            self._cleanup()
+            time.sleep(0.5)
+            self._setup_vehicle_and_sensors()
+            time.sleep(0.5)
+
+            observation, frame = self._first_observation()
+
+        info = {'frame': frame}
+        if self.pipeline:
+            self._lagged = Future()
+            self._lagged.set_result((frame, observation))
 
         self.step_counter = 0
+        self.stuck_counter = 0
         return observation, info
 
+    def _reset_in_place(self, max_ticks=3):
+        """Teleport the existing ego to self.spawn_point instead of respawning actors."""
+        if not self.vehicle.is_alive:
+            raise RuntimeError("Ego vehicle no longer exists")
+        self.vehicle.apply_control(carla.VehicleControl())
+        self.vehicle.set_target_velocity(carla.Vector3D())
+        self.vehicle.set_target_angular_velocity(carla.Vector3D())
+        self.vehicle.set_transform(self.spawn_point)
+
+        # Frames queued before the teleport belong to the previous episode
+        self.sensor_sync.flush()
+        for _ in range(max_ticks):
+            # A whole decision interval keeps the sensors' capture grid aligned with step()
+            frame = self._tick_decision()
+            try:
+                return self._get_obs(frame), frame
+            except SensorTimeout:
+                continue
+        raise SensorTimeout(f"No fresh sensor frames after {max_ticks} ticks")
+
     def step(self, action):
-        v_loc = self.vehicle.get_location()
-        v_vel = self.vehicle.get_velocity()
-        speed = (v_vel.x**2 + v_vel.y**2 + v_vel.z**2)**0.5 * 3.6  # convert m/s to km/h
-        print(f"[DEBUG] Location: ({v_loc.x:.1f}, {v_loc.y:.1f}), Speed: {speed:.1f} km/h")
+        timer = self.step_timer
+        timer.start()
+        if self.headless:
+            v_vel = self._snapshot_velocity()
+            speed = (v_vel.x**2 + v_vel.y**2 + v_vel.z**2)**0.5 * 3.6  # convert m/s to km/h
+        else:
+            v_loc = self.vehicle.get_location()
+            v_vel = self.vehicle.get_velocity()
+            speed = (v_vel.x**2 + v_vel.y**2 + v_vel.z**2)**0.5 * 3.6  # convert m/s to km/h
+            print(f"[DEBUG] Location: ({v_loc.x:.1f}, {v_loc.y:.1f}), Speed: {speed:.1f} km/h")
 
-        tl = self.vehicle.get_traffic_light()
-        if tl is not None:
-            state = tl.get_state()
-            print(f"[DEBUG] Traffic light state: {state}")
+            tl = self.vehicle.get_traffic_light()
+            if tl is not None:
+                state = tl.get_state()
+                print(f"[DEBUG] Traffic light state: {state}")
+        timer.lap('state')
 
         control = carla.VehicleControl()
         control.throttle = 0.8
         control.steer = {-1: -0.5, 0: 0.0, 1: 0.5}[action - 1]
         self.vehicle.apply_control(control)
+        timer.lap('control')
+
+        if not self.headless:
+            self._update_spectator()
+        timer.lap('spectator')
+
+        # The control holds for action_repeat ticks. Every tick is scored, and all of them
+        # run even after termination so decision frames stay on the sensors' sensor_tick grid.
+        total_reward, terminated = 0.0, False
+        for i in range(self.action_repeat):
+            if i:
+                speed = self._ego_speed()
+                timer.lap('state')
+            frame = self.world.tick()
+            timer.lap('tick')
+            reward, tick_terminated = self._tick_reward(speed)
+            if not terminated:
+                total_reward += reward
+                terminated = tick_terminated
+            timer.lap('reward')
 
-        spectator = self.world.get_spectator()
-        transform = self.vehicle.get_transform()
-        if self.rear_chase_camera:
-            spectator.set_transform(carla.Transform(
-                transform.location + carla.Location(x=-6, z=3),
-                transform.rotation
-            ))
+        truncated = self.step_counter >= 200  # ~10 seconds
+        if self.pipeline:
+            obs, frame = self._pipelined_obs(frame, terminated or truncated)
         else:
-            spectator.set_transform(carla.Transform(
-                transform.location + carla.Location(z=20),
-                carla.Rotation(pitch=-90)
-            ))
-
-        self.world.tick()
-        obs = self._get_obs()
+            obs = self._get_obs(frame)
+        info = {'frame': frame, 'dropped_frames': self.sensor_sync.dropped_frames, 'ticks': self.action_repeat}
+        if timer.enabled:
+            info['timing'] = timer.end()
+        return obs, total_reward, terminated, truncated, info
 
+    def _tick_reward(self, speed):
         # Count low-speed frames
         self.stuck_counter = getattr(self, "stuck_counter", 0)
         if speed < 0.5:
@@ -157,70 +283,119 @@ class CarlaFusionEnv(gym.Env):
 
         self.step_counter = getattr(self, "step_counter", 0)
         self.step_counter += 1
-        truncated = self.step_counter >= 200  # ~10 seconds
-        return obs, reward, terminated, truncated, {}
-
-    def _get_obs(self):
-        while self.rgb_data is None or self.depth_data is None or self.lidar_data is None:
-            time.sleep(0.05)
-
-        # RGB: [0, 255] and uint8
-        rgb = np.frombuffer(self.rgb_data.raw_data, dtype=np.uint8).reshape((600, 800, 4))[:, :, :3]
-        rgb = cv2.resize(rgb, (128, 128))
-        rgb = rgb.transpose(2, 0, 1).astype(np.uint8)
-
-        # Depth processing - fixed to avoid overflow
-        raw_depth = np.frombuffer(self.depth_data.raw_data, dtype=np.uint8).reshape((600, 800, 4))
-        # Use a simpler approach: just use the first channel as depth
-        depth_raw = raw_depth[:, :, 0].astype(np.float32)
-        depth_meters = depth_raw / 255.0 * 100  # Scale to reasonable range
-        depth = cv2.resize(depth_meters, (128, 128))[np.newaxis, :, :].astype(np.float32)
-        depth = np.clip(depth, 0, 100.0) / 100.0
-        # Depth: normalize to [0, 255] and convert to uint8
-        depth = (depth * 255).clip(0, 255).astype(np.uint8)
-
-        # LiDAR processing - ensure float32
-        lidar_array = np.frombuffer(self.lidar_data.raw_data, dtype=np.float32).reshape(-1, 4)[:, :3]
-        bev = np.zeros((200, 200), dtype=np.float32)
-        x = ((lidar_array[:, 0] + 10.0) / 0.1).astype(int)
-        y = ((lidar_array[:, 1]) / 0.1).astype(int)
-        mask = (x >= 0) & (x < 200) & (y >= 0) & (y < 200)
-        bev[y[mask], x[mask]] = 1.0
-        lidar = bev[np.newaxis, :, :].astype(np.float32)
-        # LiDAR: BEV binary already in [0, 1], scale to [0, 255]
-        lidar = (lidar * 255).astype(np.uint8)
-
-        return {
-            'rgb': rgb,
-            'depth': depth,
-            'lidar': lidar,
-        }
+        return reward, terminated
+
+    def _ego_speed(self):
+        v_vel = self._snapshot_velocity() if self.headless else self.vehicle.get_velocity()
+        return (v_vel.x**2 + v_vel.y**2 + v_vel.z**2)**0.5 * 3.6  # convert m/s to km/h
+
+    def _tick_decision(self):
+        """Advance one decision interval (action_repeat ticks) and return the last frame."""
+        for _ in range(self.action_repeat):
+            frame = self.world.tick()
+        return frame
+
+    def _first_observation(self):
+        """Tick freshly spawned sensors until they deliver a frame, which sets the decision grid."""
+        for _ in range(self.action_repeat - 1):
+            frame = self.world.tick()
+            # Frames between captures never arrive, so these attempts only wait briefly
+            try:
+                return self._get_obs(frame, min(self.sensor_timeout, 0.25)), frame
+            except SensorTimeout:
+                continue
+        frame = self.world.tick()
+        return self._get_obs(frame), frame
+
+    def _snapshot_velocity(self):
+        # The client caches the snapshot streamed with every tick, so this is not a round-trip
+        actor = self.world.get_snapshot().find(self.vehicle.id)
+        if actor is None:
+            raise RuntimeError("Ego vehicle missing from world snapshot")
+        return actor.get_velocity()
+
+    def _update_spectator(self):
+        spectator = self.world.get_spectator()
+        transform = self.vehicle.get_transform()
+        if self.rear_chase_camera:
+            spectator.set_transform(carla.Transform(
+                transform.location + carla.Location(x=-6, z=3),
+                transform.rotation
+            ))
+        else:
+            spectator.set_transform(carla.Transform(
+                transform.location + carla.Location(z=20),
+                carla.Rotation(pitch=-90)
+            ))
+
+    def get_step_stats(self):
+        """Rolling per-stage step latency {stage: {'mean_ms', 'p50_ms', ...}}; empty unless timing=True."""
+        return self.step_timer.stats()
+
+    def _get_obs(self, frame, timeout=None):
+        # Block until all three sensors have delivered this exact frame
+        data = self.sensor_sync.get(frame, timeout)
+        self.step_timer.lap('sensor_wait')
+        obs = self.processor.process(data['rgb'].raw_data, data['depth'].raw_data, data['lidar'].raw_data)
+        self.step_timer.lap('decode')
+        return obs
+
+    def _decode_frame(self, frame):
+        # Runs on the decode thread, so it must not touch the step timer
+        data = self.sensor_sync.get(frame)
+        return frame, self.processor.process(data['rgb'].raw_data, data['depth'].raw_data, data['lidar'].raw_data)
+
+    def _pipelined_obs(self, frame, episode_over):
+        """Queue `frame` for decoding; return (observation, its frame) from one decision interval earlier.
+
+        The returned observation is the previous step's frame, decoded while this step's control
+        and ticks ran. At the end of an episode the terminal observation must be `frame` itself,
+        so that step waits for it instead. Sensor timeouts surface when the frame is waited for.
+        Time spent waiting is charged to the 'decode' stage.
+        """
+        pending = self._decode_thread.submit(self._decode_frame, frame)
+        if episode_over:
+            self._lagged = None
+        else:
+            pending, self._lagged = self._lagged, pending
+        obs_frame, obs = pending.result()
+        self.step_timer.lap('decode')
+        return obs, obs_frame
+
+    def _drain_pipeline(self):
+        """Wait out a decode still in flight, e.g. when reset() cuts an episode short."""
+        lagged, self._lagged = self._lagged, None
+        if lagged is not None:
+            lagged.exception()
 
     def close(self):
+        self._drain_pipeline()
         self._cleanup()
+        if self._decode_thread is not None:
+            self._decode_thread.shutdown()
 
     def _cleanup(self):
-        if self.vehicle:
-            self.vehicle.destroy()
-            self.vehicle = None
+        sensors = [sensor for sensor in (self.rgb, self.depth, self.lidar) if sensor]
+        for sensor in sensors:
+            sensor.stop()
+        # Sensors and vehicle in one batch; actors that are already gone are not an error here
+        destroy_actors(self.client, sensors + [self.vehicle])
+        self.vehicle = None
+        self.rgb, self.depth, self.lidar = None, None, None
 
         if self.world:
-            settings = self.world.get_settings()
-            settings.synchronous_mode = False
-            self.world.apply_settings(settings)
-
-        for sensor in [self.rgb, self.depth, self.lidar]:
-            if sensor:
-                sensor.stop()
-                sensor.destroy()
-        self.rgb, self.depth, self.lidar = None, None, None
+            self.world_manager.apply_settings(False)
 
     def _default_reward_fn(self, speed, stuck_counter, step_counter):
         """Default reward function that can be overridden."""
-        reward = speed / 10.0
-        terminated = stuck_counter > 30  # ~1.5 seconds stuck
-        if terminated:
-            reward -= 5.0
-        if speed < 0.5:
-            reward -= 0.1
-        return reward, terminated
+        return default_reward_fn(speed, stuck_counter, step_counter)
+
+
+def default_reward_fn(speed, stuck_counter, step_counter):
+    reward = speed / 10.0
+    terminated = stuck_counter > 30  # ~1.5 seconds stuck
+    if terminated:
+        reward -= 5.0
+    if speed < 0.5:
+        reward -= 0.1
+    return reward, terminated
@@ -0,0 +1,111 @@
+# File: carla_vec_env.py
+# Builds one CarlaFusionEnv worker per simulator endpoint for SB3 vectorized training.
+
+from stable_baselines3.common.monitor import Monitor
+from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv, VecMonitor
+
+from shm_vec_env import SharedMemoryVecEnv
+
+DEFAULT_PORT = 2000
+TM_PORT_OFFSET = 6000  # CARLA's defaults: RPC 2000 -> Traffic Manager 8000
+
+
+def parse_endpoint(spec):
+    """Turn 'host', 'host:port', 'host:port:tm_port' or a tuple into (host, port, tm_port)."""
+    if isinstance(spec, str):
+        spec = spec.split(':')
+    spec = list(spec)
+    host = spec[0] or 'localhost'
+    port = int(spec[1]) if len(spec) > 1 else DEFAULT_PORT
+    tm_port = int(spec[2]) if len(spec) > 2 else port + TM_PORT_OFFSET
+    return host, port, tm_port
+
+
+def check_distinct_endpoints(parsed):
+    """Raise ValueError if two parsed endpoints share an RPC or Traffic Manager port on the same host."""
+    rpc = [(host, port) for host, port, _ in parsed]
+    if len(set(rpc)) != len(rpc):
+        raise ValueError(f"Duplicate simulator endpoints: {rpc}")
+    tm = [(host, tm_port) for host, _, tm_port in parsed]
+    if len(set(tm)) != len(tm):
+        raise ValueError(f"Duplicate Traffic Manager ports: {tm}")
+
+
+def make_env_fn(host, port, tm_port, env_kwargs=None, seed=None, fake=False, fake_tick_latency=0.0):
+    """Return a picklable thunk that builds a monitored CarlaFusionEnv inside the worker process."""
+    env_kwargs = dict(env_kwargs or {})
+
+    def _init():
+        if fake:
+            import fake_carla
+            fake_carla.install(tick_latency=fake_tick_latency)
+        from carla_fusion_env import CarlaFusionEnv
+
+        env = CarlaFusionEnv(host=host, port=port, tm_port=tm_port, **env_kwargs)
+        if seed is not None:
+            env.reset(seed=seed)
+        return Monitor(env)
+
+    return _init
+
+
+def make_carla_vec_env(endpoints, env_kwargs=None, seed=None, fake=False, fake_tick_latency=0.0,
+                       start_method=None, use_subprocess=True, shared_memory=False, egos_per_world=1):
+    """Start one env worker per simulator endpoint.
+
+    Every CarlaFusionEnv clears all vehicles and sensors in its world, so two envs
+    must never share an endpoint. With fake=True the workers run against
+    fake_carla instead of a live simulator. shared_memory=True returns observations
+    through a SharedMemoryVecEnv instead of pickling them over the worker pipes.
+    egos_per_world > 1 instead drives that many egos in the single endpoint's world
+    from this process with a MultiEgoVecEnv.
+    """
+    parsed = [parse_endpoint(e) for e in endpoints]
+    if not parsed:
+        raise ValueError("At least one simulator endpoint is required")
+    if egos_per_world > 1:
+        if len(parsed) > 1:
+            raise ValueError("egos_per_world > 1 runs every ego in one world; pass a single endpoint")
+        return make_multi_ego_vec_env(parsed[0], egos_per_world, env_kwargs, seed=seed, fake=fake,
+                                      fake_tick_latency=fake_tick_latency)
+    check_distinct_endpoints(parsed)
+
+    env_fns = [
+        make_env_fn(host, port, tm_port, env_kwargs,
+                    seed=None if seed is None else seed + i,
+                    fake=fake, fake_tick_latency=fake_tick_latency)
+        for i, (host, port, tm_port) in enumerate(parsed)
+    ]
+    if not use_subprocess:
+        return DummyVecEnv(env_fns)
+    if shared_memory:
+        return SharedMemoryVecEnv(env_fns, start_method=start_method)
+    return SubprocVecEnv(env_fns, start_method=start_method)
+
+
+# CarlaFusionEnv options that have a MultiEgoVecEnv counterpart; the rest only concern single-ego envs
+MULTI_EGO_KWARGS = ('map_name', 'reward_fn', 'sensor_timeout', 'image_size', 'camera_size', 'bev_config',
+                    'action_repeat', 'timing', 'timing_window')
+# CarlaFusionEnv options a MultiEgoVecEnv has no switch for, and the value it always behaves as
+MULTI_EGO_FIXED = {'headless': True, 'fast_reset': True, 'pipeline': False}
+
+
+def make_multi_ego_vec_env(endpoint, n_egos, env_kwargs=None, seed=None, fake=False, fake_tick_latency=0.0):
+    """A monitored MultiEgoVecEnv with `n_egos` egos in the world at `endpoint`."""
+    if fake:
+        import fake_carla
+        fake_carla.install(tick_latency=fake_tick_latency)
+    from multi_ego_vec_env import MultiEgoVecEnv
+
+    host, port, tm_port = parse_endpoint(endpoint)
+    kwargs = dict(env_kwargs or {})
+    for key, value in MULTI_EGO_FIXED.items():
+        if kwargs.pop(key, value) != value:
+            raise ValueError(f"MultiEgoVecEnv only supports {key}={value}")
+    unsupported = sorted(set(kwargs) - set(MULTI_EGO_KWARGS))
+    if unsupported:
+        raise ValueError(f"MultiEgoVecEnv does not support {', '.join(unsupported)}")
+    vec_env = MultiEgoVecEnv(n_egos, host=host, port=port, tm_port=tm_port, **kwargs)
+    if seed is not None:
+        vec_env.seed(seed)
+    return VecMonitor(vec_env)
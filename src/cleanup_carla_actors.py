@@ -1,11 +1,16 @@
 # File: cleanup_carla_actors.py
 
-import carla
+import argparse
 
-def main():
-    client = carla.Client('localhost', 2000)
-    client.set_timeout(5.0)
-    world = client.get_world()
+def main(host='localhost', port=2000, fake=False):
+    if fake:
+        import fake_carla
+        fake_carla.install()
+    from actor_lifecycle import destroy_actors
+    from world_manager import get_world_manager
+
+    manager = get_world_manager(host, port, timeout=5.0)
+    world = manager.world
 
     actors = world.get_actors()
     print(f"\nConnected. Total actors in world: {len(actors)}")
@@ -20,9 +25,19 @@ def main():
     print(f"Destroying {len(to_destroy)} vehicle/sensor/walker actors...")
     for actor in to_destroy:
         print(f" - {actor.type_id} ({actor.id})")
-        actor.destroy()
+        if actor.type_id.startswith('sensor.') and actor.is_listening:
+            actor.stop()
+    # One batch for all of them; failures are reported per actor
+    errors = destroy_actors(manager.client, to_destroy)
+    for actor_id, error in errors.items():
+        print(f"⚠️ {actor_id}: {error}")
 
-    print("✅ Cleanup complete.")
+    print("✅ Cleanup complete." if not errors else f"Cleanup finished with {len(errors)} failures.")
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', type=str, default='localhost')
+    parser.add_argument('--port', type=int, default=2000)
+    parser.add_argument('--fake', action='store_true', help="Clean the in-process fake simulator")
+    args = parser.parse_args()
+    main(args.host, args.port, args.fake)
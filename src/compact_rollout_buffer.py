@@ -0,0 +1,120 @@
+# File: compact_rollout_buffer.py
+# PPO rollout buffer that keeps Dict observations compact until a minibatch is sampled.
+
+import numpy as np
+from stable_baselines3.common.buffers import DictRolloutBuffer
+from stable_baselines3.common.type_aliases import DictRolloutBufferSamples
+
+from bev_rasterizer import BINARY_CHANNELS
+
+
+def lidar_packed_channels(bev_config=None):
+    """packed_channels for CarlaFusionEnv: the binary channels of its LiDAR BEV grid."""
+    channels = (bev_config or {}).get('channels', ('occupancy',))
+    return {'lidar': [i for i, name in enumerate(channels) if name in BINARY_CHANNELS]}
+
+
+class CompactDictRolloutBuffer(DictRolloutBuffer):
+    """DictRolloutBuffer that stores observations in their space's dtype and bit-packs binary channels.
+
+    `packed_channels` maps an observation key to the indices of channels that only hold
+    0 or 255 (e.g. BEV occupancy); those are kept with np.packbits, 1 bit per cell, and any
+    nonzero value comes back as 255. Everything stays in its [n_steps, n_envs] layout:
+    get() does not flatten the observations, and each minibatch is gathered, unpacked and
+    converted to float32 only when it is sampled.
+    """
+
+    def __init__(self, buffer_size, observation_space, action_space, device='auto', gae_lambda=1, gamma=0.99,
+                 n_envs=1, packed_channels=None):
+        self.packed_channels = {key: sorted(channels) for key, channels in (packed_channels or {}).items()
+                                if channels}
+        for key, channels in self.packed_channels.items():
+            shape = observation_space[key].shape
+            if len(shape) != 3 or not all(0 <= c < shape[0] for c in channels):
+                raise ValueError(f"Cannot pack channels {channels} of {key!r} with shape {shape}")
+        super().__init__(buffer_size, observation_space, action_space, device=device, gae_lambda=gae_lambda,
+                         gamma=gamma, n_envs=n_envs)
+
+    def reset(self):
+        super().reset()
+        self.packed = {}
+        self._plain_channels = {}
+        for key, channels in self.packed_channels.items():
+            n_channels, h, w = self.obs_shape[key]
+            plain = [c for c in range(n_channels) if c not in channels]
+            self._plain_channels[key] = plain
+            self.observations[key] = np.zeros((self.buffer_size, self.n_envs, len(plain), h, w),
+                                              dtype=self.observation_space[key].dtype)
+            self.packed[key] = np.zeros((self.buffer_size, self.n_envs, len(channels), -(-h * w // 8)),
+                                        dtype=np.uint8)
+
+    def nbytes(self):
+        """Bytes held by the stored observations."""
+        return sum(a.nbytes for a in self.observations.values()) + sum(a.nbytes for a in self.packed.values())
+
+    def add(self, obs, action, reward, episode_start, value, log_prob):
+        if len(log_prob.shape) == 0:
+            log_prob = log_prob.reshape(-1, 1)
+
+        for key in self.observations:
+            obs_ = np.asarray(obs[key]).reshape((self.n_envs,) + self.obs_shape[key])
+            channels = self.packed_channels.get(key)
+            if channels is None:
+                self.observations[key][self.pos] = obs_
+                continue
+            self.observations[key][self.pos] = obs_[:, self._plain_channels[key]]
+            bits = obs_[:, channels].reshape(self.n_envs, len(channels), -1) != 0
+            self.packed[key][self.pos] = np.packbits(bits, axis=-1)
+
+        action = action.reshape((self.n_envs, self.action_dim))
+        self.actions[self.pos] = np.array(action)
+        self.rewards[self.pos] = np.array(reward)
+        self.episode_starts[self.pos] = np.array(episode_start)
+        self.values[self.pos] = value.clone().cpu().numpy().flatten()
+        self.log_probs[self.pos] = log_prob.clone().cpu().numpy()
+        self.pos += 1
+        if self.pos == self.buffer_size:
+            self.full = True
+
+    def get(self, batch_size=None):
+        assert self.full, ""
+        indices = np.random.permutation(self.buffer_size * self.n_envs)
+        # Only the small per-sample arrays are flattened; observations are gathered per minibatch
+        if not self.generator_ready:
+            for tensor in ('actions', 'values', 'log_probs', 'advantages', 'returns'):
+                self.__dict__[tensor] = self.swap_and_flatten(self.__dict__[tensor])
+            self.generator_ready = True
+
+        if batch_size is None:
+            batch_size = self.buffer_size * self.n_envs
+
+        start_idx = 0
+        while start_idx < self.buffer_size * self.n_envs:
+            yield self._get_samples(indices[start_idx:start_idx + batch_size])
+            start_idx += batch_size
+
+    def _decode(self, key, steps, envs):
+        """Float32 [B, ...] observations of `key` at the (step, env) pairs."""
+        plain = self.observations[key][steps, envs]
+        channels = self.packed_channels.get(key)
+        if channels is None:
+            return plain.astype(np.float32)
+        out = np.empty((len(steps),) + self.obs_shape[key], dtype=np.float32)
+        out[:, self._plain_channels[key]] = plain
+        h, w = self.obs_shape[key][1:]
+        bits = np.unpackbits(self.packed[key][steps, envs], axis=-1, count=h * w)
+        out[:, channels] = bits.reshape(len(steps), len(channels), h, w)
+        out[:, channels] *= 255.0
+        return out
+
+    def _get_samples(self, batch_inds, env=None):
+        # Flat index i is env-major, matching swap_and_flatten: i = env * buffer_size + step
+        steps, envs = batch_inds % self.buffer_size, batch_inds // self.buffer_size
+        return DictRolloutBufferSamples(
+            observations={key: self.to_torch(self._decode(key, steps, envs), copy=False) for key in self.observations},
+            actions=self.to_torch(self.actions[batch_inds].astype(np.float32, copy=False)),
+            old_values=self.to_torch(self.values[batch_inds].flatten()),
+            old_log_prob=self.to_torch(self.log_probs[batch_inds].flatten()),
+            advantages=self.to_torch(self.advantages[batch_inds].flatten()),
+            returns=self.to_torch(self.returns[batch_inds].flatten()),
+        )
@@ -0,0 +1,90 @@
+# File: depth_codec.py
+# Decoding of CARLA's 24-bit depth camera encoding, shared by the env and the sensor logger.
+
+import numpy as np
+
+# CARLA packs depth as (R + G*256 + B*256*256) / (256**3 - 1) * 1000 m
+FAR_PLANE = 1000.0
+_METRES_PER_CODE = FAR_PLANE / (256 ** 3 - 1)
+
+
+class DepthCodec:
+    """Decodes BGRA depth images to metres, or to log-scaled uint8 through a lookup table.
+
+    CARLA stores the 24-bit code with B as the most significant byte and R as the least.
+    Buffers are reinterpreted as packed little-endian uint32 (B | G<<8 | R<<16 | A<<24):
+    the log lookup table is indexed directly by the low 16 bits (B, G), and full-precision
+    decoding swaps B and R with integer ops in reused scratch buffers before one scaling pass.
+    """
+
+    def __init__(self, min_depth=0.5, max_depth=100.0):
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self._scratch = {}
+        self.log_lut = self._make_log_lut()
+
+    def _make_log_lut(self):
+        # Entry B | G<<8 holds the quantized depth of code B<<16 | G<<8 | 0x80
+        key = np.arange(1 << 16, dtype=np.uint32)
+        code = ((key & 0xFF) << 16) | (key & 0xFF00) | 0x80
+        depth = code.astype(np.float64) * _METRES_PER_CODE
+        scaled = np.log(np.clip(depth, self.min_depth, self.max_depth) / self.min_depth)
+        return np.round(scaled / np.log(self.max_depth / self.min_depth) * 255).astype(np.uint8)
+
+    def _packed(self, raw, height, width):
+        return np.frombuffer(raw, dtype='<u4').reshape(height, width)
+
+    def _buffer(self, height, width, name, dtype='<u4'):
+        key = (height, width, name)
+        buf = self._scratch.get(key)
+        if buf is None:
+            buf = self._scratch[key] = np.empty((height, width), dtype=dtype)
+        return buf
+
+    def decode(self, raw, height, width, out=None):
+        """Return depth in metres as float32 [H, W]."""
+        packed = self._packed(raw, height, width)
+        code = self._buffer(height, width, 'code')
+        part = self._buffer(height, width, 'part')
+        # Swap the B and R bytes: code = B<<16 | G<<8 | R
+        np.bitwise_and(packed, 0xFF, out=code)
+        np.left_shift(code, 16, out=code)
+        np.bitwise_and(packed, 0xFF00, out=part)
+        np.bitwise_or(code, part, out=code)
+        np.right_shift(packed, 16, out=part)
+        np.bitwise_and(part, 0xFF, out=part)
+        np.bitwise_or(code, part, out=code)
+        if out is None:
+            out = np.empty((height, width), dtype=np.float32)
+        # Codes fit in 24 bits, so a float32 loop converts them exactly
+        np.multiply(code, _METRES_PER_CODE, out=out, dtype=np.float32, casting='unsafe')
+        return out
+
+    def quantize(self, raw, height, width, out=None):
+        """Return log-scaled depth as uint8 [H, W]: 0 at min_depth, 255 at max_depth and beyond."""
+        # take() wants intp indices. The low 16 bits are the first uint16 of each pixel; copyto
+        # widens them without the casting buffer a uint32 -> intp bitwise_and would allocate
+        codes = self._buffer(height, width, 'index', np.intp)
+        np.copyto(codes, np.frombuffer(raw, dtype='<u2').reshape(height, width, 2)[..., 0])
+        if out is None:
+            out = np.empty((height, width), dtype=np.uint8)
+        # mode='clip' lets take() write straight into `out` instead of buffering
+        np.take(self.log_lut, codes, out=out, mode='clip')
+        return out
+
+    def dequantize(self, quantized):
+        """Approximate metres for uint8 values produced by quantize()."""
+        q = np.asarray(quantized, dtype=np.float32) / 255.0
+        return self.min_depth * np.exp(q * np.log(self.max_depth / self.min_depth))
+
+
+def encode_depth(depth_meters):
+    """Encode metres into a BGRA uint8 image the way a CARLA depth camera would."""
+    codes = np.clip(np.round(np.asarray(depth_meters, dtype=np.float64) / _METRES_PER_CODE), 0, 256 ** 3 - 1)
+    codes = codes.astype(np.uint32)
+    bgra = np.empty(codes.shape + (4,), dtype=np.uint8)
+    bgra[..., 0] = codes >> 16
+    bgra[..., 1] = (codes >> 8) & 0xFF
+    bgra[..., 2] = codes & 0xFF
+    bgra[..., 3] = 255
+    return bgra
@@ -0,0 +1,265 @@
+# File: episode_store.py
+# Chunked on-disk episode recording and a simulator-free replay env.
+#
+# Layout of a store directory:
+#   meta.json                 fields, chunk list, episode start rows
+#   chunks/000000.<field>.npy one memory-mappable array per field per chunk
+#   chunks/000000.npz         (compress=True) all fields of a chunk, zlib-compressed
+#
+# Every row holds one value per field plus a `first` flag. For recorded envs a row is
+# the observation reached after `action`, with its `reward`/`terminated`/`truncated`;
+# the first row of an episode holds the reset observation.
+
+import json
+import os
+import queue
+import threading
+
+import gymnasium as gym
+import numpy as np
+
+META_FILE = 'meta.json'
+CHUNK_DIR = 'chunks'
+STEP_FIELDS = {
+    'action': ((), 'int64'),
+    'reward': ((), 'float32'),
+    'terminated': ((), 'bool'),
+    'truncated': ((), 'bool'),
+}
+
+
+def env_fields(observation_space):
+    """Field spec {name: (shape, dtype)} for recording a Dict-observation env."""
+    fields = {key: (tuple(space.shape), np.dtype(space.dtype).name) for key, space in observation_space.spaces.items()}
+    overlap = set(fields) & set(STEP_FIELDS)
+    if overlap:
+        raise ValueError(f"Observation keys {sorted(overlap)} clash with step fields")
+    fields.update(STEP_FIELDS)
+    return fields
+
+
+class EpisodeWriter:
+    """Appends fixed-shape rows into chunk buffers; full chunks are written by a background thread.
+
+    append() only copies the row into a preallocated chunk, so it is safe to call from
+    a control loop or sensor callback. When `max_pending_chunks` chunks are waiting for
+    disk, append() blocks instead of growing memory.
+    """
+
+    def __init__(self, root, fields, chunk_size=1024, compress=False, max_pending_chunks=2, metadata=None):
+        self.root = root
+        self.fields = {name: (tuple(shape), np.dtype(dtype)) for name, (shape, dtype) in fields.items()}
+        self.fields['first'] = ((), np.dtype(bool))
+        self.chunk_size = chunk_size
+        self.compress = compress
+        os.makedirs(os.path.join(root, CHUNK_DIR), exist_ok=True)
+
+        self._meta = {
+            'fields': {name: {'shape': list(shape), 'dtype': dtype.name} for name, (shape, dtype) in self.fields.items()},
+            'chunk_size': chunk_size,
+            'compress': compress,
+            'chunks': [],
+            'episode_starts': [],
+            'n_rows': 0,
+            'metadata': metadata or {},
+        }
+        self._free = queue.Queue()
+        for _ in range(max_pending_chunks + 1):
+            self._free.put(self._new_chunk())
+        self._pending = queue.Queue()
+        self._chunk = self._free.get()
+        self._n_in_chunk = 0
+        self._n_rows = 0
+        self._episode_starts = []
+        self._error = None
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def _new_chunk(self):
+        return {name: np.empty((self.chunk_size,) + shape, dtype=dtype) for name, (shape, dtype) in self.fields.items()}
+
+    def append(self, row, first=False):
+        if self._error is not None:
+            raise RuntimeError("Episode writer thread failed") from self._error
+        i = self._n_in_chunk
+        for name, buf in self._chunk.items():
+            if name != 'first':
+                buf[i] = row[name]
+        self._chunk['first'][i] = first
+        if first:
+            self._episode_starts.append(self._n_rows)
+        self._n_in_chunk += 1
+        self._n_rows += 1
+        if self._n_in_chunk == self.chunk_size:
+            self._submit()
+
+    def start_episode(self, obs):
+        self.append(dict(obs, action=0, reward=0.0, terminated=False, truncated=False), first=True)
+
+    def add_step(self, action, reward, terminated, truncated, obs):
+        self.append(dict(obs, action=action, reward=reward, terminated=terminated, truncated=truncated))
+
+    def _submit(self):
+        if self._n_in_chunk == 0:
+            return
+        self._pending.put((self._chunk, self._n_in_chunk, self._n_rows, list(self._episode_starts)))
+        self._chunk = self._free.get()
+        self._n_in_chunk = 0
+
+    def _write_loop(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            chunk, n, n_rows, episode_starts = item
+            try:
+                self._write_chunk(chunk, n, n_rows, episode_starts)
+            except Exception as e:  # surfaced on the next append()/close()
+                self._error = e
+            self._free.put(chunk)
+
+    def _write_chunk(self, chunk, n, n_rows, episode_starts):
+        index = len(self._meta['chunks'])
+        base = os.path.join(self.root, CHUNK_DIR, f"{index:06d}")
+        if self.compress:
+            np.savez_compressed(base + '.npz', **{name: arr[:n] for name, arr in chunk.items()})
+        else:
+            for name, arr in chunk.items():
+                np.save(f"{base}.{name}.npy", arr[:n])
+        self._meta['chunks'].append(n)
+        self._meta['n_rows'] = n_rows
+        self._meta['episode_starts'] = episode_starts
+        # Rewrite meta after every chunk so a crashed run still leaves a readable store
+        tmp = os.path.join(self.root, META_FILE + '.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self._meta, f)
+        os.replace(tmp, os.path.join(self.root, META_FILE))
+
+    def close(self):
+        self._submit()
+        self._pending.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise RuntimeError("Episode writer thread failed") from self._error
+
+
+class EpisodeReader:
+    """Random access to the rows of a store. Uncompressed chunks are memory-mapped, so rows are zero-copy views."""
+
+    def __init__(self, root, cache_chunks=2):
+        self.root = root
+        with open(os.path.join(root, META_FILE)) as f:
+            self.meta = json.load(f)
+        self.fields = {name: (tuple(spec['shape']), np.dtype(spec['dtype'])) for name, spec in self.meta['fields'].items()}
+        self.chunk_size = self.meta['chunk_size']
+        self.compress = self.meta['compress']
+        self.n_rows = self.meta['n_rows']
+        starts = self.meta['episode_starts']
+        self.episodes = list(zip(starts, starts[1:] + [self.n_rows]))
+        self._cache = {}
+        self._cache_order = []
+        self._cache_chunks = cache_chunks
+
+    def __len__(self):
+        return self.n_rows
+
+    def chunk(self, index):
+        arrays = self._cache.get(index)
+        if arrays is not None:
+            return arrays
+        base = os.path.join(self.root, CHUNK_DIR, f"{index:06d}")
+        if self.compress:
+            with np.load(base + '.npz') as data:
+                arrays = {name: data[name] for name in self.fields}
+            # Only decompressed chunks are worth evicting; memory maps stay open
+            self._cache_order.append(index)
+            if len(self._cache_order) > self._cache_chunks:
+                self._cache.pop(self._cache_order.pop(0), None)
+        else:
+            arrays = {name: np.load(f"{base}.{name}.npy", mmap_mode='r') for name in self.fields}
+        self._cache[index] = arrays
+        return arrays
+
+    def row(self, i):
+        chunk = self.chunk(i // self.chunk_size)
+        j = i % self.chunk_size
+        return {name: arr[j] for name, arr in chunk.items()}
+
+    def field(self, name):
+        """All values of one field, concatenated across chunks (copies)."""
+        return np.concatenate([self.chunk(c)[name] for c in range(len(self.meta['chunks']))])
+
+
+class EpisodeRecorder(gym.Wrapper):
+    """Records every reset/step of a Dict-observation env into an EpisodeWriter."""
+
+    def __init__(self, env, root, chunk_size=1024, compress=False):
+        super().__init__(env)
+        metadata = {'action_n': int(env.action_space.n)} if isinstance(env.action_space, gym.spaces.Discrete) else {}
+        self.writer = EpisodeWriter(root, env_fields(env.observation_space), chunk_size=chunk_size,
+                                    compress=compress, metadata=metadata)
+
+    def reset(self, **kwargs):
+        obs, info = self.env.reset(**kwargs)
+        self.writer.start_episode(obs)
+        return obs, info
+
+    def step(self, action):
+        obs, reward, terminated, truncated, info = self.env.step(action)
+        self.writer.add_step(int(action), reward, terminated, truncated, obs)
+        return obs, reward, terminated, truncated, info
+
+    def close(self):
+        self.writer.close()
+        return self.env.close()
+
+
+class ReplayCarlaEnv(gym.Env):
+    """Serves recorded CarlaFusionEnv episodes through the same Gymnasium API, without a simulator.
+
+    Actions are ignored: step() returns the next recorded row of the current episode, and
+    info['recorded_action'] carries the action that was taken when it was recorded.
+    Observations from uncompressed stores are read-only views into the memory-mapped chunks.
+    Episodes are played in order (restarting from the first one when reset() is seeded),
+    or in random order with shuffle=True.
+    """
+
+    def __init__(self, root, shuffle=False):
+        super().__init__()
+        self.reader = EpisodeReader(root)
+        if not self.reader.episodes:
+            raise ValueError(f"No episodes recorded in {root}")
+        self.obs_keys = [name for name in self.reader.fields if name not in STEP_FIELDS and name != 'first']
+        self.observation_space = gym.spaces.Dict({
+            key: gym.spaces.Box(0, 255, shape=self.reader.fields[key][0], dtype=self.reader.fields[key][1])
+            for key in self.obs_keys
+        })
+        self.action_space = gym.spaces.Discrete(self.reader.meta['metadata'].get('action_n', 3))
+        self.shuffle = shuffle
+        self._episode = -1
+        self._row = 0
+        self._stop = 0
+
+    def reset(self, *, seed=None, options=None):
+        super().reset(seed=seed)
+        if self.shuffle:
+            self._episode = int(self.np_random.integers(len(self.reader.episodes)))
+        else:
+            # Seeding restarts the sequence, so equal seeds replay equal episodes
+            if seed is not None:
+                self._episode = -1
+            self._episode = (self._episode + 1) % len(self.reader.episodes)
+        self._row, self._stop = self.reader.episodes[self._episode]
+        row = self.reader.row(self._row)
+        return {key: row[key] for key in self.obs_keys}, {'episode': self._episode, 'row': self._row}
+
+    def step(self, action):
+        if self._row + 1 >= self._stop:
+            raise RuntimeError("Recorded episode is over; call reset()")
+        self._row += 1
+        row = self.reader.row(self._row)
+        obs = {key: row[key] for key in self.obs_keys}
+        # A recording may stop mid-episode; end it as truncated rather than running past it
+        truncated = bool(row['truncated']) or self._row + 1 >= self._stop and not row['terminated']
+        info = {'recorded_action': int(row['action']), 'row': self._row}
+        return obs, float(row['reward']), bool(row['terminated']), truncated, info
@@ -0,0 +1,175 @@
+# File: export_policy.py
+# Exports a trained SB3 fusion policy (feature extractor + actor head) to a standalone
+# TorchScript artifact, optionally int8-quantized for CPU, and checks it against the
+# eager policy on recorded observations.
+
+import argparse
+import copy
+import json
+import time
+import warnings
+
+import numpy as np
+import torch
+import torch.nn as nn
+from stable_baselines3 import PPO
+
+from episode_store import EpisodeReader
+
+OBS_KEYS = ('rgb', 'depth', 'lidar')
+QUANTIZE_MODES = ('none', 'dynamic', 'static')
+META_FILE = 'meta.json'
+
+
+class PolicyModule(nn.Module):
+    """Deterministic actor path of an SB3 ActorCriticPolicy: uint8 observations -> action logits."""
+
+    def __init__(self, policy):
+        super().__init__()
+        self.features_extractor = policy.pi_features_extractor
+        self.mlp_extractor = policy.mlp_extractor
+        self.action_net = policy.action_net
+        self.normalize_images = policy.normalize_images
+
+    def forward(self, rgb, depth, lidar):
+        obs = {'rgb': rgb.float(), 'depth': depth.float(), 'lidar': lidar.float()}
+        if self.normalize_images:
+            obs = {key: value / 255.0 for key, value in obs.items()}
+        features = self.features_extractor(obs)
+        return self.action_net(self.mlp_extractor.forward_actor(features))
+
+
+def load_observations(store, limit=None):
+    """Observation rows from an episode store as a list of {key: uint8 array}."""
+    reader = EpisodeReader(store)
+    n = len(reader) if limit is None else min(limit, len(reader))
+    return [{key: np.array(reader.row(i)[key]) for key in OBS_KEYS} for i in range(n)]
+
+
+def _batch(observations):
+    return tuple(torch.as_tensor(np.stack([obs[key] for obs in observations])) for key in OBS_KEYS)
+
+
+def quantize_static(module, calibration):
+    """Static int8 quantization of the conv encoders, calibrated on recorded observations.
+
+    Only the encoders are converted: they dominate CPU time, and attention has no
+    static-quantized kernel. Linear layers are left to dynamic quantization.
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import convert_fx, prepare_fx
+
+    fusion = module.features_extractor.fusion
+    qconfig = get_default_qconfig_mapping(torch.backends.quantized.engine)
+    inputs = _batch(calibration)
+    scale = 255.0 if module.normalize_images else 1.0
+    for name, x in zip(('rgb_encoder', 'depth_encoder', 'lidar_encoder'), inputs):
+        x = x.float() / scale
+        encoder = getattr(fusion, name)
+        encoder.fold_input_scale()
+        prepared = prepare_fx(encoder, qconfig, (x[:1],))
+        with torch.no_grad():
+            for chunk in x.split(16):
+                prepared(chunk)
+        setattr(fusion, name, convert_fx(prepared))
+    return module
+
+
+def export(model_path, out_path, quantize='none', calibration=None):
+    """Trace the policy of a saved PPO model into a TorchScript file that needs only torch."""
+    if quantize not in QUANTIZE_MODES:
+        raise ValueError(f"Unknown quantize mode {quantize!r}; choose from {QUANTIZE_MODES}")
+    model = PPO.load(model_path, device='cpu')
+    module = PolicyModule(copy.deepcopy(model.policy)).eval()
+    space = model.observation_space
+    example = tuple(torch.zeros((1,) + space[key].shape, dtype=torch.uint8) for key in OBS_KEYS)
+    with torch.no_grad():
+        module(*example)  # settles lazily converted weights (channels_last) before quantizing/tracing
+
+    if quantize == 'static':
+        if not calibration:
+            raise ValueError("Static quantization needs calibration observations (--store)")
+        quantize_static(module, calibration)
+    if quantize in ('dynamic', 'static'):
+        module = torch.ao.quantization.quantize_dynamic(module, {nn.Linear}, dtype=torch.qint8)
+
+    with torch.no_grad(), warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)  # jit.trace deprecation notice
+        traced = torch.jit.freeze(torch.jit.trace(module, example))
+
+    meta = {
+        'obs_keys': list(OBS_KEYS),
+        'obs_shapes': {key: list(space[key].shape) for key in OBS_KEYS},
+        'action_n': int(model.action_space.n),
+        'quantize': quantize,
+        'source': str(model_path),
+    }
+    torch.jit.save(traced, out_path, _extra_files={META_FILE: json.dumps(meta)})
+    return model
+
+
+def check_accuracy(model, artifact_path, observations):
+    """Compare artifact logits/actions with the eager SB3 policy; returns a stats dict."""
+    from run_exported_policy import ExportedPolicy
+
+    policy = ExportedPolicy(artifact_path)
+    eager = PolicyModule(model.policy).eval()
+    inputs = _batch(observations)
+    with torch.no_grad():
+        reference = torch.cat([eager(*chunk) for chunk in zip(*(x.split(32) for x in inputs))])
+        exported = torch.cat([policy.module(*chunk) for chunk in zip(*(x.split(32) for x in inputs))])
+    eager_actions = np.array([model.predict(obs, deterministic=True)[0] for obs in observations]).reshape(-1)
+
+    eager_ms = _latency(lambda obs: model.predict(obs, deterministic=True), observations)
+    exported_ms = _latency(policy.predict, observations)
+    return {
+        'n_observations': len(observations),
+        'max_abs_logit_error': float((reference - exported).abs().max()),
+        'action_agreement': float(np.mean(eager_actions == exported.argmax(dim=1).numpy())),
+        'eager_predict_ms': eager_ms,
+        'exported_predict_ms': exported_ms,
+    }
+
+
+def _latency(predict, observations, n=50):
+    obs = observations[:n]
+    predict(obs[0])
+    start = time.perf_counter()
+    for o in obs:
+        predict(o)
+    return (time.perf_counter() - start) / len(obs) * 1e3
+
+
+def main(model_path, out_path, quantize='none', store=None, n_calibration=128, n_check=256, min_agreement=0.95):
+    observations = load_observations(store, max(n_calibration, n_check)) if store else None
+    model = export(model_path, out_path, quantize,
+                   calibration=observations[:n_calibration] if observations else None)
+    print(f"Exported {model_path} -> {out_path} (quantize={quantize})")
+    if not observations:
+        print("No --store given; skipping the accuracy check against the eager policy")
+        return None
+
+    stats = check_accuracy(model, out_path, observations[:n_check])
+    for key, value in stats.items():
+        print(f"{key:<24}{value:.4f}" if isinstance(value, float) else f"{key:<24}{value}")
+    if stats['action_agreement'] < min_agreement:
+        raise SystemExit(f"Action agreement {stats['action_agreement']:.3f} below {min_agreement}")
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', type=str, default='ppo_carla_attention', help="Saved PPO model (.zip)")
+    parser.add_argument('--out', type=str, default='policy.ts', help="TorchScript artifact to write")
+    parser.add_argument('--quantize', choices=QUANTIZE_MODES, default='none',
+                        help="'dynamic': int8 Linear layers; 'static': also int8 conv encoders (needs --store)")
+    parser.add_argument('--store', type=str, default=None,
+                        help="Episode store (episode_store.py) for calibration and the accuracy check")
+    parser.add_argument('--n_calibration', type=int, default=128)
+    parser.add_argument('--n_check', type=int, default=256)
+    parser.add_argument('--min_agreement', type=float, default=0.95,
+                        help="Fail when fewer deterministic actions match the eager policy")
+    args = parser.parse_args()
+
+    main(args.model, args.out, quantize=args.quantize, store=args.store, n_calibration=args.n_calibration,
+         n_check=args.n_check, min_agreement=args.min_agreement)
@@ -0,0 +1,764 @@
+# File: fake_carla.py
+# In-process stand-in for the subset of the `carla` API used by this project.
+# Call install() before importing modules that do `import carla` to run them
+# without a simulator (vec-env factory checks, benchmarks, CI).
+
+import fnmatch
+import itertools
+import math
+import sys
+import threading
+import time
+
+import numpy as np
+
+from depth_codec import encode_depth
+
+# Per-endpoint simulator state, shared by every Client pointing at the same host:port
+_SERVERS = {}
+_SERVERS_LOCK = threading.Lock()
+
+# Extra seconds every world.tick() sleeps, to emulate the simulator's render time
+TICK_LATENCY = 0.0
+# Extra seconds every call that is a server round-trip in CARLA sleeps
+RPC_LATENCY = 0.0
+# Extra seconds Client.load_world() sleeps, standing in for loading a map
+MAP_LOAD_LATENCY = 0.0
+
+AVAILABLE_MAPS = ['/Game/Carla/Maps/Town01', '/Game/Carla/Maps/Town02']
+
+
+def install(tick_latency=0.0, rpc_latency=0.0, map_load_latency=0.0):
+    """Register this module as `carla` in sys.modules."""
+    global TICK_LATENCY, RPC_LATENCY, MAP_LOAD_LATENCY
+    TICK_LATENCY = tick_latency
+    RPC_LATENCY = rpc_latency
+    MAP_LOAD_LATENCY = map_load_latency
+    sys.modules['carla'] = sys.modules[__name__]
+    return sys.modules[__name__]
+
+
+def _rpc():
+    if RPC_LATENCY:
+        time.sleep(RPC_LATENCY)
+
+
+def reset_servers():
+    with _SERVERS_LOCK:
+        _SERVERS.clear()
+
+
+# --- Geometry / control value types ---
+
+class Vector3D:
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x, self.y, self.z = float(x), float(y), float(z)
+
+    def __add__(self, other):
+        return type(self)(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        return type(self)(self.x - other.x, self.y - other.y, self.z - other.z)
+
+    def length(self):
+        return math.sqrt(self.x ** 2 + self.y ** 2 + self.z ** 2)
+
+    def __repr__(self):
+        return f"{type(self).__name__}(x={self.x:.2f}, y={self.y:.2f}, z={self.z:.2f})"
+
+
+class Location(Vector3D):
+    def distance(self, other):
+        return (self - other).length()
+
+
+class Rotation:
+    def __init__(self, pitch=0.0, yaw=0.0, roll=0.0):
+        self.pitch, self.yaw, self.roll = float(pitch), float(yaw), float(roll)
+
+    def get_forward_vector(self):
+        yaw = math.radians(self.yaw)
+        return Vector3D(math.cos(yaw), math.sin(yaw), 0.0)
+
+
+class Transform:
+    def __init__(self, location=None, rotation=None):
+        self.location = location if location is not None else Location()
+        self.rotation = rotation if rotation is not None else Rotation()
+
+    def get_forward_vector(self):
+        return self.rotation.get_forward_vector()
+
+
+class VehicleControl:
+    def __init__(self, throttle=0.0, steer=0.0, brake=0.0, hand_brake=False,
+                 reverse=False, manual_gear_shift=False, gear=0):
+        self.throttle = throttle
+        self.steer = steer
+        self.brake = brake
+        self.hand_brake = hand_brake
+        self.reverse = reverse
+        self.manual_gear_shift = manual_gear_shift
+        self.gear = gear
+
+
+class WorldSettings:
+    def __init__(self, synchronous_mode=False, fixed_delta_seconds=None, no_rendering_mode=False):
+        self.synchronous_mode = synchronous_mode
+        self.fixed_delta_seconds = fixed_delta_seconds
+        self.no_rendering_mode = no_rendering_mode
+
+
+class TrafficLightState:
+    Red, Yellow, Green, Off, Unknown = 'Red', 'Yellow', 'Green', 'Off', 'Unknown'
+
+
+# --- Snapshots ---
+
+class ActorSnapshot:
+    def __init__(self, actor):
+        self.id = actor.id
+        self._transform = _copy_transform(actor._transform)
+        self._velocity = Vector3D(actor._velocity.x, actor._velocity.y, actor._velocity.z)
+
+    def get_transform(self):
+        return self._transform
+
+    def get_velocity(self):
+        return self._velocity
+
+
+class WorldSnapshot:
+    """State of every actor at one frame; CARLA streams it to the client on each tick."""
+
+    def __init__(self, frame, elapsed_seconds, actors):
+        self.frame = frame
+        self.elapsed_seconds = elapsed_seconds
+        self._actors = {actor.id: ActorSnapshot(actor) for actor in actors}
+
+    def find(self, actor_id):
+        return self._actors.get(actor_id)
+
+    def has_actor(self, actor_id):
+        return actor_id in self._actors
+
+    def __iter__(self):
+        return iter(self._actors.values())
+
+    def __len__(self):
+        return len(self._actors)
+
+
+# --- Blueprints ---
+
+class ActorBlueprint:
+    def __init__(self, bp_id, attributes=None):
+        self.id = bp_id
+        self.tags = bp_id.split('.')
+        self._attributes = dict(attributes or {})
+
+    def set_attribute(self, key, value):
+        self._attributes[key] = str(value)
+
+    def has_attribute(self, key):
+        return key in self._attributes
+
+    def get_attribute(self, key):
+        return self._attributes[key]
+
+
+_CAMERA_ATTRIBUTES = {'image_size_x': '800', 'image_size_y': '600', 'fov': '90', 'sensor_tick': '0.0'}
+_BLUEPRINTS = {
+    'vehicle.tesla.model3': {},
+    'vehicle.audi.tt': {},
+    'walker.pedestrian.0001': {},
+    'sensor.camera.rgb': dict(_CAMERA_ATTRIBUTES, enable_postprocess_effects='True'),
+    'sensor.camera.depth': _CAMERA_ATTRIBUTES,
+    'sensor.lidar.ray_cast': {'range': '10', 'rotation_frequency': '10', 'channels': '32',
+                              'points_per_second': '56000', 'sensor_tick': '0.0'},
+}
+
+
+class BlueprintLibrary:
+    def __init__(self):
+        self._blueprints = [ActorBlueprint(bp_id, attrs) for bp_id, attrs in _BLUEPRINTS.items()]
+
+    def filter(self, pattern):
+        if '*' not in pattern:
+            pattern = f"*{pattern}*"
+        return [bp for bp in self._blueprints if fnmatch.fnmatch(bp.id, pattern)]
+
+    def find(self, bp_id):
+        for bp in self._blueprints:
+            if bp.id == bp_id:
+                return ActorBlueprint(bp.id, bp._attributes)
+        raise IndexError(f"blueprint '{bp_id}' not found")
+
+    def __iter__(self):
+        return iter(self._blueprints)
+
+    def __len__(self):
+        return len(self._blueprints)
+
+
+# --- Sensor measurements ---
+
+class Image:
+    def __init__(self, frame, timestamp, width, height, fov, raw_data):
+        self.frame = frame
+        self.timestamp = timestamp
+        self.width = width
+        self.height = height
+        self.fov = fov
+        self.raw_data = raw_data
+
+
+class LidarMeasurement:
+    def __init__(self, frame, timestamp, channels, raw_data):
+        self.frame = frame
+        self.timestamp = timestamp
+        self.channels = channels
+        self.raw_data = raw_data
+
+    def __len__(self):
+        return len(self.raw_data) // 16
+
+
+# --- Actors ---
+
+def _copy_transform(t):
+    return Transform(Location(t.location.x, t.location.y, t.location.z),
+                     Rotation(t.rotation.pitch, t.rotation.yaw, t.rotation.roll))
+
+
+class Actor:
+    def __init__(self, world, actor_id, blueprint, transform, parent=None):
+        self._world = world
+        self.id = actor_id
+        self.type_id = blueprint.id
+        self.attributes = dict(blueprint._attributes)
+        self.parent = parent
+        self._transform = _copy_transform(transform)
+        self._velocity = Vector3D()
+        self.is_alive = True
+
+    def get_transform(self):
+        _rpc()
+        if self.parent is not None:
+            base = self.parent.get_transform()
+            return Transform(base.location + self._transform.location, base.rotation)
+        return self._transform
+
+    def set_transform(self, transform):
+        _rpc()
+        self._transform = _copy_transform(transform)
+
+    def get_location(self):
+        return self.get_transform().location
+
+    def get_velocity(self):
+        _rpc()
+        return self._velocity
+
+    def set_target_velocity(self, velocity):
+        self._velocity = Vector3D(velocity.x, velocity.y, velocity.z)
+
+    def set_target_angular_velocity(self, velocity):
+        pass
+
+    def destroy(self):
+        _rpc()
+        if not self.is_alive:
+            return False
+        self.is_alive = False
+        self._world._remove_actor(self)
+        return True
+
+    def _tick(self, frame, dt):
+        pass
+
+
+class Vehicle(Actor):
+    MAX_ACCEL = 4.0  # m/s^2 at full throttle
+    DRAG = 0.15
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._control = VehicleControl()
+
+    def apply_control(self, control):
+        _rpc()
+        self._control = control
+
+    def get_control(self):
+        return self._control
+
+    def get_traffic_light(self):
+        _rpc()
+        # Every 100 m along x the road crosses an intersection with a signal
+        if self._transform.location.x % 100.0 < 20.0:
+            return self._world._traffic_light
+        return None
+
+    def get_traffic_light_state(self):
+        light = self.get_traffic_light()
+        return light.get_state() if light is not None else TrafficLightState.Green
+
+    def _tick(self, frame, dt):
+        # Kinematic bicycle-ish update, good enough for speed-based rewards
+        c = self._control
+        speed = self._velocity.length()
+        accel = c.throttle * self.MAX_ACCEL - c.brake * 2 * self.MAX_ACCEL - self.DRAG * speed
+        speed = 0.0 if c.hand_brake else max(0.0, speed + accel * dt)
+        rot = self._transform.rotation
+        rot.yaw = (rot.yaw + c.steer * 70.0 * dt * min(speed / 5.0, 1.0)) % 360.0
+        fwd = rot.get_forward_vector()
+        self._velocity = Vector3D(fwd.x * speed, fwd.y * speed, 0.0)
+        loc = self._transform.location
+        self._transform.location = Location(loc.x + self._velocity.x * dt, loc.y + self._velocity.y * dt, loc.z)
+
+
+class Sensor(Actor):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._callback = None
+        self._elapsed = 0.0
+        self._frame_pool = None
+        self._pool_index = 0
+
+    def listen(self, callback):
+        self._callback = callback
+
+    def stop(self):
+        self._callback = None
+
+    @property
+    def is_listening(self):
+        return self._callback is not None
+
+    def _tick(self, frame, dt):
+        if self._callback is None:
+            return
+        sensor_tick = float(self.attributes.get('sensor_tick', '0.0'))
+        self._elapsed += dt
+        if self._elapsed + 1e-9 < sensor_tick:
+            return
+        self._elapsed = 0.0
+        self._callback(self._measure(frame, self._world._elapsed_seconds))
+
+    def _next_buffer(self):
+        if self._frame_pool is None:
+            self._frame_pool = self._make_pool()
+        buf = self._frame_pool[self._pool_index % len(self._frame_pool)]
+        self._pool_index += 1
+        return buf
+
+    def _make_pool(self):
+        raise NotImplementedError
+
+    def _measure(self, frame, timestamp):
+        raise NotImplementedError
+
+
+class Camera(Sensor):
+    POOL_SIZE = 4
+    HEIGHT = 2.4  # mount height used by CarlaFusionEnv
+
+    @property
+    def _size(self):
+        return int(self.attributes['image_size_x']), int(self.attributes['image_size_y'])
+
+    def _ground_depth(self, w, h):
+        """Planar depth of a flat ground plane seen from HEIGHT metres; sky at the far plane."""
+        fov = math.radians(float(self.attributes['fov']))
+        focal = (w / 2.0) / math.tan(fov / 2.0)
+        rows = (np.arange(h, dtype=np.float64) + 0.5 - h / 2.0)[:, None]
+        with np.errstate(divide='ignore'):
+            depth = np.where(rows > 0, self.HEIGHT * focal / rows, 1000.0)
+        return np.broadcast_to(np.minimum(depth, 1000.0), (h, w))
+
+    def _make_pool(self):
+        w, h = self._size
+        rng = np.random.default_rng(self.id)
+        depth = self._ground_depth(w, h)
+        pool = []
+        for _ in range(self.POOL_SIZE):
+            pool.append(self._render(depth, rng).tobytes())
+        return pool
+
+    def _render(self, depth, rng):
+        raise NotImplementedError
+
+    def _measure(self, frame, timestamp):
+        w, h = self._size
+        return Image(frame, timestamp, w, h, float(self.attributes['fov']), self._next_buffer())
+
+
+class RGBCamera(Camera):
+    def _render(self, depth, rng):
+        h, w = depth.shape
+        img = np.empty((h, w, 4), dtype=np.uint8)
+        sky = depth >= 1000.0
+        # BGRA: blue-ish sky, grey road darkening with distance, sensor noise on top
+        shade = np.clip(140 - np.log1p(np.minimum(depth, 200.0)) * 15, 40, 140)
+        for c, sky_value in enumerate((200, 160, 120)):
+            img[:, :, c] = np.where(sky, sky_value, shade)
+        noise = rng.integers(-8, 9, size=(h, w, 3))
+        img[:, :, :3] = np.clip(img[:, :, :3].astype(np.int16) + noise, 0, 255)
+        img[:, :, 3] = 255
+        return img
+
+
+class DepthCamera(Camera):
+    def _render(self, depth, rng):
+        noisy = depth * rng.uniform(0.99, 1.01, size=depth.shape)
+        return encode_depth(np.minimum(noisy, 1000.0))
+
+
+class Lidar(Sensor):
+    POOL_SIZE = 4
+    HEIGHT = 2.5
+
+    def _points_per_tick(self):
+        dt = self._world._settings.fixed_delta_seconds or 0.05
+        return max(1, int(float(self.attributes['points_per_second']) * dt))
+
+    def _make_pool(self):
+        rng = np.random.default_rng(self.id)
+        return [self._sweep(rng).tobytes() for _ in range(self.POOL_SIZE)]
+
+    def _sweep(self, rng):
+        """Ray-cast returns from a flat ground plus scattered vertical obstacles.
+
+        Rays that hit nothing within range produce no point, so the point count
+        varies from frame to frame like a real sweep.
+        """
+        n = self._points_per_tick()
+        channels = int(self.attributes['channels'])
+        max_range = float(self.attributes['range'])
+        elevation = np.radians(np.linspace(-30.0, 10.0, channels))[rng.integers(0, channels, n)]
+        azimuth = rng.uniform(-np.pi, np.pi, n)
+
+        with np.errstate(divide='ignore'):
+            ground = np.where(elevation < 0, self.HEIGHT / np.tan(-elevation), np.inf)
+        obstacle = np.where(rng.random(n) < 0.35, rng.uniform(3.0, max_range, n), np.inf)
+        dist = np.minimum(ground, obstacle)
+        hit = dist <= max_range
+        dist, elevation, azimuth = dist[hit], elevation[hit], azimuth[hit]
+
+        points = np.empty((len(dist), 4), dtype=np.float32)
+        points[:, 0] = dist * np.cos(azimuth)
+        points[:, 1] = dist * np.sin(azimuth)
+        points[:, 2] = np.maximum(dist * np.tan(elevation), -self.HEIGHT)
+        points[:, 3] = np.exp(-0.004 * dist) * rng.uniform(0.6, 1.0, len(dist))
+        return points
+
+    def _measure(self, frame, timestamp):
+        return LidarMeasurement(frame, timestamp, int(self.attributes['channels']), self._next_buffer())
+
+
+class TrafficLight(Actor):
+    CYCLE = ((TrafficLightState.Green, 10.0), (TrafficLightState.Yellow, 3.0), (TrafficLightState.Red, 10.0))
+
+    def get_state(self):
+        _rpc()
+        t = self._world._elapsed_seconds % sum(d for _, d in self.CYCLE)
+        for state, duration in self.CYCLE:
+            if t < duration:
+                return state
+            t -= duration
+        return TrafficLightState.Unknown
+
+
+def _actor_class(type_id):
+    if type_id.startswith('vehicle.'):
+        return Vehicle
+    if type_id == 'sensor.camera.rgb':
+        return RGBCamera
+    if type_id == 'sensor.camera.depth':
+        return DepthCamera
+    if type_id.startswith('traffic.traffic_light'):
+        return TrafficLight
+    if type_id.startswith('sensor.lidar.'):
+        return Lidar
+    return Actor
+
+
+class ActorList(list):
+    def filter(self, pattern):
+        return ActorList(a for a in self if fnmatch.fnmatch(a.type_id, pattern))
+
+    def find(self, actor_id):
+        for a in self:
+            if a.id == actor_id:
+                return a
+        return None
+
+
+# --- Command batches ---
+
+class command:
+    """carla.command: batched actor commands, applied by Client.apply_batch[_sync] in one round-trip."""
+
+    FutureActor = 0  # placeholder for the actor spawned by the command a then() hangs off
+
+    class Response:
+        def __init__(self, actor_id=0, error=''):
+            self.actor_id = actor_id
+            self.error = error
+
+        def has_error(self):
+            return bool(self.error)
+
+    class _Command:
+        def then(self, other):
+            self.do_after = getattr(self, 'do_after', []) + [other]
+            return self
+
+    class SpawnActor(_Command):
+        def __init__(self, blueprint, transform, parent=None):
+            self.blueprint = blueprint
+            self.transform = transform
+            self.parent = parent.id if isinstance(parent, Actor) else parent
+
+    class DestroyActor(_Command):
+        def __init__(self, actor):
+            self.actor = actor.id if isinstance(actor, Actor) else actor
+
+
+# --- World / map / client ---
+
+class Map:
+    def __init__(self, name, n_spawn_points=16):
+        self.name = name
+        self._spawn_points = [
+            Transform(Location(x=20.0 * i, y=10.0 * (i % 4), z=0.5), Rotation(yaw=90.0 * (i % 4)))
+            for i in range(n_spawn_points)
+        ]
+
+    def get_spawn_points(self):
+        return list(self._spawn_points)
+
+
+class World:
+    def __init__(self, server, map_name):
+        self._server = server
+        self._map = Map(map_name)
+        self._settings = WorldSettings()
+        self._actors = {}
+        self._ids = itertools.count(1)
+        self._frame = 0
+        self._elapsed_seconds = 0.0
+        self._lock = threading.RLock()
+        self._blueprints = BlueprintLibrary()
+        self._async_ticker = None
+        self._tick_lock = threading.Lock()  # one frame at a time, sync or async
+        self._spectator = self._spawn(ActorBlueprint('spectator'), Transform())
+        self._traffic_light = self._spawn(ActorBlueprint('traffic.traffic_light'), Transform())
+        self._snapshot = WorldSnapshot(0, 0.0, [])
+
+    def get_map(self):
+        return self._map
+
+    def get_settings(self):
+        s = self._settings
+        return WorldSettings(s.synchronous_mode, s.fixed_delta_seconds, s.no_rendering_mode)
+
+    def apply_settings(self, settings):
+        self._settings = WorldSettings(settings.synchronous_mode, settings.fixed_delta_seconds,
+                                       settings.no_rendering_mode)
+        if not settings.synchronous_mode and self._async_ticker is None:
+            # Asynchronous mode: the server advances on its own clock
+            self._async_ticker = threading.Thread(target=self._run_async, daemon=True)
+            self._async_ticker.start()
+        return self._frame
+
+    def _run_async(self):
+        while self._server.world is self:
+            with self._tick_lock:
+                if self._settings.synchronous_mode:
+                    break
+                self._advance()
+            time.sleep(self._settings.fixed_delta_seconds or 0.05)
+        self._async_ticker = None
+
+    def get_blueprint_library(self):
+        return self._blueprints
+
+    def get_spectator(self):
+        _rpc()
+        return self._spectator
+
+    def get_snapshot(self):
+        # Local in CARLA too: the client caches the snapshot broadcast with every tick
+        return self._snapshot
+
+    def get_actors(self, actor_ids=None):
+        _rpc()
+        with self._lock:
+            actors = [a for a in self._actors.values() if a is not self._spectator]
+        if actor_ids is not None:
+            wanted = set(actor_ids)
+            actors = [a for a in actors if a.id in wanted]
+        return ActorList(actors)
+
+    def get_actor(self, actor_id):
+        return self._actors.get(actor_id)
+
+    def _spawn(self, blueprint, transform, attach_to=None):
+        with self._lock:
+            cls = _actor_class(blueprint.id)
+            actor = cls(self, next(self._ids), blueprint, transform, parent=attach_to)
+            self._actors[actor.id] = actor
+            return actor
+
+    def _remove_actor(self, actor):
+        with self._lock:
+            self._actors.pop(actor.id, None)
+
+    def _spawn_blocked(self, blueprint, transform, attach_to):
+        if attach_to is not None or not blueprint.id.startswith('vehicle.'):
+            return False
+        for other in self._actors.values():
+            if (other.type_id.startswith('vehicle.') and other.parent is None and other is not self._spectator
+                    and other.get_location().distance(transform.location) < 2.0):
+                return True
+        return False
+
+    def try_spawn_actor(self, blueprint, transform, attach_to=None):
+        _rpc()
+        if self._spawn_blocked(blueprint, transform, attach_to):
+            return None
+        return self._spawn(blueprint, transform, attach_to)
+
+    def spawn_actor(self, blueprint, transform, attach_to=None):
+        actor = self.try_spawn_actor(blueprint, transform, attach_to)
+        if actor is None:
+            raise RuntimeError("Spawn failed because of collision at spawn position")
+        return actor
+
+    def _apply_command(self, cmd):
+        """One command of a batch, as the server applies it; failures go into the Response."""
+        if isinstance(cmd, command.DestroyActor):
+            actor = self._actors.get(cmd.actor)
+            if actor is None or actor is self._spectator:
+                return command.Response(cmd.actor, f"unable to destroy actor {cmd.actor}: not found")
+            actor.is_alive = False
+            self._remove_actor(actor)
+            return command.Response(cmd.actor)
+        parent = None
+        if cmd.parent is not None:
+            parent = self._actors.get(cmd.parent)
+            if parent is None:
+                return command.Response(error=f"unable to attach to actor {cmd.parent}: not found")
+        if self._spawn_blocked(cmd.blueprint, cmd.transform, parent):
+            return command.Response(error="Spawn failed because of collision at spawn position")
+        actor = self._spawn(cmd.blueprint, cmd.transform, parent)
+        # Like the server, only commands with an `actor` field get the new id; a chained
+        # SpawnActor cannot use it as its parent
+        for then in getattr(cmd, 'do_after', ()):
+            if hasattr(then, 'actor'):
+                then.actor = actor.id
+            self._apply_command(then)
+        return command.Response(actor.id)
+
+    def tick(self, seconds=10.0):
+        if TICK_LATENCY:
+            time.sleep(TICK_LATENCY)
+        with self._tick_lock:
+            return self._advance()
+
+    def _advance(self):
+        dt = self._settings.fixed_delta_seconds or 0.05
+        with self._lock:
+            self._frame += 1
+            self._elapsed_seconds += dt
+            frame = self._frame
+            actors = list(self._actors.values())
+        # Vehicles move before sensors capture the new frame
+        for actor in actors:
+            if not isinstance(actor, Sensor):
+                actor._tick(frame, dt)
+        self._snapshot = WorldSnapshot(frame, self._elapsed_seconds,
+                                       [a for a in actors if a.parent is None and a is not self._spectator])
+        for actor in actors:
+            if isinstance(actor, Sensor) and actor.is_alive:
+                actor._tick(frame, dt)
+        return frame
+
+    def wait_for_tick(self, seconds=10.0):
+        if self._settings.synchronous_mode:
+            raise RuntimeError("wait_for_tick() is not available in synchronous mode")
+        frame = self._frame
+        deadline = time.monotonic() + seconds
+        while self._frame == frame:
+            if time.monotonic() > deadline:
+                raise RuntimeError("time-out while waiting for the simulator")
+            time.sleep(0.001)
+        return self._frame
+
+
+class TrafficManager:
+    def __init__(self, port):
+        self._port = port
+        self.synchronous_mode = False
+
+    def get_port(self):
+        return self._port
+
+    def set_synchronous_mode(self, mode=True):
+        self.synchronous_mode = mode
+
+
+class _Server:
+    def __init__(self, map_name='Town01'):
+        self.world = World(self, f"Carla/Maps/{map_name}")
+        self.traffic_managers = {}
+
+
+class Client:
+    def __init__(self, host='localhost', port=2000, worker_threads=0):
+        self.host, self.port = host, port
+        self.timeout = 5.0
+        with _SERVERS_LOCK:
+            self._server = _SERVERS.setdefault((host, port), _Server())
+
+    def set_timeout(self, seconds):
+        self.timeout = seconds
+
+    def get_world(self):
+        return self._server.world
+
+    def load_world(self, map_name, reset_settings=True):
+        if MAP_LOAD_LATENCY:
+            time.sleep(MAP_LOAD_LATENCY)
+        world = World(self._server, f"Carla/Maps/{map_name.split('/')[-1]}")
+        if not reset_settings:
+            world._settings = self._server.world.get_settings()
+        self._server.world = world
+        # Like the server, a world in asynchronous mode starts ticking on its own
+        world.apply_settings(world._settings)
+        return world
+
+    def apply_batch_sync(self, commands, do_tick=False):
+        _rpc()
+        world = self._server.world
+        responses = [world._apply_command(cmd) for cmd in commands]
+        if do_tick:
+            world.tick()
+        return responses
+
+    def apply_batch(self, commands, do_tick=False):
+        self.apply_batch_sync(commands, do_tick)
+
+    def get_available_maps(self):
+        return list(AVAILABLE_MAPS)
+
+    def get_trafficmanager(self, port=8000):
+        return self._server.traffic_managers.setdefault(port, TrafficManager(port))
+
+    def get_server_version(self):
+        return '0.9.15-fake'
+
+    def get_client_version(self):
+        return '0.9.15-fake'
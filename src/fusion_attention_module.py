@@ -2,10 +2,19 @@
 
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
+
+# 'self': full self-attention over all modality tokens, O(N^2) in the token count
+# 'latent': a few learned latent queries cross-attend to the tokens, O(N * n_latents)
+FUSION_MODES = ('self', 'latent')
+# 'bf16': encoders and attention run under bf16 autocast; pooling and the output head stay fp32
+PRECISIONS = ('fp32', 'bf16')
 
 class ConvEncoder(nn.Module):
-    def __init__(self, in_channels, out_channels=64):
+    def __init__(self, in_channels, out_channels=64, input_scale=1.0):
         super().__init__()
+        # Multiplied into the first conv's weight, so raw 0-255 pixels need no separate divide
+        self.input_scale = input_scale
         self.encoder = nn.Sequential(
             nn.Conv2d(in_channels, 32, kernel_size=5, stride=2, padding=2),  # [B, 32, H/2, W/2]
             nn.ReLU(),
@@ -14,16 +23,40 @@ class ConvEncoder(nn.Module):
         )
 
     def forward(self, x):
-        return self.encoder(x)
+        if self.input_scale == 1.0:
+            return self.encoder(x)
+        first = self.encoder[0]
+        x = F.conv2d(x, first.weight * self.input_scale, first.bias, first.stride, first.padding)
+        return self.encoder[1:](x)
+
+    def fold_input_scale(self):
+        """Bake input_scale into the first conv's weight, e.g. before quantization."""
+        with torch.no_grad():
+            self.encoder[0].weight.mul_(self.input_scale)
+        self.input_scale = 1.0
 
 class AttentionFusion(nn.Module):
-    def __init__(self, embed_dim=64, n_heads=4):
+    def __init__(self, embed_dim=64, n_heads=4, lidar_channels=1, fusion='self', n_latents=16,
+                 precision='fp32', channels_last=False, input_scale=1.0):
         super().__init__()
-        self.rgb_encoder   = ConvEncoder(in_channels=3, out_channels=embed_dim)
-        self.depth_encoder = ConvEncoder(in_channels=1, out_channels=embed_dim)
-        self.lidar_encoder = ConvEncoder(in_channels=1, out_channels=embed_dim)
+        if fusion not in FUSION_MODES:
+            raise ValueError(f"Unknown fusion mode {fusion!r}; choose from {FUSION_MODES}")
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision {precision!r}; choose from {PRECISIONS}")
+        self.fusion = fusion
+        self.precision = precision
+        self.channels_last = channels_last
+        self._weights_nhwc = False
+        self.rgb_encoder   = ConvEncoder(in_channels=3, out_channels=embed_dim, input_scale=input_scale)
+        self.depth_encoder = ConvEncoder(in_channels=1, out_channels=embed_dim, input_scale=input_scale)
+        self.lidar_encoder = ConvEncoder(in_channels=lidar_channels, out_channels=embed_dim,
+                                         input_scale=input_scale)
 
         self.attn = nn.MultiheadAttention(embed_dim, num_heads=n_heads, batch_first=True)
+        if fusion == 'latent':
+            self.latents = nn.Parameter(torch.randn(n_latents, embed_dim) * 0.02)
+            # Tells the latents which encoder a token came from (self mode sees it through position only)
+            self.modality_embed = nn.Parameter(torch.zeros(3, embed_dim))
         self.output_head = nn.Sequential(
             nn.Linear(embed_dim, 128),
             nn.ReLU(),
@@ -31,27 +64,49 @@ class AttentionFusion(nn.Module):
         )
 
     def forward(self, rgb, depth, lidar):
+        if self.channels_last:
+            if not self._weights_nhwc:
+                # Deferred to the first call: SB3's orthogonal init can't handle NHWC weights
+                self.to(memory_format=torch.channels_last)
+                self._weights_nhwc = True
+            rgb, depth, lidar = (x.contiguous(memory_format=torch.channels_last) for x in (rgb, depth, lidar))
+        with torch.autocast(rgb.device.type, dtype=torch.bfloat16, enabled=self.precision == 'bf16'):
+            fused_tokens = self._fuse(rgb, depth, lidar)
+
+        # Mean pool across token sequence, accumulating in fp32
+        fused = fused_tokens.float().mean(dim=1)  # [B, C]
+
+        return self.output_head(fused)    # [B, 64]
+
+    def _fuse(self, rgb, depth, lidar):
         # Encode each input: [B, C, H, W] → [B, embed, H', W']
         rgb_feat   = self.rgb_encoder(rgb)
         depth_feat = self.depth_encoder(depth)
         lidar_feat = self.lidar_encoder(lidar)
 
-        # Flatten spatial dims: [B, C, H, W] → [B, HW, C]
+        # Flatten spatial dims: [B, C, H, W] → [B, HW, C] (a free view for channels_last features)
         def flatten_feat(feat):
             B, C, H, W = feat.shape
-            return feat.view(B, C, H * W).transpose(1, 2)  # [B, HW, C]
+            return feat.permute(0, 2, 3, 1).reshape(B, H * W, C)  # [B, HW, C]
 
         rgb_tokens   = flatten_feat(rgb_feat)
         depth_tokens = flatten_feat(depth_feat)
         lidar_tokens = flatten_feat(lidar_feat)
 
+        if self.fusion == 'latent':
+            rgb_tokens   = rgb_tokens + self.modality_embed[0]
+            depth_tokens = depth_tokens + self.modality_embed[1]
+            lidar_tokens = lidar_tokens + self.modality_embed[2]
+
         # Concatenate tokens: [B, N, C] where N = H*W*3
         tokens = torch.cat([rgb_tokens, depth_tokens, lidar_tokens], dim=1)
 
-        # Self-attention fusion
-        fused_tokens, attn_weights = self.attn(tokens, tokens, tokens)  # [B, N, C]
-
-        # Mean pool across token sequence
-        fused = fused_tokens.mean(dim=1)  # [B, C]
-
-        return self.output_head(fused)    # [B, 64]
+        if self.fusion == 'latent':
+            # Latent cross-attention: [B, L, C] queries over [B, N, C] tokens
+            queries = self.latents.unsqueeze(0).expand(tokens.shape[0], -1, -1)
+            fused_tokens, _ = self.attn(queries, tokens, tokens, need_weights=False)  # [B, L, C]
+            fused_tokens = fused_tokens + queries
+        else:
+            # Self-attention fusion
+            fused_tokens, attn_weights = self.attn(tokens, tokens, tokens)  # [B, N, C]
+        return fused_tokens
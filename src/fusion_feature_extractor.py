@@ -0,0 +1,28 @@
+# File: fusion_feature_extractor.py
+# SB3 feature extractor wrapping AttentionFusion, shared by training, export and evaluation.
+
+import gymnasium as gym
+from stable_baselines3.common.torch_layers import BaseFeaturesExtractor
+
+from fusion_attention_module import AttentionFusion
+
+
+class FusionFeatureExtractor(BaseFeaturesExtractor):
+    """AttentionFusion over the rgb/depth/lidar observations.
+
+    `precision`/`channels_last` set the CPU precision policy of AttentionFusion. With
+    fuse_normalize=True the 1/255 image scaling is folded into each encoder's first conv;
+    the policy must then be built with normalize_images=False so SB3 skips its own divide.
+    """
+
+    def __init__(self, observation_space: gym.spaces.Dict, fusion='self', n_latents=16, precision='fp32',
+                 channels_last=False, fuse_normalize=False):
+        super().__init__(observation_space, features_dim=64)
+        # Multi-channel LiDAR BEV grids (see bev_rasterizer.py) widen the LiDAR encoder input
+        self.fusion = AttentionFusion(lidar_channels=observation_space['lidar'].shape[0],
+                                      fusion=fusion, n_latents=n_latents, precision=precision,
+                                      channels_last=channels_last,
+                                      input_scale=1.0 / 255.0 if fuse_normalize else 1.0)
+
+    def forward(self, obs):
+        return self.fusion(obs['rgb'], obs['depth'], obs['lidar'])  # [B, 64]
@@ -0,0 +1,326 @@
+# File: inference_server.py
+# One policy process serving many env workers: observations arrive through shared memory,
+# requests are batched dynamically and actions, values and log-probs go back the same way.
+
+import argparse
+import multiprocessing as mp
+import time
+from collections import deque
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+
+import numpy as np
+
+RESULTS = {'action': np.int64, 'value': np.float32, 'log_prob': np.float32}
+_REQUEST = b'r'
+_HANGUP = b'h'
+_REPLY = b''
+
+
+def _layout(observation_space, n_clients):
+    """{key: (offset, shape, dtype)} of every [n_clients, ...] observation and result array, and the size."""
+    arrays = [(key, space.shape, np.dtype(space.dtype)) for key, space in observation_space.spaces.items()]
+    arrays += [(key, (), np.dtype(dtype)) for key, dtype in RESULTS.items()]
+    layout = {}
+    offset = 0
+    for key, shape, dtype in arrays:
+        offset = -(-offset // 64) * 64  # cache-line align every array
+        layout[key] = (offset, (n_clients,) + tuple(shape), dtype.str)
+        offset += n_clients * int(np.prod(shape)) * dtype.itemsize
+    return layout, max(offset, 1)
+
+
+def _views(buf, layout):
+    return {key: np.ndarray(shape, dtype=np.dtype(dtype), buffer=buf, offset=offset)
+            for key, (offset, shape, dtype) in layout.items()}
+
+
+def _summary(values, unit):
+    if not values:
+        return {}
+    x = np.fromiter(values, dtype=np.float64, count=len(values))
+    p50, p90, p99 = np.percentile(x, (50, 90, 99))
+    return {f'mean_{unit}': float(x.mean()), f'p50_{unit}': float(p50), f'p90_{unit}': float(p90),
+            f'p99_{unit}': float(p99), f'max_{unit}': float(x.max()), 'count': len(x)}
+
+
+def _serve(model_path, control, conns, max_batch, max_wait, deterministic, num_threads, window):
+    """Server process: loads the policy, then batches client requests until every client hangs up."""
+    import torch
+    from stable_baselines3 import PPO
+
+    torch.set_num_threads(num_threads or 1)
+    policy = PPO.load(model_path, device='cpu').policy
+    policy.set_training_mode(False)
+    obs_keys = list(policy.observation_space.spaces)
+
+    control.send(policy.observation_space)
+    name, layout = control.recv()
+    shm = shared_memory.SharedMemory(name=name)
+    arrays = _views(shm.buf, layout)
+
+    batch_sizes = deque(maxlen=window)
+    queue_ms = deque(maxlen=window)
+    forward_ms = deque(maxlen=window)
+    n_requests = 0
+
+    def stats():
+        return {'requests': n_requests, 'batch_size': _summary(batch_sizes, 'size'),
+                'queue': _summary(queue_ms, 'ms'), 'forward': _summary(forward_ms, 'ms')}
+
+    open_conns = {conn: index for index, conn in enumerate(conns)}
+    pending = []  # (client index, arrival time), oldest first
+    try:
+        while open_conns:
+            # Wait for more requests until the oldest pending one reaches its deadline
+            timeout = None
+            if pending:
+                timeout = max(pending[0][1] + max_wait - time.perf_counter(), 0.0)
+            for conn in wait(list(open_conns) + [control], timeout):
+                if conn is control:
+                    try:
+                        control.recv()
+                    except EOFError:
+                        return  # the parent is gone
+                    control.send(('stats', stats()))
+                    continue
+                try:
+                    message = conn.recv_bytes()
+                except EOFError:
+                    message = _HANGUP
+                if message == _HANGUP:
+                    del open_conns[conn]
+                    continue
+                pending.append((open_conns[conn], time.perf_counter()))
+
+            # Flush when the batch is full, the deadline passed, or no other client can still ask
+            if not pending or (len(pending) < max_batch and len(pending) < len(open_conns)
+                               and time.perf_counter() < pending[0][1] + max_wait):
+                continue
+            batch, pending = pending[:max_batch], pending[max_batch:]
+            ids = np.array([index for index, _ in batch])
+            start = time.perf_counter()
+            with torch.no_grad():
+                obs = {key: torch.from_numpy(arrays[key][ids]) for key in obs_keys}
+                actions, values, log_probs = policy(obs, deterministic=deterministic)
+            arrays['action'][ids] = actions.numpy().reshape(-1)
+            arrays['value'][ids] = values.numpy().reshape(-1)
+            arrays['log_prob'][ids] = log_probs.numpy().reshape(-1)
+            done = time.perf_counter()
+
+            for index, arrived in batch:
+                conns[index].send_bytes(_REPLY)
+                queue_ms.append((start - arrived) * 1e3)
+            batch_sizes.append(len(batch))
+            forward_ms.append((done - start) * 1e3)
+            n_requests += len(batch)
+        control.send(('final', stats()))
+    finally:
+        arrays = None
+        shm.close()
+
+
+class InferenceClient:
+    """A worker's handle to the InferenceServer; picklable, so it can be passed to a worker process.
+
+    predict() writes the observation into the client's shared-memory row, sends a one-byte
+    request and blocks until the server has written the action, value and log-prob back.
+    """
+
+    def __init__(self, name, layout, index, conn):
+        self.name, self.layout, self.index, self.conn = name, layout, index, conn
+        self._shm = self._arrays = None
+
+    def __getstate__(self):
+        return {'name': self.name, 'layout': self.layout, 'index': self.index, 'conn': self.conn}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    def act(self, obs):
+        """(action, value, log_prob) for one observation."""
+        if self._arrays is None:
+            # Workers share the parent's resource tracker, so the parent's unlink() covers this handle
+            self._shm = shared_memory.SharedMemory(name=self.name)
+            self._arrays = _views(self._shm.buf, self.layout)
+        row = self.index
+        for key, value in obs.items():
+            np.copyto(self._arrays[key][row], value)
+        self.conn.send_bytes(_REQUEST)
+        self.conn.recv_bytes()
+        return int(self._arrays['action'][row]), float(self._arrays['value'][row]), \
+            float(self._arrays['log_prob'][row])
+
+    def predict(self, obs, deterministic=None):
+        """SB3-style (action, state); determinism is fixed by the server."""
+        return self.act(obs)[0], None
+
+    def close(self):
+        """Hang up; the server stops once every client has."""
+        self._arrays = None
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+        self.conn.send_bytes(_HANGUP)
+        self.conn.close()
+
+
+class InferenceServer:
+    """Runs a saved PPO policy in its own process for `n_clients` env workers.
+
+    Requests are collected into a batch until it holds `max_batch` of them, every live
+    client is waiting, or the oldest has waited `max_wait_ms`; the policy (feature
+    extractor included) then runs once on the whole batch. Each client gets a row of
+    one shared-memory block for its observation and results; the pipes only carry a byte
+    each way. stats() reports batch sizes, queue latency (arrival to forward pass) and
+    forward time over the last `window` batches.
+    """
+
+    def __init__(self, model_path, n_clients, max_batch=32, max_wait_ms=2.0, deterministic=True,
+                 num_threads=None, window=1000):
+        if n_clients < 1 or max_batch < 1:
+            raise ValueError("n_clients and max_batch must be >= 1")
+        ctx = mp.get_context('spawn')
+        self.control, server_control = ctx.Pipe()
+        pairs = [ctx.Pipe() for _ in range(n_clients)]
+        self.process = ctx.Process(
+            target=_serve,
+            args=(model_path, server_control, [server for server, _ in pairs], max_batch, max_wait_ms / 1e3,
+                  deterministic, num_threads, window),
+            daemon=True,
+        )
+        self.process.start()
+        server_control.close()
+        for server, _ in pairs:
+            server.close()
+
+        if not self.control.poll(120.0):
+            self.process.terminate()
+            raise RuntimeError(f"Inference server did not load {model_path}")
+        self.observation_space = self.control.recv()
+        layout, size = _layout(self.observation_space, n_clients)
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self.control.send((self._shm.name, layout))
+        self.clients = [InferenceClient(self._shm.name, layout, index, client)
+                        for index, (_, client) in enumerate(pairs)]
+        self._final_stats = None
+        self._closed = False
+
+    def stats(self):
+        """{'requests', 'batch_size', 'queue', 'forward'} rolling statistics from the server."""
+        if self._final_stats is None and self.control.poll():
+            self._final_stats = self.control.recv()[1]  # the server has already stopped
+        if self._final_stats is not None:
+            return self._final_stats
+        self.control.send('stats')
+        kind, stats = self.control.recv()
+        if kind == 'final':  # every client had already hung up
+            self._final_stats = stats
+        return stats
+
+    def close(self, timeout=30.0):
+        """Wait for every client to hang up, then stop the server; returns its final stats."""
+        if self._closed:
+            return self._final_stats
+        self._closed = True
+        for client in self.clients:
+            client.conn.close()  # the parent's copies; workers hold their own
+        if self._final_stats is None:
+            try:
+                if self.control.poll(timeout):
+                    self._final_stats = self.control.recv()[1]
+            except EOFError:
+                pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self._shm.close()
+        self._shm.unlink()
+        return self._final_stats
+
+
+def _env_worker(client, endpoint, model_path, fake, max_steps, results):
+    """Bench worker: drives one CarlaFusionEnv on `endpoint` (host, port, tm_port), taking actions
+    from `client` or, without one, a local model."""
+    if fake:
+        import fake_carla
+        fake_carla.install()
+    from carla_fusion_env import CarlaFusionEnv
+
+    if client is None:
+        import torch
+        from stable_baselines3 import PPO
+        torch.set_num_threads(1)
+        policy = PPO.load(model_path, device='cpu')
+    else:
+        policy = client
+    host, port, tm_port = endpoint
+    env = CarlaFusionEnv(host=host, port=port, tm_port=tm_port, headless=True)
+    decide_ms = []
+    try:
+        obs, _ = env.reset()
+        for _ in range(max_steps):
+            start = time.perf_counter()
+            action, _ = policy.predict(obs, deterministic=True)
+            decide_ms.append((time.perf_counter() - start) * 1e3)
+            obs, _, terminated, truncated, _ = env.step(int(action))
+            if terminated or truncated:
+                obs, _ = env.reset()
+    finally:
+        env.close()
+        if client is not None:
+            client.close()
+    results.put(decide_ms)
+
+
+def main(model_path='ppo_carla_attention', workers=4, steps=200, endpoints=None, fake=False, max_batch=32,
+         max_wait_ms=2.0, replicas=False):
+    from carla_vec_env import check_distinct_endpoints, parse_endpoint
+
+    # Every CarlaFusionEnv clears and ticks its whole world, so each worker needs its own simulator
+    endpoints = endpoints or [f"localhost:{2000 + 2 * i}" for i in range(workers)]
+    parsed = [parse_endpoint(e) for e in endpoints]
+    check_distinct_endpoints(parsed)
+    workers = len(parsed)
+    ctx = mp.get_context('spawn')
+    results = ctx.Queue()
+    server = None if replicas else InferenceServer(model_path, workers, max_batch=max_batch,
+                                                   max_wait_ms=max_wait_ms)
+    start = time.perf_counter()
+    processes = [ctx.Process(target=_env_worker,
+                             args=(None if replicas else server.clients[i], endpoint, model_path, fake, steps,
+                                   results))
+                 for i, endpoint in enumerate(parsed)]
+    for process in processes:
+        process.start()
+    decide_ms = np.concatenate([results.get() for _ in processes])
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+
+    mode = f"{workers} model replicas" if replicas else f"inference server (max_batch={max_batch})"
+    print(f"{mode}: {len(decide_ms) / elapsed:.1f} env steps/s, decision p50 {np.percentile(decide_ms, 50):.2f} ms, "
+          f"p99 {np.percentile(decide_ms, 99):.2f} ms")
+    if server is not None:
+        stats = server.close()
+        print(f"batch size mean {stats['batch_size']['mean_size']:.2f}, queue p50 {stats['queue']['p50_ms']:.2f} ms, "
+              f"forward p50 {stats['forward']['p50_ms']:.2f} ms over {stats['requests']} requests")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Drive env workers from one batched policy server")
+    parser.add_argument('--model', type=str, default='ppo_carla_attention')
+    parser.add_argument('--workers', type=int, default=4,
+                        help="Without --endpoints, start this many workers on localhost:2000, :2002, ...")
+    parser.add_argument('--endpoints', nargs='+', default=None,
+                        help="Simulator endpoints as host[:port[:tm_port]], one env worker per endpoint")
+    parser.add_argument('--steps', type=int, default=200, help="Steps per worker")
+    parser.add_argument('--fake', action='store_true', help="Run the workers against the in-process fake simulator")
+    parser.add_argument('--max_batch', type=int, default=32)
+    parser.add_argument('--max_wait_ms', type=float, default=2.0)
+    parser.add_argument('--replicas', action='store_true',
+                        help="Baseline: every worker loads its own model and predicts one observation at a time")
+    args = parser.parse_args()
+
+    main(args.model, workers=args.workers, steps=args.steps, endpoints=args.endpoints, fake=args.fake,
+         max_batch=args.max_batch, max_wait_ms=args.max_wait_ms, replicas=args.replicas)
@@ -1,11 +1,15 @@
+import argparse
+import math
 import carla
 import numpy as np
-import cv2
-import os
-import time
+from depth_codec import DepthCodec
+from episode_store import EpisodeWriter
+from sensor_sync import SensorSynchronizer
 
 SAVE_DIR = 'sensor_output'
-os.makedirs(SAVE_DIR, exist_ok=True)
+FIXED_DELTA_SECONDS = 0.05  # 20 FPS
+
+DEPTH_CODEC = DepthCodec()
 
 def create_rgb_sensor(world, vehicle):
     blueprint = world.get_blueprint_library().find('sensor.camera.rgb')
@@ -32,28 +36,51 @@ def create_lidar_sensor(world, vehicle):
     lidar_transform = carla.Transform(carla.Location(z=2.5))
     return world.spawn_actor(blueprint, lidar_transform, attach_to=vehicle)
 
-def to_bgra_array(image):
-    return np.reshape(np.copy(image.raw_data), (image.height, image.width, 4))
-
-def save_image(image, filename):
-    array = to_bgra_array(image)[:, :, :3]  # Drop alpha
-    cv2.imwrite(filename, cv2.cvtColor(array, cv2.COLOR_RGB2BGR))
-
-def save_depth_image(image, filename):
-    array = to_bgra_array(image)
-    normalized = (array[:, :, 0] + array[:, :, 1]*256 + array[:, :, 2]*256*256) / (256**3 - 1)
-    depth_meters = 1000 * normalized
-    np.save(filename, depth_meters)
-
-def save_lidar_data(point_cloud, filename):
-    points = np.frombuffer(point_cloud.raw_data, dtype=np.float32).reshape(-1, 4)[:, :3]
-    np.save(filename, points)
-
-def main():
+def lidar_points_per_tick(lidar, delta_seconds=FIXED_DELTA_SECONDS):
+    """Most points one tick of a spawned ray-cast LiDAR can return: its points_per_second over one tick."""
+    return math.ceil(float(lidar.attributes['points_per_second']) * delta_seconds)
+
+def sensor_fields(max_lidar_points, width=800, height=600):
+    """Fixed-shape episode store fields for one synchronized frame of all three sensors.
+
+    LiDAR points beyond max_lidar_points are cut off and counted in 'lidar_truncated'.
+    """
+    return {
+        'frame': ((), 'int64'),
+        'rgb': ((height, width, 3), 'uint8'),
+        'depth': ((height, width), 'float32'),
+        'lidar': ((max_lidar_points, 4), 'float32'),
+        'lidar_count': ((), 'int32'),
+        'lidar_truncated': ((), 'int32'),
+    }
+
+def frame_row(data, depth_out, lidar_out):
+    """Decode one synchronized frame into a store row; depth_out/lidar_out are reused scratch buffers."""
+    rgb, depth, lidar = data['rgb'], data['depth'], data['lidar']
+    points = np.frombuffer(lidar.raw_data, dtype=np.float32).reshape(-1, 4)
+    count = min(len(points), len(lidar_out))
+    lidar_out[:count] = points[:count]
+    lidar_out[count:] = 0.0
+    return {
+        'frame': rgb.frame,
+        'rgb': np.frombuffer(rgb.raw_data, dtype=np.uint8).reshape(rgb.height, rgb.width, 4)[:, :, :3],
+        'depth': DEPTH_CODEC.decode(depth.raw_data, depth.height, depth.width, out=depth_out),
+        'lidar': lidar_out,
+        'lidar_count': count,
+        'lidar_truncated': len(points) - count,
+    }
+
+def main(max_frames=10, store_dir=SAVE_DIR, compress=False):
     client = carla.Client('localhost', 2000)
     client.set_timeout(5.0)
     world = client.get_world()
 
+    original_settings = world.get_settings()
+    settings = world.get_settings()
+    settings.synchronous_mode = True
+    settings.fixed_delta_seconds = FIXED_DELTA_SECONDS
+    world.apply_settings(settings)
+
     blueprint_library = world.get_blueprint_library()
     vehicle_bp = blueprint_library.filter('model3')[0]
     spawn_point = world.get_map().get_spawn_points()[0]
@@ -65,33 +92,43 @@ def main():
 
     sensors = [rgb, depth, lidar]
 
-    frame_count = 0
-    max_frames = 10
-
-    def rgb_callback(image):
-        nonlocal frame_count
-        save_image(image, os.path.join(SAVE_DIR, f'rgb_{image.frame}.png'))
-        frame_count += 1
-
-    def depth_callback(image):
-        save_depth_image(image, os.path.join(SAVE_DIR, f'depth_{image.frame}.npy'))
+    # Callbacks only enqueue; decoding happens in the tick loop and disk I/O in the writer thread
+    sync = SensorSynchronizer(('rgb', 'depth', 'lidar'))
+    rgb.listen(sync.callback('rgb'))
+    depth.listen(sync.callback('depth'))
+    lidar.listen(sync.callback('lidar'))
 
-    def lidar_callback(point_cloud):
-        save_lidar_data(point_cloud, os.path.join(SAVE_DIR, f'lidar_{point_cloud.frame}.npy'))
-
-    rgb.listen(rgb_callback)
-    depth.listen(depth_callback)
-    lidar.listen(lidar_callback)
+    # Sized from the sensor's own rate, so a denser LiDAR config is not silently cut off
+    max_lidar_points = lidar_points_per_tick(lidar)
+    writer = EpisodeWriter(store_dir, sensor_fields(max_lidar_points), chunk_size=64, compress=compress)
+    depth_out = np.empty((600, 800), dtype=np.float32)
+    lidar_out = np.empty((max_lidar_points, 4), dtype=np.float32)
 
+    frame_count = 0
+    truncated = 0
     try:
         while frame_count < max_frames:
-            time.sleep(0.1)
+            frame = world.tick()
+            row = frame_row(sync.get(frame), depth_out, lidar_out)
+            truncated += row['lidar_truncated']
+            writer.append(row, first=frame_count == 0)
+            frame_count += 1
     finally:
         for s in sensors:
             s.stop()
             s.destroy()
         vehicle.destroy()
-        print(f'Done. Saved {frame_count} frames to {SAVE_DIR}/')
+        world.apply_settings(original_settings)
+        writer.close()
+        print(f'Done. Saved {frame_count} frames to {store_dir}/')
+        if truncated:
+            print(f'Warning: {truncated} LiDAR points beyond {max_lidar_points} per frame were dropped')
 
 if __name__ == '__main__':
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--frames', type=int, default=10, help="Number of synchronized frames to record")
+    parser.add_argument('--out', type=str, default=SAVE_DIR, help="Episode store directory")
+    parser.add_argument('--compress', action='store_true', help="Write zlib-compressed chunks")
+    args = parser.parse_args()
+
+    main(max_frames=args.frames, store_dir=args.out, compress=args.compress)
@@ -0,0 +1,327 @@
+# File: multi_ego_vec_env.py
+# Several ego vehicles in one synchronous CARLA world, stepped together as an SB3 VecEnv.
+
+import carla
+import gymnasium as gym
+import numpy as np
+from stable_baselines3.common.vec_env import VecEnv
+
+from actor_lifecycle import destroy_actors, lookup_actors, spawn_actor_ids, spawn_children
+from carla_fusion_env import FIXED_DELTA_SECONDS, default_reward_fn, sensor_rig_specs
+from observation_processor import ObservationProcessor
+from sensor_sync import SensorSynchronizer, SensorTimeout
+from step_timer import NullStepTimer, StepTimer
+from world_manager import get_world_manager
+
+MAX_EPISODE_TICKS = 200  # same episode limit as CarlaFusionEnv
+MIN_SPAWN_GAP = 5.0  # metres between a respawning ego and every other ego
+
+
+class _Ego:
+    """One ego vehicle, its sensor rig and its episode counters."""
+
+    def __init__(self, vehicle, sensors, sensor_sync):
+        self.vehicle = vehicle
+        self.sensors = sensors  # (rgb, depth, lidar)
+        self.sensor_sync = sensor_sync
+        self.stuck_counter = 0
+        self.step_counter = 0
+
+
+class MultiEgoVecEnv(VecEnv):
+    """K ego vehicles, each with its own RGB/depth/LiDAR rig, sharing one CARLA world.
+
+    A step applies all K controls and advances the world once per tick, so the shared
+    simulation cost is paid once for K samples. Observations come back as stacked
+    [K, ...] uint8 arrays from a pair of alternating buffers: a batch stays valid until
+    the following step. Rewards, termination and the 200-tick limit are per ego, as in
+    CarlaFusionEnv with headless=True. Only actors this env spawned are ever destroyed.
+
+    A finished ego's terminal observation goes to info['terminal_observation'] and the
+    ego is teleported to a free spawn point. The world then runs one more decision
+    interval, so the observation returned for it is the first frame of its new episode
+    and the next step reads its speed after the teleport. Egos still driving keep their
+    action and are scored on that interval as well; should one finish in it, it is reset
+    the same way. info['frame'] is the frame every returned row comes from, and
+    info['ticks'] the world ticks the step took.
+    """
+
+    def __init__(self, n_egos=4, host='localhost', port=2000, tm_port=8000, map_name="Town01", reward_fn=None,
+                 sensor_timeout=2.0, image_size=128, camera_size=None, bev_config=None, action_repeat=1,
+                 timing=False, timing_window=1000):
+        if action_repeat < 1:
+            raise ValueError("action_repeat must be >= 1")
+        self.action_repeat = action_repeat
+        # Per-stage step timing as in CarlaFusionEnv; see get_step_stats()
+        self.step_timer = StepTimer(timing_window) if timing else NullStepTimer()
+        self.reward_fn = reward_fn or default_reward_fn
+        self.sensor_timeout = sensor_timeout
+        self.render_mode = None
+
+        self.world_manager = get_world_manager(host, port)
+        self.client = self.world_manager.client
+        self.world = self.world_manager.load_map(map_name)
+        self._apply_sync_settings()
+        self.traffic_manager = self.world_manager.traffic_manager(tm_port)
+
+        map_info = self.world_manager.map_info()
+        self.blueprint_library = map_info.blueprint_library
+        self.vehicle_bp = self.blueprint_library.filter('model3')[0]
+        self.spawn_points = map_info.spawn_points
+        if n_egos > len(self.spawn_points):
+            raise ValueError(f"{n_egos} egos but the map only has {len(self.spawn_points)} spawn points")
+
+        self.processor = ObservationProcessor(image_size=image_size, camera_size=camera_size, bev_config=bev_config)
+        observation_space = gym.spaces.Dict({
+            key: gym.spaces.Box(0, 255, shape=shape, dtype=np.uint8)
+            for key, shape in self.processor.shapes.items()
+        })
+        super().__init__(n_egos, observation_space, gym.spaces.Discrete(3))
+
+        self._buffers = [
+            {key: np.zeros((n_egos,) + shape, dtype=np.uint8) for key, shape in self.processor.shapes.items()}
+            for _ in range(2)
+        ]
+        self._slot = 0
+        self._actions = None
+        self._rng = np.random.default_rng()
+        self.egos = []
+        self._spawn_egos()
+
+    def _apply_sync_settings(self):
+        self.world_manager.apply_settings(True, FIXED_DELTA_SECONDS)
+
+    def _spawn_egos(self):
+        # Vehicles in batches until every ego has a free spawn point, all rigs in one batch, one lookup
+        remaining = list(self._rng.permutation(len(self.spawn_points)))
+        vehicle_ids = []
+        try:
+            while len(vehicle_ids) < self.num_envs and remaining:
+                wanted = self.num_envs - len(vehicle_ids)
+                batch, remaining = remaining[:wanted], remaining[wanted:]
+                # Occupied points, possibly by another client's actors, just fail their spawn
+                ids, _ = spawn_actor_ids(self.client, [(self.vehicle_bp, self.spawn_points[i], None) for i in batch])
+                vehicle_ids += [i for i in ids if i is not None]
+            if len(vehicle_ids) < self.num_envs:
+                raise RuntimeError(f"Only {len(vehicle_ids)} of {self.num_envs} egos could be spawned")
+            rig = sensor_rig_specs(self.blueprint_library, self.processor.camera_size, headless=True,
+                                   action_repeat=self.action_repeat)
+            rigs = spawn_children(self.client, vehicle_ids, rig)
+        except Exception:
+            destroy_actors(self.client, vehicle_ids)
+            raise
+
+        actors = iter(lookup_actors(self.world, [i for vehicle_id, rig_ids in zip(vehicle_ids, rigs)
+                                                 for i in (vehicle_id,) + rig_ids]))
+        for _ in vehicle_ids:
+            vehicle, sensors = next(actors), tuple(next(actors) for _ in rig)
+            ego = _Ego(vehicle, sensors, SensorSynchronizer(('rgb', 'depth', 'lidar'), timeout=self.sensor_timeout))
+            for name, sensor in zip(ego.sensor_sync.names, ego.sensors):
+                sensor.listen(ego.sensor_sync.callback(name))
+            self.egos.append(ego)
+
+    def _destroy_egos(self):
+        """Destroy the actors this env spawned, and nothing else in the world, in one batch."""
+        actors = []
+        for ego in self.egos:
+            for sensor in ego.sensors:
+                sensor.stop()
+            actors += list(ego.sensors) + [ego.vehicle]
+        destroy_actors(self.client, actors)
+        self.egos = []
+
+    def _free_spawn_point(self, locations):
+        """A random spawn point at least MIN_SPAWN_GAP from every location in `locations`."""
+        order = self._rng.permutation(len(self.spawn_points))
+        for index in order:
+            point = self.spawn_points[index]
+            if all(point.location.distance(loc) >= MIN_SPAWN_GAP for loc in locations):
+                return point
+        return self.spawn_points[order[0]]
+
+    def _teleport(self, ego, spawn_point):
+        ego.vehicle.apply_control(carla.VehicleControl())
+        ego.vehicle.set_target_velocity(carla.Vector3D())
+        ego.vehicle.set_target_angular_velocity(carla.Vector3D())
+        ego.vehicle.set_transform(spawn_point)
+        ego.stuck_counter = 0
+        ego.step_counter = 0
+
+    def _ego_locations(self, exclude=()):
+        """Last tick's location of every ego not in `exclude`."""
+        snapshot = self.world.get_snapshot()
+        locations = []
+        for ego in self.egos:
+            actor = snapshot.find(ego.vehicle.id)
+            if ego not in exclude and actor is not None:
+                locations.append(actor.get_transform().location)
+        return locations
+
+    def _speeds(self):
+        # All egos from the snapshot the client caches with every tick: no round-trips
+        snapshot = self.world.get_snapshot()
+        speeds = np.empty(self.num_envs)
+        for k, ego in enumerate(self.egos):
+            actor = snapshot.find(ego.vehicle.id)
+            if actor is None:
+                raise RuntimeError(f"Ego {k} missing from world snapshot")
+            v = actor.get_velocity()
+            speeds[k] = (v.x**2 + v.y**2 + v.z**2)**0.5 * 3.6  # convert m/s to km/h
+        return speeds
+
+    def _tick_decision(self):
+        for _ in range(self.action_repeat):
+            frame = self.world.tick()
+        return frame
+
+    def _collect(self, frame, timeout=None):
+        """Decode every ego's sensors for `frame` into the next [K, ...] buffer set."""
+        out = self._buffers[self._slot]
+        self._slot ^= 1
+        for k, ego in enumerate(self.egos):
+            data = ego.sensor_sync.get(frame, timeout)
+            self.step_timer.lap('sensor_wait')
+            self.processor.decode_rgb(data['rgb'].raw_data, out['rgb'][k])
+            self.processor.decode_depth(data['depth'].raw_data, out['depth'][k])
+            self.processor.decode_lidar(data['lidar'].raw_data, out['lidar'][k])
+            self.step_timer.lap('decode')
+        return out
+
+    def _first_observation(self):
+        """Tick freshly spawned sensors until they deliver a frame, which sets the decision grid."""
+        for _ in range(self.action_repeat - 1):
+            frame = self.world.tick()
+            try:
+                return self._collect(frame, min(self.sensor_timeout, 0.25)), frame
+            except SensorTimeout:
+                continue
+        frame = self.world.tick()
+        return self._collect(frame), frame
+
+    def reset(self):
+        if self._seeds[0] is not None:
+            self._rng = np.random.default_rng(self._seeds[0])
+            self.action_space.seed(self._seeds[0])
+        self._reset_seeds()
+        self._reset_options()
+
+        if len(self.egos) != self.num_envs or not all(ego.vehicle.is_alive for ego in self.egos):
+            self._destroy_egos()
+            self._spawn_egos()
+            obs, frame = self._first_observation()
+        else:
+            order = self._rng.permutation(len(self.spawn_points))
+            for ego, index in zip(self.egos, order):
+                self._teleport(ego, self.spawn_points[index])
+            for ego in self.egos:
+                ego.sensor_sync.flush()
+            for attempt in range(3):
+                frame = self._tick_decision()
+                try:
+                    obs = self._collect(frame)
+                    break
+                except SensorTimeout:
+                    if attempt == 2:
+                        raise
+        self.reset_infos = [{'frame': frame} for _ in range(self.num_envs)]
+        return obs
+
+    def step_async(self, actions):
+        self._actions = np.asarray(actions).reshape(self.num_envs)
+
+    def step_wait(self):
+        timer = self.step_timer
+        timer.start()
+        for ego, action in zip(self.egos, self._actions):
+            control = carla.VehicleControl()
+            control.throttle = 0.8
+            control.steer = {-1: -0.5, 0: 0.0, 1: 0.5}[int(action) - 1]
+            ego.vehicle.apply_control(control)
+        timer.lap('control')
+
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        terminated = np.zeros(self.num_envs, dtype=bool)
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        running = np.ones(self.num_envs, dtype=bool)
+        infos = [{} for _ in range(self.num_envs)]
+        # Egos reset in an earlier interval of this step are excluded from the snapshot
+        # and their new spawn points avoided instead, so two never land on the same one
+        moved, picked = [], []
+        ticks = 0
+        while True:
+            frame = self._run_interval(running, rewards, terminated)
+            ticks += self.action_repeat
+            obs = self._collect(frame)
+            finished = []
+            for k in np.flatnonzero(running):
+                ego = self.egos[k]
+                truncated[k] = ego.step_counter >= MAX_EPISODE_TICKS
+                if terminated[k] or truncated[k]:
+                    finished.append(k)
+            if not finished:
+                break
+            for k in finished:
+                ego = self.egos[k]
+                infos[k]['terminal_observation'] = {key: value[k].copy() for key, value in obs.items()}
+                moved.append(ego)
+                point = self._free_spawn_point(self._ego_locations(exclude=moved)
+                                               + [p.location for p in picked])
+                picked.append(point)
+                self._teleport(ego, point)
+                running[k] = False
+            timer.lap('reset')
+
+        dones = ~running
+        step_timing = timer.end() if timer.enabled else None
+        for k, (ego, info) in enumerate(zip(self.egos, infos)):
+            info.update({'frame': frame, 'ticks': ticks, 'dropped_frames': ego.sensor_sync.dropped_frames,
+                         'TimeLimit.truncated': bool(truncated[k] and not terminated[k])})
+            if step_timing is not None:
+                info['timing'] = step_timing
+        return obs, rewards, dones, infos
+
+    def _run_interval(self, running, rewards, terminated):
+        """Hold the applied controls for one decision interval of shared ticks.
+
+        Every ego in `running` is scored on each tick, with its termination sticky.
+        Returns the last tick's frame.
+        """
+        timer = self.step_timer
+        for _ in range(self.action_repeat):
+            speeds = self._speeds()
+            timer.lap('state')
+            frame = self.world.tick()
+            timer.lap('tick')
+            for k in np.flatnonzero(running):
+                ego = self.egos[k]
+                ego.stuck_counter = ego.stuck_counter + 1 if speeds[k] < 0.5 else 0
+                reward, tick_terminated = self.reward_fn(speed=speeds[k], stuck_counter=ego.stuck_counter,
+                                                         step_counter=ego.step_counter)
+                ego.step_counter += 1
+                if not terminated[k]:
+                    rewards[k] += reward
+                    terminated[k] = tick_terminated
+            timer.lap('reward')
+        return frame
+
+    def get_step_stats(self):
+        return self.step_timer.stats()
+
+    def close(self):
+        self._destroy_egos()
+        self.world_manager.apply_settings(False)
+
+    # The K egos live in this one object, so per-env attribute access resolves on it
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self, attr_name)] * len(self._get_indices(indices))
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        result = getattr(self, method_name)(*method_args, **method_kwargs)
+        return [result] * len(self._get_indices(indices))
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False] * len(self._get_indices(indices))
@@ -0,0 +1,82 @@
+# File: run_exported_policy.py
+# Drives CarlaFusionEnv with a policy artifact from export_policy.py.
+# Needs only torch at inference time: stable_baselines3 is never imported.
+
+import argparse
+import json
+import time
+
+import numpy as np
+import torch
+
+META_FILE = 'meta.json'
+
+
+class ExportedPolicy:
+    """Loads a TorchScript policy artifact and picks deterministic actions for single observations."""
+
+    def __init__(self, path, num_threads=None):
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        extra = {META_FILE: ''}
+        self.module = torch.jit.load(path, map_location='cpu', _extra_files=extra)
+        self.meta = json.loads(extra[META_FILE])
+        self.obs_keys = self.meta['obs_keys']
+
+    @torch.inference_mode()
+    def logits(self, obs):
+        inputs = [torch.from_numpy(np.ascontiguousarray(obs[key])).unsqueeze(0) for key in self.obs_keys]
+        return self.module(*inputs)[0]
+
+    def predict(self, obs):
+        return int(self.logits(obs).argmax())
+
+
+def main(artifact='policy.ts', episodes=1, max_steps=200, host='localhost', port=2000, fake=False, num_threads=None,
+         maps=None):
+    if fake:
+        import fake_carla
+        fake_carla.install()
+    from carla_fusion_env import CarlaFusionEnv
+    from world_manager import get_world_manager, group_by_map
+
+    policy = ExportedPolicy(artifact, num_threads)
+    print(f"Loaded {artifact} (quantize={policy.meta['quantize']})")
+    maps = maps or [get_world_manager(host, port).map_name]
+    # Run every episode of a map back to back, so each map is loaded once
+    jobs = [job for _, group in group_by_map((m, e) for e in range(episodes) for m in maps) for job in group]
+    env = CarlaFusionEnv(host=host, port=port, map_name=jobs[0][0])
+    decide_ms = []
+    try:
+        for map_name, episode in jobs:
+            obs, _ = env.reset(options={'map_name': map_name})
+            total = 0.0
+            for step in range(max_steps):
+                start = time.perf_counter()
+                action = policy.predict(obs)
+                decide_ms.append((time.perf_counter() - start) * 1e3)
+                obs, reward, terminated, truncated, _ = env.step(action)
+                total += reward
+                if terminated or truncated:
+                    break
+            print(f"{map_name} episode {episode}: {step + 1} steps, return {total:.2f}")
+    finally:
+        env.close()
+    print(f"Decision latency: p50 {np.percentile(decide_ms, 50):.2f} ms, p99 {np.percentile(decide_ms, 99):.2f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--artifact', type=str, default='policy.ts')
+    parser.add_argument('--episodes', type=int, default=1)
+    parser.add_argument('--max_steps', type=int, default=200)
+    parser.add_argument('--host', type=str, default='localhost')
+    parser.add_argument('--port', type=int, default=2000)
+    parser.add_argument('--threads', type=int, default=None, help="torch.set_num_threads for inference")
+    parser.add_argument('--fake', action='store_true', help="Run against the in-process fake simulator")
+    parser.add_argument('--maps', nargs='+', default=None,
+                        help="Run --episodes on each of these maps (default: the loaded map)")
+    args = parser.parse_args()
+
+    main(args.artifact, episodes=args.episodes, max_steps=args.max_steps, host=args.host, port=args.port,
+         fake=args.fake, num_threads=args.threads, maps=args.maps)
@@ -1,41 +1,44 @@
-# File: run_trained_policy_with_video.py
+# File: run_trained_policy.py
+# Runs a trained PPO policy without recording; see run_trained_policy_with_video.py for video.
 
-import torch
-import cv2
-import numpy as np
-from stable_baselines3 import PPO
-from carla_fusion_env import CarlaFusionEnv
-
-def main():
-    env = CarlaFusionEnv(rear_chase_camera=True, random_spawn=True)
-    model = PPO.load("ppo_carla_attention")
-
-    obs = env.reset()
-    video_out = cv2.VideoWriter(
-        'ppo_agent_run.avi',
-        cv2.VideoWriter_fourcc(*'mp4'),
-        10,  # FPS
-        (128, 128)  # Output resolution (matches RGB resize)
-    )
+import argparse
 
-    print("🎬 Recording agent policy run...")
-
-    for step in range(100):
-        action, _ = model.predict(obs, deterministic=True)
-        obs, reward, done, _ = env.step(action)
+from stable_baselines3 import PPO
 
-        # Save current RGB frame
-        rgb_np = (obs['rgb'].transpose(1, 2, 0) * 255).astype(np.uint8)
-        video_out.write(cv2.cvtColor(rgb_np, cv2.COLOR_RGB2BGR))
 
-        print(f"Step {step} | Action: {action} | Reward: {reward:.2f}")
-        if done:
-            print("🚧 Episode ended early.")
-            break
+def main(model_path='ppo_carla_attention', steps=100, episodes=1, host='localhost', port=2000, fake=False):
+    if fake:
+        import fake_carla
+        fake_carla.install()
+    from carla_fusion_env import CarlaFusionEnv
+
+    env = CarlaFusionEnv(host=host, port=port, rear_chase_camera=True, random_spawn=True)
+    model = PPO.load(model_path)
+    try:
+        for episode in range(episodes):
+            obs, _ = env.reset()
+            total = 0.0
+            for step in range(steps):
+                action, _ = model.predict(obs, deterministic=True)
+                obs, reward, terminated, truncated, _ = env.step(action)
+                total += reward
+                print(f"Step {step} | Action: {action} | Reward: {reward:.2f}")
+                if terminated or truncated:
+                    print("🚧 Episode ended early.")
+                    break
+            print(f"Episode {episode}: {step + 1} steps, return {total:.2f}")
+    finally:
+        env.close()
 
-    video_out.release()
-    env.close()
-    print("✅ Video saved as 'ppo_agent_run.avi'")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', type=str, default='ppo_carla_attention')
+    parser.add_argument('--steps', type=int, default=100, help="Maximum steps per episode")
+    parser.add_argument('--episodes', type=int, default=1)
+    parser.add_argument('--host', type=str, default='localhost')
+    parser.add_argument('--port', type=int, default=2000)
+    parser.add_argument('--fake', action='store_true', help="Run against the in-process fake simulator")
+    args = parser.parse_args()
+
+    main(args.model, steps=args.steps, episodes=args.episodes, host=args.host, port=args.port, fake=args.fake)
@@ -1,41 +1,73 @@
 # File: run_trained_policy_with_video.py
+# Runs a trained PPO policy and records RGB, depth, LiDAR BEV and the chase view into one video.
+
+import argparse
+import time
 
-import torch
-import cv2
 import numpy as np
 from stable_baselines3 import PPO
-from carla_fusion_env import CarlaFusionEnv
-
-def main():
-    env = CarlaFusionEnv(rear_chase_camera=True, random_spawn=True)
-    model = PPO.load("ppo_carla_attention")
 
-    obs = env.reset()
-    video_out = cv2.VideoWriter(
-        'ppo_agent_run.avi',
-        cv2.VideoWriter_fourcc(*'XVID'),
-        10,  # FPS
-        (128, 128)  # Output resolution (matches RGB resize)
-    )
 
-    print("🎬 Recording agent policy run...")
+def main(model_path='ppo_carla_attention', output='ppo_agent_run.avi', steps=100, episodes=1, host='localhost',
+         port=2000, fake=False, fps=10, max_queue=64, policy='drop', tile_size=256, chase=True):
+    if fake:
+        import fake_carla
+        fake_carla.install()
+    from carla_fusion_env import CarlaFusionEnv
+    from video_recorder import ChaseCamera, VideoRecorder
 
-    for step in range(100):
-        action, _ = model.predict(obs, deterministic=True)
-        obs, reward, done, _ = env.step(action)
+    env = CarlaFusionEnv(host=host, port=port, rear_chase_camera=True, random_spawn=True)
+    model = PPO.load(model_path)
+    chase_camera = ChaseCamera(env.world) if chase else None
+    recorder = VideoRecorder(output, fps=fps, max_queue=max_queue, policy=policy, tile_size=tile_size)
 
-        # Save current RGB frame
-        rgb_np = (obs['rgb'].transpose(1, 2, 0) * 255).astype(np.uint8)
-        video_out.write(cv2.cvtColor(rgb_np, cv2.COLOR_RGB2BGR))
+    print("🎬 Recording agent policy run...")
+    loop_ms = []
+    try:
+        for episode in range(episodes):
+            obs, _ = env.reset()
+            if chase_camera is not None:
+                chase_camera.attach(env.vehicle)
+            total = 0.0
+            for step in range(steps):
+                start = time.perf_counter()
+                action, _ = model.predict(obs, deterministic=True)
+                obs, reward, terminated, truncated, _ = env.step(action)
+                total += reward
+                recorder.record(obs, action=action, reward=reward, step=step, episode_return=total,
+                                chase=chase_camera.latest() if chase_camera is not None else None)
+                loop_ms.append((time.perf_counter() - start) * 1e3)
+                if terminated or truncated:
+                    print("🚧 Episode ended early.")
+                    break
+            print(f"Episode {episode}: {step + 1} steps, return {total:.2f}")
+    finally:
+        if chase_camera is not None:
+            chase_camera.destroy()
+        env.close()
+        recorder.close()
 
-        print(f"Step {step} | Action: {action} | Reward: {reward:.2f}")
-        if done:
-            print("🚧 Episode ended early.")
-            break
+    print(f"Control loop: p50 {np.percentile(loop_ms, 50):.2f} ms, p99 {np.percentile(loop_ms, 99):.2f} ms")
+    print(f"✅ Video saved as '{output}': {recorder.frames_written} frames, {recorder.dropped_frames} dropped")
 
-    video_out.release()
-    env.close()
-    print("✅ Video saved as 'ppo_agent_run.avi'")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--model', type=str, default='ppo_carla_attention')
+    parser.add_argument('--output', type=str, default='ppo_agent_run.avi')
+    parser.add_argument('--steps', type=int, default=100, help="Maximum steps per episode")
+    parser.add_argument('--episodes', type=int, default=1)
+    parser.add_argument('--host', type=str, default='localhost')
+    parser.add_argument('--port', type=int, default=2000)
+    parser.add_argument('--fake', action='store_true', help="Run against the in-process fake simulator")
+    parser.add_argument('--fps', type=int, default=10)
+    parser.add_argument('--max_queue', type=int, default=64, help="Frames buffered for the encoder thread")
+    parser.add_argument('--queue_policy', choices=('drop', 'block'), default='drop',
+                        help="When the queue is full: drop the frame, or wait for the encoder")
+    parser.add_argument('--tile_size', type=int, default=256)
+    parser.add_argument('--no_chase', action='store_true', help="Leave out the chase camera tile")
+    args = parser.parse_args()
+
+    main(args.model, output=args.output, steps=args.steps, episodes=args.episodes, host=args.host, port=args.port,
+         fake=args.fake, fps=args.fps, max_queue=args.max_queue, policy=args.queue_policy,
+         tile_size=args.tile_size, chase=not args.no_chase)
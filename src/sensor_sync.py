@@ -0,0 +1,77 @@
+# File: sensor_sync.py
+# Frame-locked delivery of sensor callbacks for synchronous-mode CARLA.
+
+import queue
+import time
+
+
+class SensorTimeout(RuntimeError):
+    """A sensor did not deliver the requested frame in time."""
+
+
+class SensorSynchronizer:
+    """Per-sensor queues keyed by the frame id returned from world.tick().
+
+    Sensor `listen` callbacks push measurements into a queue; get(frame) blocks
+    only until every sensor has delivered that exact frame. Older measurements
+    are discarded and counted in `dropped_frames`.
+    """
+
+    def __init__(self, names, timeout=2.0):
+        self.names = tuple(names)
+        self.timeout = timeout
+        self._queues = {name: queue.Queue() for name in self.names}
+        self._pending = {}  # measurements from a frame newer than the one requested
+        self.dropped_frames = 0
+        self.missed_frames = 0
+
+    def callback(self, name):
+        """Return the function to pass to `sensor.listen` for sensor `name`."""
+        return self._queues[name].put
+
+    def get(self, frame, timeout=None):
+        """Return {name: measurement} for `frame`, raising SensorTimeout if it never arrives."""
+        return dict(self.iter_frame(frame, timeout))
+
+    def iter_frame(self, frame, timeout=None):
+        """Yield (name, measurement) for `frame` sensor by sensor, as soon as each one has arrived.
+
+        Lets a caller start work on early sensors while later ones are still in flight.
+        """
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        for name in self.names:
+            q = self._queues[name]
+            while True:
+                data = self._pending.pop(name, None)
+                if data is None:
+                    remaining = deadline - time.monotonic()
+                    try:
+                        data = q.get(timeout=max(remaining, 0.0))
+                    except queue.Empty:
+                        self.missed_frames += 1
+                        raise SensorTimeout(f"Timed out waiting for '{name}' frame {frame}") from None
+                if data.frame < frame:
+                    self.dropped_frames += 1
+                    continue
+                if data.frame > frame:
+                    self._pending[name] = data
+                    self.missed_frames += 1
+                    raise SensorTimeout(f"'{name}' skipped frame {frame} (got {data.frame})")
+                yield name, data
+                break
+
+    def flush(self):
+        """Discard everything queued so far; returns the number of measurements dropped."""
+        n = len(self._pending)
+        self._pending.clear()
+        for q in self._queues.values():
+            while True:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    break
+                n += 1
+        return n
+
+    def stats(self):
+        return {'dropped_frames': self.dropped_frames, 'missed_frames': self.missed_frames}
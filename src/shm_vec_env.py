@@ -0,0 +1,185 @@
+# File: shm_vec_env.py
+# Subprocess vectorized env that returns Dict observations through shared memory.
+
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.env_util import is_wrapped
+from stable_baselines3.common.vec_env import SubprocVecEnv
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper
+from stable_baselines3.common.vec_env.patch_gym import _patch_env
+
+N_SLOTS = 2  # observation slots the workers alternate between
+
+
+def _layout(observation_space, n_envs):
+    """{key: (offset, shape, dtype)} of each [N_SLOTS, n_envs, ...] array in one block, and its size."""
+    layout = {}
+    offset = 0
+    for key, space in observation_space.spaces.items():
+        dtype = np.dtype(space.dtype)
+        shape = (N_SLOTS, n_envs) + tuple(space.shape)
+        offset = -(-offset // 64) * 64  # cache-line align every array
+        layout[key] = (offset, shape, dtype.str)
+        offset += int(np.prod(shape)) * dtype.itemsize
+    return layout, max(offset, 1)
+
+
+def _views(buf, layout):
+    return {key: np.ndarray(shape, dtype=np.dtype(dtype), buffer=buf, offset=offset)
+            for key, (offset, shape, dtype) in layout.items()}
+
+
+def _worker(remote, parent_remote, env_fn_wrapper, index):
+    parent_remote.close()
+    env = _patch_env(env_fn_wrapper.var())
+    shm = arrays = None
+
+    def write(obs, slot):
+        for key, array in arrays.items():
+            np.copyto(array[slot, index], obs[key])
+
+    try:
+        while True:
+            try:
+                cmd, data = remote.recv()
+            except EOFError:
+                break
+            if cmd == 'step':
+                action, slot = data
+                observation, reward, terminated, truncated, info = env.step(action)
+                done = terminated or truncated
+                info['TimeLimit.truncated'] = truncated and not terminated
+                reset_info = {}
+                if done:
+                    # Rare enough to send through the pipe; the env may reuse its buffers on reset
+                    info['terminal_observation'] = {key: np.array(value) for key, value in observation.items()}
+                    observation, reset_info = env.reset()
+                write(observation, slot)
+                remote.send((reward, done, info, reset_info))
+            elif cmd == 'reset':
+                seed, options, slot = data
+                maybe_options = {'options': options} if options else {}
+                observation, reset_info = env.reset(seed=seed, **maybe_options)
+                write(observation, slot)
+                remote.send(reset_info)
+            elif cmd == 'attach':
+                name, layout = data
+                # Workers share the parent's resource tracker, so the parent's unlink() covers this handle
+                shm = shared_memory.SharedMemory(name=name)
+                arrays = _views(shm.buf, layout)
+                remote.send(None)
+            elif cmd == 'render':
+                remote.send(env.render())
+            elif cmd == 'close':
+                env.close()
+                remote.close()
+                break
+            elif cmd == 'get_spaces':
+                remote.send((env.observation_space, env.action_space))
+            elif cmd == 'env_method':
+                method = env.get_wrapper_attr(data[0])
+                remote.send(method(*data[1], **data[2]))
+            elif cmd == 'get_attr':
+                remote.send(env.get_wrapper_attr(data))
+            elif cmd == 'has_attr':
+                try:
+                    env.get_wrapper_attr(data)
+                    remote.send(True)
+                except AttributeError:
+                    remote.send(False)
+            elif cmd == 'set_attr':
+                remote.send(setattr(env, data[0], data[1]))
+            elif cmd == 'is_wrapped':
+                remote.send(is_wrapped(env, data))
+            else:
+                raise NotImplementedError(f"`{cmd}` is not implemented in the worker")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        arrays = None
+        if shm is not None:
+            shm.close()
+
+
+class SharedMemoryVecEnv(SubprocVecEnv):
+    """SubprocVecEnv for Dict observation spaces that moves observations through shared memory.
+
+    Every key lives in one shared block as an [N_SLOTS, n_envs, ...] array. Workers write
+    their observation straight into their row of the current slot and only rewards, dones
+    and infos cross the pipe. step_wait()/reset() return views of the slot with no copy or
+    unpickling; a returned batch stays valid until the following step, long enough for
+    on-policy algorithms that store the previous observation after stepping.
+    Terminal observations still travel through the pipe in the info dict.
+    """
+
+    def __init__(self, env_fns, start_method=None):
+        self.waiting = False
+        self.closed = False
+        n_envs = len(env_fns)
+        if start_method is None:
+            start_method = 'forkserver' if 'forkserver' in mp.get_all_start_methods() else 'spawn'
+        ctx = mp.get_context(start_method)
+
+        self.remotes, self.work_remotes = zip(*[ctx.Pipe() for _ in range(n_envs)])
+        self.processes = []
+        for index, (work_remote, remote, env_fn) in enumerate(zip(self.work_remotes, self.remotes, env_fns)):
+            args = (work_remote, remote, CloudpickleWrapper(env_fn), index)
+            process = ctx.Process(target=_worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        self.remotes[0].send(('get_spaces', None))
+        observation_space, action_space = self.remotes[0].recv()
+        if not isinstance(observation_space, spaces.Dict):
+            raise ValueError("SharedMemoryVecEnv needs a Dict observation space")
+        super(SubprocVecEnv, self).__init__(n_envs, observation_space, action_space)
+
+        layout, size = _layout(observation_space, n_envs)
+        self._shm = shared_memory.SharedMemory(create=True, size=size)
+        self._arrays = _views(self._shm.buf, layout)
+        for remote in self.remotes:
+            remote.send(('attach', (self._shm.name, layout)))
+        for remote in self.remotes:
+            remote.recv()
+        self._slot = 0
+
+    def _next_slot(self):
+        slot = self._slot
+        self._slot = (slot + 1) % N_SLOTS
+        return slot
+
+    def _batch(self, slot):
+        return {key: array[slot] for key, array in self._arrays.items()}
+
+    def step_async(self, actions):
+        self._step_slot = self._next_slot()
+        for remote, action in zip(self.remotes, actions):
+            remote.send(('step', (action, self._step_slot)))
+        self.waiting = True
+
+    def step_wait(self):
+        results = [remote.recv() for remote in self.remotes]
+        self.waiting = False
+        rews, dones, infos, self.reset_infos = zip(*results)
+        return self._batch(self._step_slot), np.stack(rews), np.stack(dones), infos
+
+    def reset(self):
+        slot = self._next_slot()
+        for env_idx, remote in enumerate(self.remotes):
+            remote.send(('reset', (self._seeds[env_idx], self._options[env_idx], slot)))
+        self.reset_infos = [remote.recv() for remote in self.remotes]
+        self._reset_seeds()
+        self._reset_options()
+        return self._batch(slot)
+
+    def close(self):
+        if self.closed:
+            return
+        super().close()
+        self._arrays = None
+        self._shm.close()
+        self._shm.unlink()
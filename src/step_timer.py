@@ -0,0 +1,122 @@
+# File: step_timer.py
+# Per-stage wall-clock timing of env steps with rolling statistics.
+
+import json
+import time
+from collections import deque
+
+import numpy as np
+
+
+class StepTimer:
+    """Splits each step into named stages with lap() and keeps the last `window` steps per stage.
+
+    start() marks the beginning of a step, every lap(stage) charges the time since the
+    previous mark to `stage`, and end() closes the step and returns its {stage: ms}.
+    Laps outside a start()/end() pair (e.g. during reset) are ignored.
+    """
+
+    enabled = True
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.history = {}
+        self.n_steps = 0
+        self._step = None
+        self._start = self._mark = 0.0
+
+    def start(self):
+        self._start = self._mark = time.perf_counter()
+        self._step = {}
+
+    def lap(self, stage):
+        if self._step is None:
+            return
+        now = time.perf_counter()
+        self._step[stage] = self._step.get(stage, 0.0) + (now - self._mark) * 1e3
+        self._mark = now
+
+    def end(self):
+        step = self._step
+        if step is None:
+            return None
+        step['total'] = (time.perf_counter() - self._start) * 1e3
+        for stage, ms in step.items():
+            history = self.history.get(stage)
+            if history is None:
+                history = self.history[stage] = deque(maxlen=self.window)
+            history.append(ms)
+        self.n_steps += 1
+        self._step = None
+        return step
+
+    def stats(self):
+        """{stage: {'mean_ms', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms', 'count'}} over the window."""
+        result = {}
+        for stage, history in self.history.items():
+            ms = np.fromiter(history, dtype=np.float64, count=len(history))
+            p50, p90, p99 = np.percentile(ms, (50, 90, 99))
+            result[stage] = {
+                'mean_ms': float(ms.mean()),
+                'p50_ms': float(p50),
+                'p90_ms': float(p90),
+                'p99_ms': float(p99),
+                'max_ms': float(ms.max()),
+                'count': len(ms),
+            }
+        return result
+
+    def histogram(self, stage, bins=20):
+        """(counts, bin_edges_ms) of the rolling window for one stage."""
+        return np.histogram(np.fromiter(self.history.get(stage, ()), dtype=np.float64), bins=bins)
+
+    def reset(self):
+        self.history.clear()
+        self.n_steps = 0
+        self._step = None
+
+
+class NullStepTimer:
+    """Drop-in StepTimer that records nothing, so disabled timing costs one no-op call per stage."""
+
+    enabled = False
+    n_steps = 0
+
+    def start(self):
+        pass
+
+    def lap(self, stage):
+        pass
+
+    def end(self):
+        return None
+
+    def stats(self):
+        return {}
+
+    def histogram(self, stage, bins=20):
+        return np.zeros(bins, dtype=np.int64), np.zeros(bins + 1)
+
+    def reset(self):
+        pass
+
+
+def merge_stats(stats_list):
+    """Combine stats() dicts from several envs: count-weighted mean, worst-case percentiles."""
+    merged = {}
+    for stats in stats_list:
+        for stage, s in stats.items():
+            m = merged.setdefault(stage, {'mean_ms': 0.0, 'p50_ms': 0.0, 'p90_ms': 0.0, 'p99_ms': 0.0,
+                                          'max_ms': 0.0, 'count': 0})
+            total = m['count'] + s['count']
+            m['mean_ms'] = (m['mean_ms'] * m['count'] + s['mean_ms'] * s['count']) / total
+            for key in ('p50_ms', 'p90_ms', 'p99_ms', 'max_ms'):
+                m[key] = max(m[key], s[key])
+            m['count'] = total
+    return merged
+
+
+def dump_stats(stats, path, **extra):
+    """Append one JSON line {time, ...extra, stages: stats} to `path`."""
+    with open(path, 'a') as f:
+        f.write(json.dumps(dict(time=time.time(), **extra, stages=stats)) + '\n')
@@ -1,23 +1,45 @@
 # File: test_carla_connection.py
 # Basic test to verify CARLA connection and server status
 
-import carla
+import argparse
+import sys
+
+
+def main(host='localhost', port=2000, timeout=10.0, fake=False):
+    if fake:
+        import fake_carla
+        fake_carla.install()
+    import carla
 
-def main():
     try:
         # Connect to CARLA server
-        client = carla.Client('localhost', 2000)
-        client.set_timeout(10.0)
-        
+        client = carla.Client(host, port)
+        client.set_timeout(timeout)
+
         # Get world and print info
         world = client.get_world()
+        settings = world.get_settings()
+        actors = world.get_actors()
         print(f"Connected to CARLA version: {client.get_server_version()}")
         print(f"Client version: {client.get_client_version()}")
         print(f"Map name: {world.get_map().name}")
+        print(f"Synchronous mode: {settings.synchronous_mode} (fixed_delta_seconds={settings.fixed_delta_seconds})")
+        counts = {}
+        for actor in actors:
+            kind = actor.type_id.partition('.')[0]
+            counts[kind] = counts.get(kind, 0) + 1
+        print(f"Actors: {len(actors)} " + " ".join(f"{kind}={n}" for kind, n in sorted(counts.items())))
         return True
     except Exception as e:
         print(f"Error: {e}")
         return False
 
+
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', type=str, default='localhost')
+    parser.add_argument('--port', type=int, default=2000)
+    parser.add_argument('--timeout', type=float, default=10.0)
+    parser.add_argument('--fake', action='store_true', help="Check the in-process fake simulator")
+    args = parser.parse_args()
+    sys.exit(0 if main(args.host, args.port, args.timeout, args.fake) else 1)
@@ -0,0 +1,70 @@
+# File: test_carla_endpoints.py
+# Regression checks of simulator endpoint parsing and validation, against the
+# in-process fake simulator. No CARLA server or GPU needed.
+
+import argparse
+import sys
+
+
+def check_parse_endpoint():
+    """Ports and Traffic Manager ports default the way CARLA's do."""
+    from carla_vec_env import parse_endpoint
+
+    assert parse_endpoint('sim1') == ('sim1', 2000, 8000)
+    assert parse_endpoint('sim1:2004') == ('sim1', 2004, 8004)
+    assert parse_endpoint('sim1:2004:9000') == ('sim1', 2004, 9000)
+    assert parse_endpoint(':2002') == ('localhost', 2002, 8002)
+    assert parse_endpoint(('sim1', 2004)) == ('sim1', 2004, 8004)
+
+
+def check_duplicate_endpoints():
+    """make_carla_vec_env rejects endpoints that would share a world or a Traffic Manager."""
+    from carla_vec_env import make_carla_vec_env
+
+    bad = {
+        'no endpoints': [],
+        'same RPC port': ['localhost:2000', 'localhost:2000:9000'],
+        'same TM port': ['localhost:2000:8000', 'localhost:2002:8000'],
+    }
+    for what, endpoints in bad.items():
+        try:
+            make_carla_vec_env(endpoints, fake=True, use_subprocess=False)
+        except ValueError:
+            continue
+        raise AssertionError(f"make_carla_vec_env accepted {what}: {endpoints}")
+    # The same port on different hosts is fine; DummyVecEnv keeps this check in-process
+    env = make_carla_vec_env(['localhost:2000', 'otherhost:2000'], env_kwargs=dict(headless=True), fake=True,
+                             use_subprocess=False)
+    env.close()
+
+
+CHECKS = {
+    'parse': check_parse_endpoint,
+    'duplicates': check_duplicate_endpoints,
+}
+
+
+def main(names=tuple(CHECKS)):
+    import fake_carla
+    fake_carla.install()
+
+    failed = []
+    for name in names:
+        try:
+            CHECKS[name]()
+            print(f"PASS {name}")
+        except Exception as e:
+            print(f"FAIL {name}: {type(e).__name__}: {e}")
+            failed.append(name)
+    return not failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Endpoint validation checks on the fake backend")
+    parser.add_argument('checks', nargs='*', metavar='check',
+                        help=f"Checks to run, from {', '.join(CHECKS)} (default: all)")
+    args = parser.parse_args()
+    unknown = set(args.checks) - set(CHECKS)
+    if unknown:
+        parser.error(f"unknown checks {sorted(unknown)}")
+    sys.exit(0 if main(args.checks or tuple(CHECKS)) else 1)
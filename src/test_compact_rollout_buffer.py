@@ -0,0 +1,128 @@
+# File: test_compact_rollout_buffer.py
+# Regression checks of CompactDictRolloutBuffer against SB3's DictRolloutBuffer.
+# No simulator needed.
+
+import argparse
+import sys
+
+import numpy as np
+
+N_STEPS, N_ENVS = 16, 3
+LIDAR_SHAPE = (2, 5, 7)  # 35 cells per channel, not a multiple of 8
+
+
+def _spaces():
+    import gymnasium as gym
+
+    observation_space = gym.spaces.Dict({
+        'rgb': gym.spaces.Box(0, 255, shape=(3, 8, 8), dtype=np.uint8),
+        'depth': gym.spaces.Box(0, 255, shape=(1, 8, 8), dtype=np.uint8),
+        'lidar': gym.spaces.Box(0, 255, shape=LIDAR_SHAPE, dtype=np.uint8),
+    })
+    return observation_space, gym.spaces.Discrete(3)
+
+
+def _filled_buffers():
+    """A DictRolloutBuffer and a CompactDictRolloutBuffer given the same adds, and the raw [step, env] obs."""
+    import torch
+    from stable_baselines3.common.buffers import DictRolloutBuffer
+
+    from compact_rollout_buffer import CompactDictRolloutBuffer, lidar_packed_channels
+
+    observation_space, action_space = _spaces()
+    reference = DictRolloutBuffer(N_STEPS, observation_space, action_space, device='cpu', n_envs=N_ENVS)
+    compact = CompactDictRolloutBuffer(N_STEPS, observation_space, action_space, device='cpu', n_envs=N_ENVS,
+                                       packed_channels=lidar_packed_channels(dict(channels=('occupancy', 'density'))))
+
+    rng = np.random.default_rng(0)
+    added = {key: [] for key in observation_space.spaces}
+    for _ in range(N_STEPS):
+        obs = {key: rng.integers(0, 256, size=(N_ENVS,) + space.shape, dtype=np.uint8)
+               for key, space in observation_space.spaces.items()}
+        obs['lidar'][:, 0] = np.where(rng.random((N_ENVS,) + LIDAR_SHAPE[1:]) < 0.3, 255, 0)  # binary occupancy
+        obs['lidar'][:, 0, -1, -1] = 255  # the last cell sits in the padding byte's partial bits
+        step = (rng.integers(0, 3, size=(N_ENVS, 1)), rng.normal(size=N_ENVS).astype(np.float32),
+                rng.random(N_ENVS) < 0.1, torch.randn(N_ENVS), torch.randn(N_ENVS))
+        reference.add(obs, *step)
+        compact.add(obs, *step)
+        for key, value in obs.items():
+            added[key].append(value)
+    last_values, dones = torch.randn(N_ENVS), np.zeros(N_ENVS, dtype=bool)
+    for buffer in (reference, compact):
+        buffer.compute_returns_and_advantage(last_values, dones)
+    return reference, compact, {key: np.stack(values) for key, values in added.items()}
+
+
+def check_minibatches(batch_size=8):
+    """get() yields the same minibatches as DictRolloutBuffer for the same permutation."""
+    import torch
+
+    reference, compact, _ = _filled_buffers()
+    assert compact.nbytes() < sum(a.nbytes for a in reference.observations.values())
+    np.random.seed(0)
+    expected = list(reference.get(batch_size))
+    np.random.seed(0)
+    actual = list(compact.get(batch_size))
+    assert len(expected) == len(actual)
+    for b, (e, a) in enumerate(zip(expected, actual)):
+        for key in e.observations:
+            assert torch.equal(e.observations[key], a.observations[key]), f"batch {b}: {key} differs"
+        for field in ('actions', 'old_values', 'old_log_prob', 'advantages', 'returns'):
+            assert torch.allclose(getattr(e, field), getattr(a, field)), f"batch {b}: {field} differs"
+
+
+def check_index_mapping():
+    """Flat sample index i is env i // n_steps, step i % n_steps, as in swap_and_flatten."""
+    reference, compact, added = _filled_buffers()
+    for buffer in (reference, compact):
+        next(buffer.get(1))  # flattens the per-sample arrays
+    indices = np.arange(N_STEPS * N_ENVS)
+    expected = reference._get_samples(indices)
+    actual = compact._get_samples(indices)
+    for key, raw in added.items():
+        # added[key] is [step, env, ...]; env-major order puts all of env 0's steps first
+        by_index = raw.swapaxes(0, 1).reshape((N_STEPS * N_ENVS,) + raw.shape[2:]).astype(np.float32)
+        assert np.array_equal(actual.observations[key].numpy(), by_index), f"{key} out of env-major order"
+        assert np.array_equal(actual.observations[key].numpy(), expected.observations[key].numpy()), \
+            f"{key} differs from DictRolloutBuffer"
+    assert np.array_equal(actual.actions.numpy(), expected.actions.numpy()), "actions out of order"
+
+
+def check_packbits_roundtrip():
+    """Packed channels come back exactly, including the partial last byte of 35 cells."""
+    _, compact, added = _filled_buffers()
+    h, w = LIDAR_SHAPE[1:]
+    assert compact.packed['lidar'].shape[-1] == -(-h * w // 8)
+    steps, envs = np.divmod(np.arange(N_STEPS * N_ENVS), N_ENVS)
+    decoded = compact._decode('lidar', steps, envs)
+    assert np.array_equal(decoded, added['lidar'][steps, envs].astype(np.float32)), "lidar round-trip differs"
+
+
+CHECKS = {
+    'minibatches': check_minibatches,
+    'index_mapping': check_index_mapping,
+    'packbits': check_packbits_roundtrip,
+}
+
+
+def main(names=tuple(CHECKS)):
+    failed = []
+    for name in names:
+        try:
+            CHECKS[name]()
+            print(f"PASS {name}")
+        except Exception as e:
+            print(f"FAIL {name}: {type(e).__name__}: {e}")
+            failed.append(name)
+    return not failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="CompactDictRolloutBuffer checks against DictRolloutBuffer")
+    parser.add_argument('checks', nargs='*', metavar='check',
+                        help=f"Checks to run, from {', '.join(CHECKS)} (default: all)")
+    args = parser.parse_args()
+    unknown = set(args.checks) - set(CHECKS)
+    if unknown:
+        parser.error(f"unknown checks {sorted(unknown)}")
+    sys.exit(0 if main(args.checks or tuple(CHECKS)) else 1)
@@ -0,0 +1,124 @@
+# File: test_shm_vec_env.py
+# Regression checks of SharedMemoryVecEnv against SB3's SubprocVecEnv on the in-process
+# fake simulator. No CARLA server or GPU needed.
+
+import argparse
+import sys
+
+import numpy as np
+
+ENDPOINTS = ['localhost:2000', 'localhost:2002']
+EPISODE_STEPS = 7
+
+
+def short_episode_reward(speed, stuck_counter, step_counter):
+    """Ends every episode after EPISODE_STEPS ticks, so terminal observations come up often."""
+    return speed / 10.0, step_counter + 1 >= EPISODE_STEPS
+
+
+def _env_fns():
+    from carla_vec_env import make_env_fn, parse_endpoint
+
+    # The fake renders the same frames in every process; swapping the BEV channels per env
+    # keeps the rows distinguishable, so a mix-up between env rows shows up as well
+    channels = [('occupancy', 'density'), ('density', 'occupancy')]
+    return [make_env_fn(*parse_endpoint(endpoint), seed=i, fake=True,
+                        env_kwargs=dict(headless=True, bev_config=dict(channels=c), reward_fn=short_episode_reward))
+            for i, (endpoint, c) in enumerate(zip(ENDPOINTS, channels))]
+
+
+def _copy(obs):
+    return {key: np.array(value) for key, value in obs.items()}
+
+
+def _assert_obs_equal(expected, actual, what):
+    for key in expected:
+        assert np.array_equal(expected[key], actual[key]), f"{what}: {key} differs"
+
+
+def check_parity(n_steps=20):
+    """Observations, rewards, dones and terminal observations match SubprocVecEnv step for step."""
+    from stable_baselines3.common.vec_env import SubprocVecEnv
+
+    from shm_vec_env import SharedMemoryVecEnv
+
+    actions = np.random.default_rng(0).integers(0, 3, size=(n_steps, len(ENDPOINTS)))
+    runs = {}
+    for cls in (SubprocVecEnv, SharedMemoryVecEnv):
+        vec_env = cls(_env_fns())
+        try:
+            steps = [(_copy(vec_env.reset()), None, None, None)]
+            for action in actions:
+                obs, rewards, dones, infos = vec_env.step(action)
+                steps.append((_copy(obs), rewards.copy(), dones.copy(),
+                              [info.get('terminal_observation') for info in infos]))
+        finally:
+            vec_env.close()
+        runs[cls] = steps
+
+    first_lidar = runs[SubprocVecEnv][0][0]['lidar']
+    assert not np.array_equal(first_lidar[0], first_lidar[1]), "env rows are indistinguishable"
+    n_terminal = 0
+    for t, (expected, actual) in enumerate(zip(runs[SubprocVecEnv], runs[SharedMemoryVecEnv])):
+        _assert_obs_equal(expected[0], actual[0], f"step {t}")
+        if not t:
+            continue
+        assert np.array_equal(expected[1], actual[1]), f"step {t}: rewards differ"
+        assert np.array_equal(expected[2], actual[2]), f"step {t}: dones differ"
+        for k, (terminal, shm_terminal) in enumerate(zip(expected[3], actual[3])):
+            assert (terminal is None) == (shm_terminal is None), f"step {t}: env {k} terminal_observation missing"
+            if terminal is not None:
+                _assert_obs_equal(terminal, shm_terminal, f"step {t}: env {k} terminal_observation")
+                n_terminal += 1
+    assert n_terminal >= len(ENDPOINTS), f"only {n_terminal} terminal observations in {n_steps} steps"
+
+
+def check_batch_lifetime(n_steps=6):
+    """A returned batch stays intact through exactly one following step, then its slot is reused."""
+    from shm_vec_env import N_SLOTS, SharedMemoryVecEnv
+
+    assert N_SLOTS == 2, f"the documented batch lifetime assumes 2 slots, not {N_SLOTS}"
+    vec_env = SharedMemoryVecEnv(_env_fns())
+    try:
+        actions = np.ones(len(ENDPOINTS), dtype=np.int64)
+        batches = [vec_env.reset()]
+        for _ in range(n_steps):
+            previous, saved = batches[-1], _copy(batches[-1])
+            batches.append(vec_env.step(actions)[0])
+            # e.g. PPO stores the previous observation after stepping
+            _assert_obs_equal(saved, previous, "batch after one following step")
+        for t in range(2, len(batches)):
+            for key in batches[t]:
+                assert not np.shares_memory(batches[t][key], batches[t - 1][key]), f"step {t}: {key} aliases {t - 1}"
+                assert np.shares_memory(batches[t][key], batches[t - 2][key]), f"step {t}: {key} not in {t - 2}'s slot"
+    finally:
+        vec_env.close()
+
+
+CHECKS = {
+    'parity': check_parity,
+    'batch_lifetime': check_batch_lifetime,
+}
+
+
+def main(names=tuple(CHECKS)):
+    failed = []
+    for name in names:
+        try:
+            CHECKS[name]()
+            print(f"PASS {name}")
+        except Exception as e:
+            print(f"FAIL {name}: {type(e).__name__}: {e}")
+            failed.append(name)
+    return not failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="SharedMemoryVecEnv checks on the fake backend")
+    parser.add_argument('checks', nargs='*', metavar='check',
+                        help=f"Checks to run, from {', '.join(CHECKS)} (default: all)")
+    args = parser.parse_args()
+    unknown = set(args.checks) - set(CHECKS)
+    if unknown:
+        parser.error(f"unknown checks {sorted(unknown)}")
+    sys.exit(0 if main(args.checks or tuple(CHECKS)) else 1)
@@ -0,0 +1,29 @@
+# File: timing_callback.py
+# SB3 callback exporting CarlaFusionEnv step-timing stats to the logger and/or a JSON-lines file.
+
+from stable_baselines3.common.callbacks import BaseCallback
+
+from step_timer import dump_stats, merge_stats
+
+
+class StepTimingCallback(BaseCallback):
+    """After every rollout, records per-stage step latency from all envs built with timing=True.
+
+    Logged as timing/<stage>_{mean,p50,p99}_ms; with `log_path`, the merged stats are
+    also appended there as one JSON line per rollout.
+    """
+
+    def __init__(self, log_path=None, verbose=0):
+        super().__init__(verbose)
+        self.log_path = log_path
+
+    def _on_step(self):
+        return True
+
+    def _on_rollout_end(self):
+        stats = merge_stats(self.training_env.env_method('get_step_stats'))
+        for stage, s in stats.items():
+            for key in ('mean_ms', 'p50_ms', 'p99_ms'):
+                self.logger.record(f"timing/{stage}_{key}", s[key])
+        if self.log_path and stats:
+            dump_stats(stats, self.log_path, timesteps=self.num_timesteps)
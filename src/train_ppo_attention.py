@@ -1,13 +1,13 @@
 # File: train_ppo_attention.py
 
-import gymnasium as gym
-import torch
-import torch.nn as nn
-import numpy as np
+import argparse
 from stable_baselines3 import PPO
-from stable_baselines3.common.torch_layers import BaseFeaturesExtractor
-from fusion_attention_module import AttentionFusion
-from carla_fusion_env import CarlaFusionEnv
+from fusion_attention_module import FUSION_MODES, PRECISIONS
+from fusion_feature_extractor import FusionFeatureExtractor
+from carla_vec_env import make_carla_vec_env
+from timing_callback import StepTimingCallback
+from compact_rollout_buffer import CompactDictRolloutBuffer, lidar_packed_channels
+from async_training import AsyncCheckpointCallback, EvalProcess, latest_checkpoint, load_checkpoint
 
 def custom_reward_fn(speed, stuck_counter, step_counter):
     """Custom reward function for PPO training.
@@ -35,28 +35,94 @@ def custom_reward_fn(speed, stuck_counter, step_counter):
     
     return reward, terminated
 
-# --- Custom Feature Extractor ---
-class FusionFeatureExtractor(BaseFeaturesExtractor):
-    def __init__(self, observation_space: gym.spaces.Dict):
-        super().__init__(observation_space, features_dim=64)
-        self.fusion = AttentionFusion()
-
-    def forward(self, obs):
-        return self.fusion(obs['rgb'], obs['depth'], obs['lidar'])  # [B, 64]
-
 # --- Training Setup ---
-def main():
-    env = CarlaFusionEnv(reward_fn=custom_reward_fn)
+def main(endpoints=('localhost:2000',), fake=False, fusion='self', timing_log=None, action_repeat=1,
+         pipeline=False, shared_memory=False, total_timesteps=5000, save_dir='checkpoints', save_freq=2048,
+         keep=3, eval_endpoint=None, eval_episodes=5, resume=False, precision='fp32', channels_last=False,
+         fuse_normalize=False, n_steps=2048, compact_buffer=False, egos_per_world=1):
+    # One env worker per simulator endpoint; PPO collects from all of them in parallel
+    env_kwargs = dict(reward_fn=custom_reward_fn, headless=True, timing=timing_log is not None,
+                      action_repeat=action_repeat, pipeline=pipeline)
+    env = make_carla_vec_env(endpoints, env_kwargs=env_kwargs, fake=fake, shared_memory=shared_memory,
+                             egos_per_world=egos_per_world)
 
     policy_kwargs = dict(
         features_extractor_class=FusionFeatureExtractor,
-        features_extractor_kwargs=dict(),
+        features_extractor_kwargs=dict(fusion=fusion, precision=precision, channels_last=channels_last,
+                                       fuse_normalize=fuse_normalize),
         net_arch=[dict(pi=[64, 32], vf=[64, 32])],
+        # The extractor scales raw pixels in its first convs instead
+        normalize_images=not fuse_normalize,
     )
 
-    model = PPO("MultiInputPolicy", env, policy_kwargs=policy_kwargs, verbose=1)
-    model.learn(total_timesteps=5000)
+    # uint8 observations with bit-packed LiDAR occupancy, decoded per minibatch
+    buffer_kwargs = {}
+    if compact_buffer:
+        buffer_kwargs = dict(rollout_buffer_class=CompactDictRolloutBuffer,
+                             rollout_buffer_kwargs=dict(packed_channels=lidar_packed_channels()))
+
+    model = PPO("MultiInputPolicy", env, n_steps=n_steps, policy_kwargs=policy_kwargs, verbose=1, **buffer_kwargs)
+    if resume:
+        path = latest_checkpoint(save_dir)
+        if path is None:
+            raise RuntimeError(f"No checkpoint to resume from in {save_dir}")
+        load_checkpoint(model, path)
+        print(f"Resumed from {path} at {model.num_timesteps} timesteps")
+
+    # Evaluation runs in its own process against its own simulator, so rollouts never wait on it
+    eval_process = None
+    if eval_endpoint is not None:
+        eval_kwargs = dict(reward_fn=custom_reward_fn, headless=True, action_repeat=action_repeat)
+        eval_process = EvalProcess(eval_endpoint, policy_kwargs, eval_kwargs, fake=fake, n_episodes=eval_episodes)
+    callbacks = [AsyncCheckpointCallback(save_dir, save_freq, keep=keep, eval_process=eval_process, verbose=1)]
+    # Per-stage step latency goes to the SB3 logger (timing/*) and, if given, a JSON-lines file
+    if timing_log is not None:
+        callbacks.append(StepTimingCallback(timing_log or None))
+
+    model.learn(total_timesteps=max(total_timesteps - model.num_timesteps, 0), callback=callbacks,
+                reset_num_timesteps=not resume)
     model.save("ppo_carla_attention")
+    env.close()
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--endpoints', nargs='+', default=['localhost:2000'],
+                        help="Simulator endpoints as host[:port[:tm_port]], one env per endpoint")
+    parser.add_argument('--fake', action='store_true', help="Run against the in-process fake simulator")
+    parser.add_argument('--fusion', choices=FUSION_MODES, default='self',
+                        help="'latent' cross-attends learned queries to the tokens, linear in token count")
+    parser.add_argument('--timing', nargs='?', const='', default=None, metavar='LOG',
+                        help="Time env step stages and log them; optionally also append them to LOG as JSON lines")
+    parser.add_argument('--action_repeat', type=int, default=1,
+                        help="Ticks each action is held for; sensors render only on the last one")
+    parser.add_argument('--pipeline', action='store_true',
+                        help="Decode each frame on a worker thread behind the next tick; observations lag one step")
+    parser.add_argument('--shared_memory', action='store_true',
+                        help="Return worker observations through shared memory instead of pickling them")
+    parser.add_argument('--total_timesteps', type=int, default=5000)
+    parser.add_argument('--save_dir', type=str, default='checkpoints')
+    parser.add_argument('--save_freq', type=int, default=2048, help="Timesteps between checkpoints")
+    parser.add_argument('--keep', type=int, default=3, help="Checkpoints to keep in --save_dir")
+    parser.add_argument('--eval_endpoint', type=str, default=None,
+                        help="Separate simulator host[:port[:tm_port]] for background evaluation of checkpoints")
+    parser.add_argument('--eval_episodes', type=int, default=5)
+    parser.add_argument('--resume', action='store_true', help="Continue from the latest checkpoint in --save_dir")
+    parser.add_argument('--precision', choices=PRECISIONS, default='fp32',
+                        help="'bf16': run the fusion encoders and attention under bf16 autocast")
+    parser.add_argument('--channels_last', action='store_true', help="NHWC memory format for the conv encoders")
+    parser.add_argument('--fuse_normalize', action='store_true',
+                        help="Fold the 1/255 image scaling into the first conv of each encoder")
+    parser.add_argument('--n_steps', type=int, default=2048, help="Rollout steps per env between updates")
+    parser.add_argument('--compact_buffer', action='store_true',
+                        help="Keep rollouts as uint8 with bit-packed LiDAR occupancy (CompactDictRolloutBuffer)")
+    parser.add_argument('--egos_per_world', type=int, default=1,
+                        help="Drive this many egos in the single endpoint's world with one tick for all")
+    args = parser.parse_args()
+
+    main(endpoints=args.endpoints, fake=args.fake, fusion=args.fusion, timing_log=args.timing,
+         action_repeat=args.action_repeat, pipeline=args.pipeline,
+         shared_memory=args.shared_memory, total_timesteps=args.total_timesteps, save_dir=args.save_dir,
+         save_freq=args.save_freq, keep=args.keep, eval_endpoint=args.eval_endpoint, eval_episodes=args.eval_episodes,
+         resume=args.resume, precision=args.precision, channels_last=args.channels_last,
+         fuse_normalize=args.fuse_normalize, n_steps=args.n_steps, compact_buffer=args.compact_buffer,
+         egos_per_world=args.egos_per_world)
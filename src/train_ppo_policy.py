@@ -1,9 +1,7 @@
-from stable_baselines3 import PPO
-from stable_baselines3.common.env_checker import check_env
-from carla_fusion_env import CarlaFusionEnv
+# File: train_ppo_policy.py
+# Plain PPO baseline with SB3's default extractor, after an API check of the env.
 
-import time
-time.sleep(5)
+import argparse
 
 def custom_reward_fn(speed, stuck_counter, step_counter):
     # Custom reward logic here
@@ -15,9 +13,36 @@ def custom_reward_fn(speed, stuck_counter, step_counter):
         reward -= 0.2
     return reward, terminated
 
-env = CarlaFusionEnv(reward_fn=custom_reward_fn)
-check_env(env)
+def main(endpoints=('localhost:2000',), fake=False, total_timesteps=100_000, device='cuda'):
+    if fake:
+        import fake_carla
+        fake_carla.install()
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.env_checker import check_env
+    from carla_fusion_env import CarlaFusionEnv
+    from carla_vec_env import make_carla_vec_env, parse_endpoint
 
-model = PPO("MultiInputPolicy", env, verbose=1, device="cuda")
-model.learn(total_timesteps=100_000)
-model.save("ppo_attention_agent")
+    # Validate the env API once against the first endpoint, then free it for its worker
+    host, port, tm_port = parse_endpoint(endpoints[0])
+    check_env_instance = CarlaFusionEnv(reward_fn=custom_reward_fn, host=host, port=port, tm_port=tm_port,
+                                        headless=True)
+    check_env(check_env_instance)
+    check_env_instance.close()
+
+    env = make_carla_vec_env(endpoints, env_kwargs=dict(reward_fn=custom_reward_fn, headless=True), fake=fake)
+
+    model = PPO("MultiInputPolicy", env, verbose=1, device=device)
+    model.learn(total_timesteps=total_timesteps)
+    model.save("ppo_attention_agent")
+    env.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--endpoints', nargs='+', default=['localhost:2000'],
+                        help="Simulator endpoints as host[:port[:tm_port]], one env per endpoint")
+    parser.add_argument('--fake', action='store_true', help="Run against the in-process fake simulator")
+    parser.add_argument('--total_timesteps', type=int, default=100_000)
+    parser.add_argument('--device', type=str, default='cuda')
+    args = parser.parse_args()
+
+    main(args.endpoints, fake=args.fake, total_timesteps=args.total_timesteps, device=args.device)
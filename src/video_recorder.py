@@ -0,0 +1,194 @@
+# File: video_recorder.py
+# Background video recording of policy runs: observations are tiled and encoded off the control loop.
+
+import queue
+import threading
+
+import carla
+import cv2
+import numpy as np
+
+POLICIES = ('drop', 'block')
+ACTION_NAMES = ('left', 'straight', 'right')
+OVERLAY_HEIGHT = 24
+
+
+def depth_tile(depth):
+    """Colour-mapped [H, W, 3] BGR image of the log-scaled uint8 depth, near is bright."""
+    return cv2.applyColorMap(255 - depth, cv2.COLORMAP_INFERNO)
+
+
+def lidar_tile(lidar):
+    """[H, W, 3] BGR image of a [C, H, W] BEV grid: the first channels as B, G, R, occupancy as grey."""
+    if lidar.shape[0] == 1:
+        return cv2.cvtColor(lidar[0], cv2.COLOR_GRAY2BGR)
+    image = np.zeros(lidar.shape[1:] + (3,), dtype=np.uint8)
+    for c in range(min(lidar.shape[0], 3)):
+        image[..., c] = lidar[c]
+    return image
+
+
+def tile_frame(obs, tile_size=256, chase=None, action=None, reward=None, step=None, episode_return=None):
+    """One BGR frame: RGB | depth | LiDAR BEV [| chase camera] with an action/reward strip below.
+
+    `obs` is a single CarlaFusionEnv observation; its RGB channels are already in BGR order.
+    `chase` is an optional [H, W, 3] BGR image, scaled to the same tile height.
+    """
+    size = (tile_size, tile_size)
+    tiles = [
+        cv2.resize(np.ascontiguousarray(obs['rgb'].transpose(1, 2, 0)), size, interpolation=cv2.INTER_NEAREST),
+        cv2.resize(depth_tile(obs['depth'][0]), size, interpolation=cv2.INTER_NEAREST),
+        cv2.resize(lidar_tile(obs['lidar']), size, interpolation=cv2.INTER_NEAREST),
+    ]
+    if chase is not None:
+        width = tile_size * chase.shape[1] // chase.shape[0]
+        tiles.append(cv2.resize(chase, (width, tile_size), interpolation=cv2.INTER_AREA))
+    row = np.hstack(tiles)
+
+    strip = np.zeros((OVERLAY_HEIGHT, row.shape[1], 3), dtype=np.uint8)
+    parts = []
+    if step is not None:
+        parts.append(f"step {step}")
+    if action is not None:
+        action = int(action)
+        name = ACTION_NAMES[action] if 0 <= action < len(ACTION_NAMES) else '?'
+        parts.append(f"action {action} ({name})")
+    if reward is not None:
+        parts.append(f"reward {reward:+.2f}")
+    if episode_return is not None:
+        parts.append(f"return {episode_return:.2f}")
+    cv2.putText(strip, "   ".join(parts), (6, OVERLAY_HEIGHT - 7), cv2.FONT_HERSHEY_SIMPLEX, 0.5,
+                (255, 255, 255), 1, cv2.LINE_AA)
+    return np.vstack([row, strip])
+
+
+class VideoRecorder:
+    """Tiles and encodes frames on a dedicated thread, fed through a bounded queue.
+
+    record() only copies the observation (env buffers are reused between steps) and
+    enqueues it; tiling, overlays and cv2.VideoWriter.write all run on the encoder thread.
+    When the queue is full, policy='drop' discards the new frame and counts it in
+    dropped_frames, so the control loop never waits; policy='block' waits for room, so
+    the video is complete but a slow encoder can stall the caller.
+    """
+
+    def __init__(self, path, fps=10, max_queue=64, policy='drop', tile_size=256, fourcc='XVID'):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy {policy!r}; choose from {POLICIES}")
+        self.path = path
+        self.fps = fps
+        self.policy = policy
+        self.tile_size = tile_size
+        self.fourcc = cv2.VideoWriter_fourcc(*fourcc)
+        self.frames_written = 0
+        self.dropped_frames = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._writer = None
+        self._frame_shape = None
+        self._error = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='video-encoder', daemon=True)
+        self._thread.start()
+
+    def record(self, obs, action=None, reward=None, step=None, episode_return=None, chase=None):
+        """Queue one frame; returns False if it was dropped."""
+        if self._closed:
+            raise RuntimeError("VideoRecorder is closed")
+        if self._error is not None:
+            raise RuntimeError(f"Video encoder failed: {self._error}") from self._error
+        item = ({key: np.array(value) for key, value in obs.items()},
+                None if chase is None else np.array(chase),
+                dict(action=action, reward=reward, step=step, episode_return=episode_return))
+        if self.policy == 'block':
+            self._queue.put(item)
+            return True
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped_frames += 1
+            return False
+        return True
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is not None:
+                continue  # keep draining so a blocked record() can return
+            obs, chase, overlay = item
+            try:
+                frame = tile_frame(obs, self.tile_size, chase=chase, **overlay)
+                if self._writer is None:
+                    height, width = frame.shape[:2]
+                    self._writer = cv2.VideoWriter(self.path, self.fourcc, self.fps, (width, height))
+                    if not self._writer.isOpened():
+                        raise RuntimeError(f"Cannot open {self.path} for writing")
+                elif frame.shape[:2] != self._frame_shape:
+                    # VideoWriter silently skips frames of another size, e.g. once a chase frame is missing
+                    frame = cv2.resize(frame, self._frame_shape[::-1])
+                self._frame_shape = frame.shape[:2]
+                self._writer.write(frame)
+                self.frames_written += 1
+            except Exception as e:
+                self._error = e
+        if self._writer is not None:
+            self._writer.release()
+
+    def close(self):
+        """Encode everything still queued, then finalise the file."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise RuntimeError(f"Video encoder failed: {self._error}") from self._error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ChaseCamera:
+    """An RGB camera behind and above the ego, for the optional chase tile of a recording.
+
+    latest() is the most recent frame as [H, W, 3] BGR, or None before the first one.
+    The camera follows the vehicle through teleporting resets; after a full reset that
+    respawns the vehicle, call attach() again.
+    """
+
+    def __init__(self, world, size=(320, 240)):
+        self.world = world
+        self.size = size
+        self.sensor = None
+        self._parent_id = None
+        self._latest = None
+
+    def attach(self, vehicle):
+        if self.sensor is not None and self._parent_id == vehicle.id:
+            return
+        self.destroy()
+        bp = self.world.get_blueprint_library().find('sensor.camera.rgb')
+        bp.set_attribute('image_size_x', str(self.size[0]))
+        bp.set_attribute('image_size_y', str(self.size[1]))
+        transform = carla.Transform(carla.Location(x=-6, z=3), carla.Rotation(pitch=-15))
+        self.sensor = self.world.spawn_actor(bp, transform, attach_to=vehicle)
+        self._parent_id = vehicle.id
+        self.sensor.listen(self._on_image)
+
+    def _on_image(self, image):
+        bgra = np.frombuffer(image.raw_data, dtype=np.uint8).reshape(image.height, image.width, 4)
+        self._latest = bgra[:, :, :3].copy()  # raw_data may be a reused buffer
+
+    def latest(self):
+        return self._latest
+
+    def destroy(self):
+        if self.sensor is not None:
+            self.sensor.stop()
+            self.sensor.destroy()
+            self.sensor = None
+        self._latest = None
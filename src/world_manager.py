@@ -0,0 +1,117 @@
+# File: world_manager.py
+# One CARLA connection per simulator endpoint, with the per-map data every env needs cached.
+
+import threading
+
+import carla
+
+_MANAGERS = {}
+_MANAGERS_LOCK = threading.Lock()
+
+
+def map_basename(name):
+    """'/Game/Carla/Maps/Town01', 'Carla/Maps/Town01' or 'Town01' -> 'Town01'."""
+    return name.rstrip('/').split('/')[-1]
+
+
+def group_by_map(jobs, key=lambda job: job[0]):
+    """[(map_name, [job, ...])] with each map once, in first-seen order, so a sweep loads every map once."""
+    groups = {}
+    for job in jobs:
+        groups.setdefault(map_basename(key(job)), []).append(job)
+    return list(groups.items())
+
+
+class MapInfo:
+    """What stays fixed while a map is loaded: the carla.Map, its spawn points and the blueprints."""
+
+    def __init__(self, world):
+        self.map = world.get_map()
+        self.name = map_basename(self.map.name)
+        self.spawn_points = self.map.get_spawn_points()
+        self.blueprint_library = world.get_blueprint_library()
+
+
+class WorldManager:
+    """Shared connection to one simulator.
+
+    load_map() only loads when the map actually changes and then waits for the new
+    world's first tick instead of polling its name. map_info() is cached per map, the
+    Traffic Manager per port, and world settings are only applied when they differ.
+    Use get_world_manager() so every env in a process shares one instance per endpoint.
+    """
+
+    def __init__(self, host='localhost', port=2000, timeout=10.0):
+        self.host, self.port = host, port
+        self.timeout = timeout
+        self.client = carla.Client(host, port)
+        self.client.set_timeout(timeout)
+        self.world = self.client.get_world()
+        self.map_name = map_basename(self.world.get_map().name)
+        self.map_loads = 0
+        self._maps = {}
+        self._traffic_managers = {}
+        self._lock = threading.RLock()
+
+    def load_map(self, map_name, timeout=60.0):
+        """Make `map_name` the current map and return the world; a no-op when it already is."""
+        name = map_basename(map_name)
+        with self._lock:
+            if name == self.map_name:
+                return self.world
+            # Loading takes longer than an ordinary RPC
+            self.client.set_timeout(timeout)
+            try:
+                self.world = self.client.load_world(name)
+                self._wait_ready(timeout)
+            finally:
+                self.client.set_timeout(self.timeout)
+            self.map_name = name
+            self.map_loads += 1
+            self._traffic_managers.clear()
+            return self.world
+
+    def _wait_ready(self, timeout):
+        # The first frame of the new episode is the signal that the map is up
+        if self.world.get_settings().synchronous_mode:
+            self.world.tick(timeout)
+        else:
+            self.world.wait_for_tick(timeout)
+
+    def map_info(self):
+        """MapInfo of the current map, fetched once per map."""
+        with self._lock:
+            info = self._maps.get(self.map_name)
+            if info is None:
+                info = self._maps[self.map_name] = MapInfo(self.world)
+            return info
+
+    def traffic_manager(self, tm_port):
+        """The Traffic Manager on `tm_port`, switched to synchronous mode once."""
+        with self._lock:
+            tm = self._traffic_managers.get(tm_port)
+            if tm is None:
+                tm = self._traffic_managers[tm_port] = self.client.get_trafficmanager(tm_port)
+                tm.set_synchronous_mode(True)
+            return tm
+
+    def apply_settings(self, synchronous_mode, fixed_delta_seconds=None):
+        """Set synchronous mode and the fixed step; skips the round-trip when nothing changes."""
+        settings = self.world.get_settings()
+        if synchronous_mode:
+            if settings.synchronous_mode and settings.fixed_delta_seconds == fixed_delta_seconds:
+                return
+            settings.fixed_delta_seconds = fixed_delta_seconds
+        elif not settings.synchronous_mode:
+            return
+        settings.synchronous_mode = synchronous_mode
+        self.world.apply_settings(settings)
+
+
+def get_world_manager(host='localhost', port=2000, timeout=10.0):
+    """The process-wide WorldManager for host:port, connected on first use."""
+    with _MANAGERS_LOCK:
+        manager = _MANAGERS.get((host, port))
+        if manager is None:
+            manager = _MANAGERS[(host, port)] = WorldManager(host, port, timeout)
+        return manager